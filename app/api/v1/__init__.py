@@ -8,7 +8,7 @@
 """
 from fastapi import APIRouter
 from app.api.v1 import video, task, review, project, match, monitor
-from app.api.v1 import amazing_qr
+from app.api.v1 import amazing_qr, reference, search, events
 
 api_router = APIRouter()
 
@@ -20,3 +20,6 @@ api_router.include_router(task.router, prefix="/task", tags=["task"])
 api_router.include_router(project.router, prefix="/project", tags=["project"])  # 新增项目路由
 api_router.include_router(match.router, prefix="/template", tags=["template matches"])
 api_router.include_router(monitor.router, prefix="/monitor", tags=["monitor"])
+api_router.include_router(reference.router, prefix="/reference", tags=["reference"])
+api_router.include_router(search.router, prefix="/search", tags=["search"])
+api_router.include_router(events.router, prefix="/events", tags=["events"])
@@ -18,7 +18,7 @@ from amzqr import amzqr
 from loguru import logger
 from pydantic import BaseModel, Field
 
-from app.services.minio_service import minio_service
+from app.services.async_storage import async_minio
 
 router = APIRouter()
 
@@ -83,7 +83,7 @@ async def generate_simple_qr(request: QRCodeRequest):
             qr_data = f.read()
 
         # 上传到MinIO
-        object_name, url = minio_service.upload_qrcode(
+        object_name, url = await async_minio.upload_qrcode(
             qr_data=qr_data,
             qr_type="simple",
             file_extension="png"
@@ -169,7 +169,7 @@ async def generate_artistic_qr(
             qr_data = f.read()
 
         # 上传到MinIO
-        object_name, url = minio_service.upload_qrcode(
+        object_name, url = await async_minio.upload_qrcode(
             qr_data=qr_data,
             qr_type="artistic",
             file_extension="png"
@@ -291,7 +291,7 @@ async def generate_animated_qr(
             qr_data = f.read()
 
         # 上传到MinIO
-        object_name, url = minio_service.upload_qrcode(
+        object_name, url = await async_minio.upload_qrcode(
             qr_data=qr_data,
             qr_type="animated",
             file_extension="gif"
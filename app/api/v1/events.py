@@ -0,0 +1,214 @@
+# !/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+@Version  : Python 3.12
+@Time     : 2026/10/19 18:45
+@Author   : wieszheng
+@Software : PyCharm
+"""
+import json
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.enums import VideoStatus
+from app.models.task import Task, TaskVideo
+from app.models.video import Video, BatchUpload
+from app.services.event_broker import event_broker
+from app.services.progress_service import (progress_service, video_channel,
+                                           batch_channel, task_channel)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# 处理流程结束的状态
+_FINAL_STATUSES = {
+    VideoStatus.PENDING_REVIEW.value,
+    VideoStatus.REVIEWED.value,
+    VideoStatus.COMPLETED.value,
+    VideoStatus.FAILED.value,
+    VideoStatus.CANCELLED.value
+}
+
+_SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"
+}
+
+Snapshot = Tuple[dict, Dict[str, str]]
+
+
+def _format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _video_states(videos: List[Video]) -> List[dict]:
+    """视频当前状态(Redis中的实时进度覆盖数据库值)"""
+    try:
+        cached = await progress_service.aget_many([v.id for v in videos])
+    except Exception as e:
+        logger.warning(f"Failed to read progress from redis: {e}")
+        cached = {}
+
+    states = []
+    for video in videos:
+        data = cached.get(video.id)
+        if data:
+            states.append({
+                "video_id": video.id,
+                "status": data["status"],
+                "progress": int(data.get("progress") or 0),
+                "current_step": data.get("current_step") or "",
+                "task_id": data.get("task_id") or video.task_id or "",
+                "error_message": data.get("error_message") or None
+            })
+        else:
+            states.append({
+                "video_id": video.id,
+                "status": video.status.value,
+                "progress": video.progress or 0,
+                "current_step": video.current_step or "",
+                "task_id": video.task_id or "",
+                "error_message": video.error_message
+            })
+    return states
+
+
+async def _event_stream(
+        request: Request,
+        channels: List[str],
+        load_snapshot: Callable[[], Awaitable[Snapshot]],
+        close_when_done: bool
+):
+    """
+    SSE事件流
+
+    先订阅再读取快照，保证快照之后的事件不会丢失
+
+    Args:
+    request: 请求对象(用于检测断开)
+    channels: 订阅的频道
+    load_snapshot: 返回(快照数据, {video_id: status})
+    close_when_done: 所有视频处理结束后是否关闭连接
+    """
+    queue = await event_broker.subscribe(channels)
+    try:
+        snapshot, statuses = await load_snapshot()
+        yield f"retry: {settings.SSE_HEARTBEAT_SECONDS * 1000}\n\n"
+        yield _format_sse("snapshot", snapshot)
+
+        pending = {vid for vid, status in statuses.items()
+                   if status not in _FINAL_STATUSES}
+        if close_when_done and not pending:
+            yield _format_sse("done", {})
+            return
+
+        while True:
+            try:
+                event = await asyncio.wait_for(
+                    queue.get(), timeout=settings.SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": ping\n\n"
+                continue
+
+            yield _format_sse(event.pop("event", "progress"), event)
+
+            if event.get("status") in _FINAL_STATUSES:
+                pending.discard(event.get("video_id"))
+            elif event.get("status"):
+                pending.add(event.get("video_id"))
+
+            if close_when_done and not pending:
+                yield _format_sse("done", {})
+                break
+    finally:
+        await event_broker.unsubscribe(channels, queue)
+
+
+def _sse_response(generator) -> StreamingResponse:
+    return StreamingResponse(generator, media_type="text/event-stream",
+                             headers=_SSE_HEADERS)
+
+
+# SSE连接生命周期很长，不使用依赖注入的会话，只在读取快照时短暂占用连接
+
+@router.get("/video/{video_id}", summary="订阅视频处理进度")
+async def stream_video_events(video_id: str, request: Request):
+    """
+    推送单个视频的进度与状态变化
+
+    - snapshot: 连接建立时的当前状态
+    - progress / status: 进度更新与状态转换
+    - done: 处理结束后关闭连接
+    """
+    async with AsyncSessionLocal() as db:
+        if not await db.get(Video, video_id):
+            raise HTTPException(status_code=404, detail="视频不存在")
+
+    async def load_snapshot() -> Snapshot:
+        async with AsyncSessionLocal() as db:
+            video = await db.get(Video, video_id)
+            states = await _video_states([video])
+        return states[0], {video_id: states[0]["status"]}
+
+    return _sse_response(_event_stream(
+        request, [video_channel(video_id)], load_snapshot,
+        close_when_done=True))
+
+
+@router.get("/batch/{batch_id}", summary="订阅批次处理进度")
+async def stream_batch_events(batch_id: str, request: Request):
+    """推送批次内所有视频的进度，全部处理结束后关闭连接"""
+    async with AsyncSessionLocal() as db:
+        if not await db.get(BatchUpload, batch_id):
+            raise HTTPException(status_code=404, detail="批次不存在")
+
+    async def load_snapshot() -> Snapshot:
+        async with AsyncSessionLocal() as db:
+            batch = await db.get(BatchUpload, batch_id)
+            result = await db.execute(
+                select(Video).where(Video.batch_id == batch_id))
+            states = await _video_states(list(result.scalars().all()))
+        snapshot = {
+            "batch_id": batch_id,
+            "total_count": batch.total_count,
+            "videos": states
+        }
+        return snapshot, {s["video_id"]: s["status"] for s in states}
+
+    return _sse_response(_event_stream(
+        request, [batch_channel(batch_id)], load_snapshot,
+        close_when_done=True))
+
+
+@router.get("/task/{task_id}", summary="订阅任务处理进度")
+async def stream_task_events(task_id: str, request: Request):
+    """推送任务内所有视频的进度(任务可持续追加视频，连接不自动关闭)"""
+    async with AsyncSessionLocal() as db:
+        if not await db.get(Task, task_id):
+            raise HTTPException(status_code=404, detail="任务不存在")
+
+    async def load_snapshot() -> Snapshot:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Video)
+                .join(TaskVideo, TaskVideo.video_id == Video.id)
+                .where(TaskVideo.task_id == task_id)
+                .order_by(TaskVideo.sequence)
+            )
+            states = await _video_states(list(result.scalars().all()))
+        snapshot = {"task_id": task_id, "videos": states}
+        return snapshot, {s["video_id"]: s["status"] for s in states}
+
+    return _sse_response(_event_stream(
+        request, [task_channel(task_id)], load_snapshot,
+        close_when_done=False))
@@ -51,6 +51,8 @@ async def create_project(
     - created_by: 创建人
     - start_date: 开始日期（可选）
     - end_date: 结束日期（可选）
+    - processing_weight: 公平调度权重（可选，默认1）
+    - max_concurrency: 同时处理的视频数上限（可选）
     """
     # 检查项目代码是否已存在
     if project_in.code:
@@ -71,6 +73,8 @@ async def create_project(
         created_by=project_in.created_by,
         start_date=project_in.start_date,
         end_date=project_in.end_date,
+        processing_weight=project_in.processing_weight,
+        max_concurrency=project_in.max_concurrency,
         status=ProjectStatus.ACTIVE
     )
 
@@ -398,6 +402,8 @@ async def _build_project_response(db: AsyncSession, project: Project) -> Project
         start_date=project.start_date,
         end_date=project.end_date,
         archived_at=project.archived_at,
+        processing_weight=project.processing_weight or 1,
+        max_concurrency=project.max_concurrency,
         statistics=statistics,
         tasks=task_briefs
     )
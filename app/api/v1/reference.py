@@ -0,0 +1,158 @@
+# !/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+@Version  : Python 3.12
+@Time     : 2026/10/19 14:45
+@Author   : wieszheng
+@Software : PyCharm
+"""
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+from fastapi import APIRouter, HTTPException, Depends, Form, File, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, or_
+from typing import List
+import uuid
+import logging
+
+from app.database import get_async_db
+from app.models.project import Project
+from app.models.reference import ReferenceScreen
+from app.models.task import Task
+from app.schemas.reference import ReferenceScreenResponse
+from app.services.fingerprint import fingerprint_image, phash_to_hex
+from app.services.async_storage import async_minio
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.post("", response_model=ReferenceScreenResponse,
+             summary="上传参考画面")
+async def create_reference_screen(
+        name: str = Form(..., description="参考画面名称", min_length=1),
+        project_id: str = Form(None, description="所属项目ID（可选）"),
+        task_id: str = Form(None, description="所属任务ID（可选）"),
+        created_by: str = Form(None, description="创建人"),
+        image: UploadFile = File(..., description="加载完成画面截图"),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """
+    上传项目或任务的标准加载完成画面
+
+    - 预计算感知哈希与缩略直方图
+    - 处理视频时优先使用参考画面确定尾帧
+    """
+    if not project_id and not task_id:
+        raise HTTPException(status_code=400, detail="项目ID和任务ID至少提供一个")
+
+    if project_id and not await db.get(Project, project_id):
+        raise HTTPException(status_code=404, detail="指定的项目不存在")
+    if task_id and not await db.get(Task, task_id):
+        raise HTTPException(status_code=404, detail="指定的任务不存在")
+
+    file_ext = Path(image.filename).suffix.lower()
+    if file_ext not in ['.png', '.jpg', '.jpeg']:
+        raise HTTPException(status_code=400,
+                            detail="不支持的图片格式，请上传 PNG 或 JPG 文件")
+
+    image_data = await image.read()
+    img = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise HTTPException(status_code=400, detail="无法解析图片")
+
+    fingerprint = fingerprint_image(img)
+
+    reference_id = str(uuid.uuid4())
+    object_name, url = await async_minio.upload_reference_image(
+        reference_id, image_data, file_ext.lstrip('.')
+    )
+
+    reference = ReferenceScreen(
+        id=reference_id,
+        name=name,
+        project_id=project_id,
+        task_id=task_id,
+        object_name=object_name,
+        minio_url=url,
+        width=img.shape[1],
+        height=img.shape[0],
+        phash=phash_to_hex(fingerprint["phash"]),
+        histogram=[float(v) for v in fingerprint["histogram"]],
+        created_by=created_by,
+        created_at=datetime.utcnow()
+    )
+    db.add(reference)
+    await db.commit()
+
+    logger.info(
+        f"参考画面已创建: {reference_id}, project={project_id}, "
+        f"task={task_id}, phash={reference.phash}")
+
+    return _build_reference_response(reference)
+
+
+@router.get("", response_model=List[ReferenceScreenResponse],
+            summary="获取参考画面列表")
+async def list_reference_screens(
+        project_id: str = None,
+        task_id: str = None,
+        db: AsyncSession = Depends(get_async_db)
+):
+    """查询项目或任务的参考画面"""
+    if not project_id and not task_id:
+        raise HTTPException(status_code=400, detail="项目ID和任务ID至少提供一个")
+
+    conditions = []
+    if project_id:
+        conditions.append(ReferenceScreen.project_id == project_id)
+    if task_id:
+        conditions.append(ReferenceScreen.task_id == task_id)
+
+    stmt = select(ReferenceScreen).where(or_(*conditions)).order_by(
+        ReferenceScreen.created_at.desc())
+    result = await db.execute(stmt)
+
+    return [_build_reference_response(r) for r in result.scalars().all()]
+
+
+@router.delete("/{reference_id}", summary="删除参考画面")
+async def delete_reference_screen(
+        reference_id: str,
+        db: AsyncSession = Depends(get_async_db)
+):
+    """删除参考画面及其截图"""
+    reference = await db.get(ReferenceScreen, reference_id)
+    if not reference:
+        raise HTTPException(status_code=404, detail="参考画面不存在")
+
+    await db.delete(reference)
+    await db.commit()
+
+    try:
+        await async_minio.delete_object(reference.object_name)
+    except Exception as e:
+        logger.error(f"Failed to delete reference image: {e}")
+
+    return {"message": "参考画面已删除", "reference_id": reference_id}
+
+
+def _build_reference_response(
+        reference: ReferenceScreen) -> ReferenceScreenResponse:
+    """构建参考画面响应"""
+    return ReferenceScreenResponse(
+        id=reference.id,
+        name=reference.name,
+        project_id=reference.project_id,
+        task_id=reference.task_id,
+        url=reference.minio_url,
+        width=reference.width,
+        height=reference.height,
+        phash=reference.phash,
+        created_by=reference.created_by,
+        created_at=reference.created_at
+    )
@@ -14,6 +14,7 @@ import logging
 import uuid
 
 from app.database import get_async_db
+from app.services.progress_service import progress_service
 from app.models.video import Video, Frame, FrameAnnotation, VideoStatus, FrameType, MarkingMethod
 from app.schemas.video import (
     VideoReviewResponse,
@@ -226,6 +227,7 @@ async def submit_frame_marking(
         video.review_notes = request.review_notes
 
         await db.commit()
+        await progress_service.apublish_state(video)
         await db.refresh(first_frame)
         await db.refresh(last_frame)
 
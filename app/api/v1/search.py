@@ -0,0 +1,150 @@
+# !/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+@Version  : Python 3.12
+@Time     : 2026/10/19 16:55
+@Author   : wieszheng
+@Software : PyCharm
+"""
+import asyncio
+import time
+
+import cv2
+import numpy as np
+from fastapi import APIRouter, HTTPException, Depends, Form, File, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+import logging
+
+from app.database import get_async_db
+from app.models.project import Project
+from app.models.video import Video, Frame
+from app.schemas.search import (
+    SimilarFrameItem,
+    SimilarFrameResponse,
+    PhashIndexInfo
+)
+from app.services.fingerprint import (fingerprint_image, hex_to_phash,
+                                      phash_to_hex)
+from app.services.phash_index import phash_index_service, MAX_QUERY_DISTANCE
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.post("/similar-frames", response_model=SimilarFrameResponse,
+             summary="跨视频检索相似帧")
+async def search_similar_frames(
+        project_id: str = Form(..., description="项目ID"),
+        frame_id: str = Form(None, description="以已有帧作为查询（可选）"),
+        max_distance: int = Form(8, ge=0, le=MAX_QUERY_DISTANCE,
+                                 description="最大汉明距离"),
+        limit: int = Form(50, ge=1, le=500, description="最多返回条数"),
+        image: UploadFile = File(None, description="查询图片（可选）"),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """
+    在项目的所有视频中检索与给定图片或帧相似的帧
+
+    - 提供 frame_id 或上传 image 二选一
+    - 基于感知哈希索引，距离越小越相似
+    """
+    if not frame_id and image is None:
+        raise HTTPException(status_code=400, detail="请提供帧ID或查询图片")
+
+    if not await db.get(Project, project_id):
+        raise HTTPException(status_code=404, detail="项目不存在")
+
+    start = time.perf_counter()
+
+    if frame_id:
+        frame = await db.get(Frame, frame_id)
+        if not frame:
+            raise HTTPException(status_code=404, detail="帧不存在")
+        if not frame.phash:
+            raise HTTPException(status_code=400, detail="该帧没有感知哈希")
+        query = hex_to_phash(frame.phash)
+    else:
+        image_data = await image.read()
+        img = cv2.imdecode(np.frombuffer(image_data, np.uint8),
+                           cv2.IMREAD_COLOR)
+        if img is None:
+            raise HTTPException(status_code=400, detail="无法解析图片")
+        query = fingerprint_image(img)["phash"]
+
+    index = await asyncio.to_thread(phash_index_service.load, project_id)
+    if index is None:
+        raise HTTPException(status_code=404, detail="项目尚未建立相似帧索引")
+
+    hits = index.search(query, max_distance=max_distance, limit=limit)
+    distances = {str(index.frame_ids[row]): distance for row, distance in hits}
+
+    frames = []
+    if distances:
+        stmt = (
+            select(Frame, Video.original_filename)
+            .join(Video, Video.id == Frame.video_id)
+            .where(Frame.id.in_(list(distances.keys())))
+        )
+        result = await db.execute(stmt)
+        frames = [
+            SimilarFrameItem(
+                frame_id=f.id,
+                video_id=f.video_id,
+                video_filename=filename,
+                frame_number=f.frame_number,
+                timestamp=f.timestamp,
+                url=f.minio_url,
+                distance=distances[f.id]
+            )
+            for f, filename in result.all()
+        ]
+        frames.sort(key=lambda item: (item.distance, item.video_id,
+                                      item.frame_number))
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    logger.info(
+        f"相似帧检索: project={project_id}, index_size={len(index)}, "
+        f"hits={len(frames)}, elapsed={elapsed_ms:.1f}ms")
+
+    return SimilarFrameResponse(
+        project_id=project_id,
+        query_phash=phash_to_hex(query),
+        index_size=len(index),
+        elapsed_ms=round(elapsed_ms, 2),
+        frames=frames
+    )
+
+
+@router.get("/phash-index/{project_id}", response_model=PhashIndexInfo,
+            summary="查询相似帧索引状态")
+async def get_phash_index_info(project_id: str):
+    """查询项目感知哈希索引的规模与构建时间"""
+    index = await asyncio.to_thread(phash_index_service.load, project_id)
+    if index is None:
+        return PhashIndexInfo(project_id=project_id, exists=False)
+
+    return PhashIndexInfo(
+        project_id=project_id,
+        exists=True,
+        size=len(index),
+        built_at=index.built_at
+    )
+
+
+@router.post("/phash-index/{project_id}/rebuild", summary="重建相似帧索引")
+async def rebuild_phash_index(
+        project_id: str,
+        db: AsyncSession = Depends(get_async_db)
+):
+    """手动触发项目感知哈希索引重建"""
+    from app.tasks.video_tasks import rebuild_phash_index as rebuild_task
+
+    if not await db.get(Project, project_id):
+        raise HTTPException(status_code=404, detail="项目不存在")
+
+    celery_task = rebuild_task.delay(project_id)
+
+    return {"message": "索引重建已提交", "project_id": project_id,
+            "task_id": celery_task.id}
@@ -11,7 +11,7 @@ from datetime import datetime, UTC
 from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import List
+from typing import List, Optional
 import uuid
 import logging
 
@@ -32,6 +32,8 @@ from app.schemas.task import (
 )
 from app.crud.task import task_crud, task_video_crud
 from app.crud.video import video_crud, frame_crud
+from app.services.scene_metrics import available_scene_metrics
+from app.services.progress_service import progress_service
 
 logger = logging.getLogger(__name__)
 
@@ -58,6 +60,8 @@ async def create_task(
         if not project:
             raise HTTPException(status_code=404, detail="指定的项目不存在")
 
+    _validate_scene_metrics(task_in.scene_metrics)
+
     task_id = str(uuid.uuid4())
 
     task = Task(
@@ -65,6 +69,7 @@ async def create_task(
         name=task_in.name,
         description=task_in.description,
         project_id=task_in.project_id,
+        scene_metrics=task_in.scene_metrics or None,
         created_by=task_in.created_by,
         status=TaskStatus.DRAFT
     )
@@ -129,6 +134,18 @@ async def list_tasks(
     ]
 
 
+@router.get("/scene-metrics", summary="获取可用的场景变化指标")
+async def list_scene_metrics():
+    """获取可配置到任务上的场景变化指标"""
+    from app.config import settings
+    from app.services.scene_metrics import parse_scene_metrics
+
+    return {
+        "metrics": available_scene_metrics(),
+        "default": parse_scene_metrics(settings.DEFAULT_SCENE_METRICS)
+    }
+
+
 @router.get("/{task_id}", response_model=TaskResponse, summary="获取任务详情")
 async def get_task(
         task_id: str,
@@ -160,6 +177,10 @@ async def update_task(
     if "status" in update_data:
         update_data["status"] = TaskStatus(update_data["status"])
 
+    if "scene_metrics" in update_data:
+        _validate_scene_metrics(update_data["scene_metrics"])
+        update_data["scene_metrics"] = update_data["scene_metrics"] or None
+
     task = await task_crud.update(db, db_obj=task, obj_in=update_data)
     await db.commit()
 
@@ -387,6 +408,8 @@ async def update_frame_marking(
     await task_crud.update_statistics(db, task_id)
 
     await db.commit()
+    if video:
+        await progress_service.apublish_state(video, task_id=task_id)
     await db.refresh(task_video)
 
     logger.info(
@@ -512,6 +535,19 @@ async def export_task_data(
 # 辅助函数
 # ============================================================
 
+def _validate_scene_metrics(scene_metrics: Optional[List[str]]):
+    """校验场景变化指标配置"""
+    if not scene_metrics:
+        return
+
+    unknown = [m for m in scene_metrics if m not in available_scene_metrics()]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"未知的场景变化指标: {', '.join(unknown)}"
+        )
+
+
 async def _build_task_response(db: AsyncSession, task: Task) -> TaskResponse:
     """构建任务响应"""
     from datetime import datetime
@@ -543,6 +579,7 @@ async def _build_task_response(db: AsyncSession, task: Task) -> TaskResponse:
         description=task.description,
         status=task.status.value,
         project_id=task.project_id,
+        scene_metrics=task.scene_metrics,
         created_by=task.created_by,
         created_at=task.created_at,
         updated_at=task.updated_at,
@@ -6,31 +6,56 @@
 @Time    : 2025/11/29 21:53
 @Software: PyCharm
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Form
+from fastapi import (APIRouter, UploadFile, File, HTTPException, Depends,
+                     Form, Query, Request, Header, Response)
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List
+from sqlalchemy import select, delete
+from typing import List, Optional
+from datetime import datetime
+import asyncio
 import uuid
-import aiofiles
 import os
 from pathlib import Path
+from urllib.parse import unquote_plus
 
 from app.crud.task import task_video_crud, task_crud
 from app.database import get_async_db
+from app.models.project import Project
 from app.models.task import TaskVideo, Task
-from app.models.video import Video, Frame, VideoStatus, FrameType, BatchUpload
+from app.models.video import (Video, Frame, FrameAnnotation, VideoStatus,
+                              FrameType, BatchUpload)
 from app.schemas.video import (
     VideoUploadResponse,
     BatchUploadResponse,
     VideoStatusResponse,
     BatchStatusResponse,
     TaskProgress,
+    BatchProgressRequest,
+    BatchProgressResponse,
+    BatchProgressSummary,
     CancelTaskResponse,
-    FrameResponse
+    FrameResponse,
+    ResumableUploadCreate,
+    ResumableUploadResponse,
+    DirectUploadCreate,
+    DirectUploadResponse
 )
-from app.tasks.video_tasks import process_video_frames_full
-from app.tasks.celery_app import celery_app
-from app.services.minio_service import minio_service
+from app.tasks.pipeline_tasks import dispatch_fair_share
+from app.tasks.video_tasks import cleanup_video_objects
+from app.services.progress_service import progress_service
+from app.services.batch_progress import batch_progress_service
+from app.services.fair_scheduler import fair_scheduler, tier_budgets
+from app.services.cancellation import arequest_cancel
+from app.services.upload_stream import (UploadTooLarge, iter_upload_file,
+                                        save_stream)
+from app.services.resumable_upload import (resumable_upload_service,
+                                           UploadConflict)
+from app.services.direct_upload import direct_upload_service
+from app.services.frame_renderer import frame_renderer, RENDER_FORMATS
+from app.services.async_storage import async_minio
+from app.services.cost_scheduler import (cost_scheduler, estimate_cost,
+                                         cost_tier)
+from app.services.video_processor import VideoProcessor
 from app.config import settings
 from celery.result import AsyncResult
 import logging
@@ -40,101 +65,566 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-@router.post("/upload", response_model=VideoUploadResponse,
-             summary="上传单个视频")
-async def upload_video(
-        file: UploadFile = File(..., description="视频文件"),
-        task_id: str = Form(None, description="关联的任务ID（可选）"),
-        db: AsyncSession = Depends(get_async_db)
-):
-    """上传单个视频文件"""
-    # 验证任务ID
-    if task_id:
-        task_stmt = select(Task).where(Task.id == task_id)
-        task_result = await db.execute(task_stmt)
-        task = task_result.scalar_one_or_none()
-        if not task:
-            raise HTTPException(status_code=404, detail=f"任务不存在: {task_id}")
-        logger.info(f"Video will be associated with task: {task_id}")
+_FINAL_STATUSES = {
+    VideoStatus.PENDING_REVIEW.value,
+    VideoStatus.REVIEWED.value,
+    VideoStatus.COMPLETED.value,
+    VideoStatus.FAILED.value,
+    VideoStatus.CANCELLED.value
+}
+
+
+async def _estimate_video_cost(video: Video, video_path: str):
+    """
+    探测视频信息并估算处理成本、档位与预计完成时间
+
+    探测失败(非有效视频)时抛出ValueError
+    """
+    try:
+        video_info = await asyncio.to_thread(
+            VideoProcessor.extract_video_info, video_path)
+    except Exception as e:
+        raise ValueError(f"无法解析视频文件: {e}")
+
+    video.duration = video_info["duration"]
+    video.fps = video_info["fps"]
+    video.width = video_info["width"]
+    video.height = video_info["height"]
+    video.total_frames = video_info["frame_count"]
+    video.estimated_cost = estimate_cost(video_info)
+    video.cost_tier = cost_tier(video.estimated_cost)
+    video.estimated_completion_at = await cost_scheduler.aestimate(
+        video.cost_tier, video.estimated_cost)
+
+
+async def _submit_video(video: Video, related_task_id: str = None,
+                        project_id: str = None) -> str:
+    """
+    视频作业进入所属项目的公平调度队列
+
+    Celery任务ID预先生成，调度器释放作业时沿用，
+    因此入队后即可通过 task_id 查询与取消
+
+    Returns:
+    Celery任务ID
+    """
+    celery_task_id = str(uuid.uuid4())
+    job = _video_job(video, related_task_id)
+    job["task_id"] = celery_task_id
+    await fair_scheduler.asubmit(project_id, job)
+    await cost_scheduler.aenqueue(video.cost_tier, video.estimated_cost)
+    dispatch_fair_share.delay()
+    return celery_task_id
+
+
+def _video_job(video: Video, related_task_id: str = None):
+    """调度作业参数(Worker从MinIO读取 source_object)"""
+    return {
+        "video_id": video.id,
+        "related_task_id": related_task_id,
+        "cost_tier": video.cost_tier,
+        "estimated_cost": video.estimated_cost,
+        "width": video.width,
+        "height": video.height,
+        "fps": video.fps,
+        "total_frames": video.total_frames,
+        "source_object": video.minio_path
+    }
+
 
-    file_ext = Path(file.filename).suffix.lower()
+def _is_short_clip(video: Video) -> bool:
+    """短视频合并为批处理作业，摊薄单任务的调度与初始化开销"""
+    return (video.duration is not None and
+            video.duration <= settings.SHORT_CLIP_MAX_SECONDS)
+
+
+async def _get_task(db: AsyncSession, task_id: str = None):
+    """验证关联任务"""
+    if not task_id:
+        return None
+    task_stmt = select(Task).where(Task.id == task_id)
+    task_result = await db.execute(task_stmt)
+    task = task_result.scalar_one_or_none()
+    if not task:
+        raise HTTPException(status_code=404, detail=f"任务不存在: {task_id}")
+    logger.info(f"Video will be associated with task: {task_id}")
+    return task
+
+
+def _check_extension(filename: str) -> str:
+    """校验扩展名"""
+    file_ext = Path(filename).suffix.lower()
     if file_ext not in settings.ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=400,
             detail=f"不支持的文件格式: {file_ext}"
         )
+    return file_ext
 
-    video_id = str(uuid.uuid4())
 
+def _upload_path(video_id: str, filename: str) -> str:
+    """校验扩展名并返回上传文件的落盘路径"""
+    file_ext = _check_extension(filename)
     os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-    temp_filename = f"{video_id}{file_ext}"
-    temp_path = os.path.join(settings.UPLOAD_DIR, temp_filename)
+    return os.path.join(settings.UPLOAD_DIR, f"{video_id}{file_ext}")
 
-    try:
-        async with aiofiles.open(temp_path, 'wb') as f:
-            content = await file.read()
-            file_size = len(content)
-
-            if file_size > settings.MAX_VIDEO_SIZE:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"文件过大: {file_size / 1024 / 1024:.2f}MB"
-                )
 
-            await f.write(content)
+async def _store_source(video: Video, local_path: str):
+    """探测通过后将本地暂存的视频写入MinIO，Worker从对象存储读取源视频"""
+    video.minio_path = await async_minio.upload_video(
+        video.id, local_path, video.filename)
+
 
+async def _register_upload(
+        db: AsyncSession,
+        video_id: str,
+        original_filename: str,
+        file_size: int,
+        content_hash: str = None,
+        task: Task = None,
+        local_path: str = None,
+        source_object: str = None
+) -> VideoUploadResponse:
+    """
+    已上传的视频: 创建记录、估算成本、提交调度并关联任务
+
+    - local_path: API本地暂存的文件，探测后写入MinIO(调用方负责删除)
+    - source_object: 已在MinIO中的对象，通过预签名URL探测
+
+    对同一 video_id 幂等(并发完成或登记失败后重试): 记录已存在时不再插入，
+    尚未提交调度的重新提交，已提交的直接返回
+    """
+    task_id = task.id if task else None
+    video = await db.get(Video, video_id)
+
+    if video is None:
         video = Video(
             id=video_id,
-            filename=temp_filename,
-            original_filename=file.filename,
+            filename=f"{video_id}{Path(original_filename).suffix.lower()}",
+            original_filename=original_filename,
             file_size=file_size,
+            content_hash=content_hash,
+            minio_path=source_object,
             status=VideoStatus.UPLOADING,
             progress=0,
             current_step="等待处理"
         )
 
+        probe_path = local_path
+        if source_object:
+            probe_path = await async_minio.get_object_url(source_object)
+
+        try:
+            await _estimate_video_cost(video, probe_path)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        if local_path:
+            await _store_source(video, local_path)
+
         db.add(video)
         await db.commit()
         await db.refresh(video)
 
-        celery_task = process_video_frames_full.delay(video_id, temp_path)
+    if not video.task_id:
+        celery_task_id = await _submit_video(
+            video, related_task_id=task_id,
+            project_id=task.project_id if task else None)
 
-        video.task_id = celery_task.id
+        video.task_id = celery_task_id
+        video.current_step = "排队等待调度"
+        await db.commit()
+        await progress_service.apublish_state(video)
+    else:
+        celery_task_id = video.task_id
+        logger.info(f"Video already registered: {video_id}")
+
+    # 如果有关联任务，添加到任务中
+    if task_id and not await db.scalar(select(TaskVideo.id).where(
+            TaskVideo.task_id == task_id, TaskVideo.video_id == video_id)):
+        task_video = TaskVideo(
+            id=str(uuid.uuid4()),
+            task_id=task_id,
+            video_id=video_id,
+        )
+        db.add(task_video)
+        await db.commit()
+        # 更新任务统计
+        await task_crud.update_statistics(db, task_id)
         await db.commit()
+        logger.info(f"Video {video_id} added to task {task_id}")
 
-        # 如果有关联任务，添加到任务中
-        if task_id:
-            task_video = TaskVideo(
-                id=str(uuid.uuid4()),
-                task_id=task_id,
-                video_id=video_id,
-            )
-            db.add(task_video)
-            await db.commit()
-            # 更新任务统计
-            from app.crud.task import task_crud
-            await task_crud.update_statistics(db, task_id)
-            await db.commit()
-            logger.info(f"Video {video_id} added to task {task_id}")
+    logger.info(f"Video uploaded: {video_id}, task: {celery_task_id}")
 
-        logger.info(f"Video uploaded: {video_id}, task: {celery_task.id}")
+    return VideoUploadResponse(
+        video_id=video_id,
+        task_id=celery_task_id,
+        status="processing",
+        message=f"视频上传成功,正在后台处理{' (已关联到任务)' if task_id else ''}",
+        estimated_cost=video.estimated_cost,
+        cost_tier=video.cost_tier,
+        estimated_completion_at=video.estimated_completion_at
+    )
 
-        return VideoUploadResponse(
-            video_id=video_id,
-            task_id=celery_task.id,
-            status="processing",
-            message=f"视频上传成功,正在后台处理{' (已关联到任务)' if task_id else ''}"
-        )
+
+async def _fail_registered(db: AsyncSession, video: Video, error: str):
+    """已落库但未能提交调度的视频标记失败并同步进度(失败只记录日志)"""
+    try:
+        await db.rollback()
+        video.status = VideoStatus.FAILED
+        video.error_message = error[:255]
+        video.progress = 0
+        await db.commit()
+        await progress_service.apublish_state(video)
+    except Exception as e:
+        logger.error(f"Failed to mark video failed: {video.id}, {e}")
+
+
+async def _save_and_register(db: AsyncSession, chunks, filename: str,
+                             task: Task = None) -> VideoUploadResponse:
+    """流式落盘、写入MinIO后登记视频，本地暂存文件总是删除"""
+    video_id = str(uuid.uuid4())
+    temp_path = _upload_path(video_id, filename)
+
+    try:
+        try:
+            file_size, content_hash = await save_stream(chunks, temp_path)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        return await _register_upload(db, video_id, filename, file_size,
+                                      content_hash, task,
+                                      local_path=temp_path)
 
     except HTTPException:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
         raise
     except Exception as e:
         logger.error(f"Upload failed: {e}")
+        raise HTTPException(status_code=500, detail=f"上传失败: {str(e)}")
+    finally:
         if os.path.exists(temp_path):
             os.remove(temp_path)
-        raise HTTPException(status_code=500, detail=f"上传失败: {str(e)}")
+
+
+def _reject_oversized(size):
+    """已知大小(Content-Length/multipart分片大小)超限时直接拒绝，不读取内容"""
+    if size is None:
+        return
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="无效的文件大小")
+    if size < 0:
+        raise HTTPException(status_code=400, detail="无效的文件大小")
+    if size > settings.MAX_VIDEO_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"文件过大: {size / 1024 / 1024:.2f}MB"
+        )
+
+
+@router.post("/upload", response_model=VideoUploadResponse,
+             summary="上传单个视频")
+async def upload_video(
+        file: UploadFile = File(..., description="视频文件"),
+        task_id: str = Form(None, description="关联的任务ID（可选）"),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """上传单个视频文件(按块写入磁盘，内存占用与文件大小无关)"""
+    task = await _get_task(db, task_id)
+    _reject_oversized(file.size)
+    return await _save_and_register(db, iter_upload_file(file),
+                                    file.filename, task)
+
+
+@router.post("/upload/stream", response_model=VideoUploadResponse,
+             summary="流式上传单个视频")
+async def upload_video_stream(
+        request: Request,
+        filename: str = Query(..., description="原始文件名"),
+        task_id: str = Query(None, description="关联的任务ID（可选）"),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """
+    以原始请求体上传视频(Content-Type: application/octet-stream)
+
+    不经过multipart解析与临时文件，边接收边写盘并计算SHA-256，
+    超过 MAX_VIDEO_SIZE 时立即中止接收
+    """
+    task = await _get_task(db, task_id)
+    _reject_oversized(request.headers.get("content-length"))
+    return await _save_and_register(db, request.stream(), filename, task)
+
+
+async def _register_object_upload(db: AsyncSession, state, task: Task,
+                                  forget, reopen=None) -> VideoUploadResponse:
+    """
+    登记已完整写入MinIO的上传
+
+    不是有效视频时删除对象并作废上传；其他失败保留上传状态(调用reopen)，
+    允许重试(_register_upload 对同一 video_id 幂等)
+
+    Args:
+    forget: 删除上传状态的协程函数
+    reopen: 释放登记权的协程函数(可选)
+    """
+    video_id = state["video_id"]
+    try:
+        result = await _register_upload(
+            db, video_id, state["filename"], state["length"],
+            task=task, source_object=state["object_name"])
+    except Exception as e:
+        if isinstance(e, HTTPException) and e.status_code == 400:
+            await forget(state["upload_id"])
+            _schedule_cleanup(video_id)
+        elif reopen is not None:
+            await reopen(state["upload_id"])
+        raise
+
+    await forget(state["upload_id"])
+    return result
+
+
+def _resumable_response(state, response: Response = None
+                        ) -> ResumableUploadResponse:
+    """断点续传状态响应(同时设置tus的 Upload-Offset/Upload-Length 头)"""
+    if response is not None:
+        response.headers["Upload-Offset"] = str(state["offset"])
+        response.headers["Upload-Length"] = str(state["length"])
+        response.headers["Cache-Control"] = "no-store"
+    return ResumableUploadResponse(
+        upload_id=state["upload_id"],
+        video_id=state["video_id"],
+        filename=state["filename"],
+        length=state["length"],
+        offset=state["offset"],
+        status=state["status"],
+        part_size=settings.RESUMABLE_PART_SIZE
+    )
+
+
+async def _get_resumable(upload_id: str):
+    state = await resumable_upload_service.get(upload_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="上传不存在或已过期")
+    return state
+
+
+@router.post("/uploads", response_model=ResumableUploadResponse,
+             summary="创建断点续传上传")
+async def create_resumable_upload(
+        upload_in: ResumableUploadCreate,
+        response: Response,
+        db: AsyncSession = Depends(get_async_db)
+):
+    """
+    创建断点续传上传
+
+    之后以 PATCH /uploads/{upload_id} 按偏移量追加数据，
+    中断后通过 HEAD/GET 查询偏移量续传，全部上传后调用 finalize
+    """
+    await _get_task(db, upload_in.task_id)
+    _check_extension(upload_in.filename)
+    _reject_oversized(upload_in.length)
+
+    state = await resumable_upload_service.create(
+        Path(upload_in.filename).name, upload_in.length, upload_in.task_id)
+    return _resumable_response(state, response)
+
+
+@router.api_route("/uploads/{upload_id}", methods=["GET", "HEAD"],
+                  response_model=ResumableUploadResponse,
+                  summary="查询断点续传偏移量")
+async def get_resumable_upload(upload_id: str, response: Response):
+    """查询已持久化的偏移量，客户端从该位置继续上传"""
+    return _resumable_response(await _get_resumable(upload_id), response)
+
+
+@router.patch("/uploads/{upload_id}", response_model=ResumableUploadResponse,
+              summary="追加上传数据")
+async def patch_resumable_upload(
+        upload_id: str,
+        request: Request,
+        response: Response,
+        upload_offset: int = Header(..., alias="Upload-Offset",
+                                    description="本次数据的起始偏移量")
+):
+    """
+    从 Upload-Offset 处追加请求体数据
+
+    数据按分片写入MinIO，返回的 offset 只包含已提交的分片；
+    连接中断时已提交的分片保留，未提交的尾部数据需要重传
+    """
+    await _get_resumable(upload_id)
+    try:
+        state = await resumable_upload_service.write(
+            upload_id, upload_offset, request.stream())
+    except UploadConflict as e:
+        raise HTTPException(status_code=409, detail=str(e),
+                            headers={"Upload-Offset": str(e.offset)})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="上传不存在或已过期")
+
+    return _resumable_response(state, response)
+
+
+@router.post("/uploads/{upload_id}/finalize",
+             response_model=VideoUploadResponse,
+             summary="完成断点续传上传")
+async def finalize_resumable_upload(
+        upload_id: str,
+        db: AsyncSession = Depends(get_async_db)
+):
+    """合并分片为原始视频对象，创建视频记录并进入处理队列"""
+    state = await _get_resumable(upload_id)
+    task = await _get_task(db, state["task_id"])
+
+    try:
+        state = await resumable_upload_service.complete(upload_id)
+    except UploadConflict as e:
+        raise HTTPException(status_code=409, detail=str(e),
+                            headers={"Upload-Offset": str(e.offset)})
+    except KeyError:
+        raise HTTPException(status_code=404, detail="上传不存在或已过期")
+
+    return await _register_object_upload(db, state, task,
+                                         resumable_upload_service.forget,
+                                         resumable_upload_service.reopen)
+
+
+@router.delete("/uploads/{upload_id}", summary="放弃断点续传上传")
+async def abort_resumable_upload(upload_id: str):
+    """放弃上传并删除已上传的分片"""
+    try:
+        aborted = await resumable_upload_service.abort(upload_id)
+    except UploadConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not aborted:
+        raise HTTPException(status_code=404, detail="上传不存在或已过期")
+    return {"message": "上传已取消", "upload_id": upload_id}
+
+
+@router.post("/direct-uploads", response_model=DirectUploadResponse,
+             summary="创建直传上传(预签名URL)")
+async def create_direct_upload(
+        upload_in: DirectUploadCreate,
+        db: AsyncSession = Depends(get_async_db)
+):
+    """
+    签发预签名PUT URL，客户端直接上传到MinIO，数据不经过API
+
+    - 单个URL: 以请求体PUT整个文件
+    - 多个URL(文件超过 DIRECT_UPLOAD_MULTIPART_THRESHOLD): 按分片号顺序各PUT part_size字节
+    - 上传后调用 complete，或由MinIO事件通知(/storage-events)自动完成
+    """
+    await _get_task(db, upload_in.task_id)
+    _check_extension(upload_in.filename)
+    _reject_oversized(upload_in.length)
+
+    state = await direct_upload_service.create(
+        Path(upload_in.filename).name, upload_in.length, upload_in.task_id)
+    return DirectUploadResponse(
+        upload_id=state["upload_id"],
+        video_id=state["video_id"],
+        object_name=state["object_name"],
+        urls=state["urls"],
+        part_size=settings.RESUMABLE_PART_SIZE if state["part_count"] else None,
+        expires_in=state["expires_in"]
+    )
+
+
+async def _complete_direct_upload(db: AsyncSession,
+                                  upload_id: str) -> VideoUploadResponse:
+    """确认直传完成，登记视频并进入处理队列"""
+    state = await direct_upload_service.get(upload_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="上传不存在或已过期")
+    task = await _get_task(db, state["task_id"])
+
+    try:
+        state = await direct_upload_service.complete(upload_id)
+    except UploadConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        await direct_upload_service.abort(upload_id)
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="上传不存在或已过期")
+
+    return await _register_object_upload(db, state, task,
+                                         direct_upload_service.forget,
+                                         direct_upload_service.reopen)
+
+
+@router.post("/direct-uploads/{upload_id}/complete",
+             response_model=VideoUploadResponse, summary="完成直传上传")
+async def complete_direct_upload(
+        upload_id: str,
+        db: AsyncSession = Depends(get_async_db)
+):
+    """校验对象(分片上传时先合并)，创建视频记录并进入处理队列"""
+    return await _complete_direct_upload(db, upload_id)
+
+
+@router.delete("/direct-uploads/{upload_id}", summary="放弃直传上传")
+async def abort_direct_upload(upload_id: str):
+    """放弃上传并删除已上传的分片或对象"""
+    try:
+        aborted = await direct_upload_service.abort(upload_id)
+    except UploadConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not aborted:
+        raise HTTPException(status_code=404, detail="上传不存在或已过期")
+    return {"message": "上传已取消", "upload_id": upload_id}
+
+
+@router.post("/storage-events", summary="MinIO对象创建事件通知")
+async def receive_storage_events(
+        request: Request,
+        authorization: str = Header(None),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """
+    接收MinIO Webhook事件，单PUT直传完成后自动登记视频(分片上传需调用complete)
+
+    MinIO配置示例:
+    mc admin config set local notify_webhook:video \\
+        endpoint=http://web:8000/api/v1/video/storage-events auth_token=<STORAGE_EVENT_TOKEN>
+    mc event add local/video-frames arn:minio:sqs::video:webhook --event put --suffix .mp4
+
+    本地模拟: 按相同格式POST {"Records": [{"eventName": "s3:ObjectCreated:Put",
+    "s3": {"bucket": {"name": ...}, "object": {"key": ...}}}]}
+    """
+    if not settings.STORAGE_EVENT_TOKEN or \
+            authorization != f"Bearer {settings.STORAGE_EVENT_TOKEN}":
+        raise HTTPException(status_code=403, detail="未授权的事件通知")
+
+    event = await request.json()
+    registered = []
+    for record in event.get("Records", []):
+        if not record.get("eventName", "").startswith("s3:ObjectCreated:"):
+            continue
+        s3 = record.get("s3", {})
+        if s3.get("bucket", {}).get("name") != settings.MINIO_BUCKET:
+            continue
+
+        object_name = unquote_plus(s3.get("object", {}).get("key", ""))
+        upload_id = await direct_upload_service.find_by_object(object_name)
+        if not upload_id:
+            continue
+
+        try:
+            result = await _complete_direct_upload(db, upload_id)
+            registered.append(result.video_id)
+        except HTTPException as e:
+            # 客户端已调用complete或分片尚未合并时跳过
+            logger.info(f"Storage event skipped: {object_name}, {e.detail}")
+        except Exception as e:
+            logger.error(f"Storage event failed: {object_name}, {e}")
+
+    return {"registered": registered}
 
 
 @router.post("/batch-upload", response_model=BatchUploadResponse,
@@ -151,7 +641,7 @@ async def batch_upload_videos(
     1. 验证任务ID（如果提供）
     2. 批量上传视频文件
     3. 自动关联到任务
-    4. 触发异步处理
+    4. 触发异步处理(短视频按 SHORT_CLIP_BATCH_SIZE 合并为批处理作业)
     """
 
     if not files:
@@ -176,11 +666,17 @@ async def batch_upload_videos(
     )
     db.add(batch)
     await db.commit()
+    await batch_progress_service.ainit(batch_id, len(files))
 
     upload_results = []
+    clip_groups = []
+    project_id = task.project_id if task_id else None
     os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
 
+    rejected = 0
     for file in files:
+        temp_path = None
+        saved = submitted = False
         try:
             file_ext = Path(file.filename).suffix.lower()
             if file_ext not in settings.ALLOWED_EXTENSIONS:
@@ -190,26 +686,28 @@ async def batch_upload_videos(
                     status="failed",
                     message=f"{file.filename}: 不支持的格式"
                 ))
+                rejected += 1
                 continue
 
             video_id = str(uuid.uuid4())
             temp_filename = f"{video_id}{file_ext}"
             temp_path = os.path.join(settings.UPLOAD_DIR, temp_filename)
 
-            async with aiofiles.open(temp_path, 'wb') as f:
-                content = await file.read()
-                file_size = len(content)
-
-                if file_size > settings.MAX_VIDEO_SIZE:
-                    upload_results.append(VideoUploadResponse(
-                        video_id="",
-                        task_id="",
-                        status="failed",
-                        message=f"{file.filename}: 文件过大"
-                    ))
-                    continue
-
-                await f.write(content)
+            try:
+                if file.size is not None and \
+                        file.size > settings.MAX_VIDEO_SIZE:
+                    raise UploadTooLarge(file.size, settings.MAX_VIDEO_SIZE)
+                file_size, content_hash = await save_stream(
+                    iter_upload_file(file), temp_path)
+            except UploadTooLarge:
+                upload_results.append(VideoUploadResponse(
+                    video_id="",
+                    task_id="",
+                    status="failed",
+                    message=f"{file.filename}: 文件过大"
+                ))
+                rejected += 1
+                continue
 
             video = Video(
                 id=video_id,
@@ -217,15 +715,48 @@ async def batch_upload_videos(
                 filename=temp_filename,
                 original_filename=file.filename,
                 file_size=file_size,
+                content_hash=content_hash,
                 status=VideoStatus.UPLOADING
             )
-            db.add(video)
-            await db.commit()
 
+            try:
+                await _estimate_video_cost(video, temp_path)
+            except ValueError as e:
+                upload_results.append(VideoUploadResponse(
+                    video_id="",
+                    task_id="",
+                    status="failed",
+                    message=f"{file.filename}: {e}"
+                ))
+                rejected += 1
+                continue
 
-            celery_task = process_video_frames_full.delay(video_id, temp_path)
-            video.task_id = celery_task.id
+            await _store_source(video, temp_path)
+            db.add(video)
             await db.commit()
+            # 记录已落库，之后的失败按视频失败计数
+            saved = True
+
+            if _is_short_clip(video):
+                # 全部文件处理完后再整组入队
+                if not clip_groups or \
+                        len(clip_groups[-1]["clips"]) >= \
+                        settings.SHORT_CLIP_BATCH_SIZE:
+                    group_task_id = str(uuid.uuid4())
+                    clip_groups.append({"slot_id": group_task_id,
+                                        "task_id": group_task_id,
+                                        "clips": [], "results": []})
+                clip_groups[-1]["clips"].append(_video_job(video, task_id))
+                clip_groups[-1]["results"].append(len(upload_results))
+                celery_task_id = clip_groups[-1]["task_id"]
+            else:
+                celery_task_id = await _submit_video(
+                    video, related_task_id=task_id, project_id=project_id)
+            submitted = True
+            video.task_id = celery_task_id
+            video.current_step = "排队等待调度"
+            await db.commit()
+            await progress_service.apublish_state(video)
 
             # 如果有关联任务，添加到任务中
             if task_id:
@@ -244,9 +775,12 @@ async def batch_upload_videos(
 
             upload_results.append(VideoUploadResponse(
                 video_id=video_id,
-                task_id=celery_task.id,
+                task_id=celery_task_id,
                 status="processing",
-                message=f"{file.filename} 上传成功{' (已关联到任务)' if task_id else ''}"
+                message=f"{file.filename} 上传成功{' (已关联到任务)' if task_id else ''}",
+                estimated_cost=video.estimated_cost,
+                cost_tier=video.cost_tier,
+                estimated_completion_at=video.estimated_completion_at
             ))
 
         except Exception as e:
@@ -257,6 +791,43 @@ async def batch_upload_videos(
                 status="failed",
                 message=f"{file.filename}: {str(e)}"
             ))
+            # 已提交调度的视频会继续处理，由处理结果计数
+            if not saved:
+                rejected += 1
+            elif not submitted:
+                await _fail_registered(db, video, str(e))
+        finally:
+            # 源视频已写入MinIO(或上传失败)，本地暂存文件不再需要
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    await batch_progress_service.areject(batch_id, rejected)
+
+    for group in clip_groups:
+        positions = group.pop("results")
+        try:
+            await fair_scheduler.asubmit(project_id, group)
+            for clip in group["clips"]:
+                await cost_scheduler.aenqueue(clip["cost_tier"],
+                                              clip["estimated_cost"])
+        except Exception as e:
+            logger.error(f"Failed to enqueue short clip batch: {e}")
+            for position in positions:
+                upload_results[position].status = "failed"
+                upload_results[position].message += f" (调度失败: {e})"
+            # 排队成本在提交成功后才登记，这里无需扣减
+            result = await db.execute(select(Video).where(
+                Video.id.in_([c["video_id"] for c in group["clips"]])))
+            failed_videos = result.scalars().all()
+            for video in failed_videos:
+                video.status = VideoStatus.FAILED
+                video.error_message = f"调度失败: {e}"[:255]
+                video.progress = 0
+            await db.commit()
+            for video in failed_videos:
+                await progress_service.apublish_state(video)
+    if clip_groups:
+        dispatch_fair_share.delay()
 
     return BatchUploadResponse(
         batch_id=batch_id,
@@ -299,6 +870,9 @@ async def get_video_status(
         error_message=video.error_message,
         progress=video.progress,
         current_step=video.current_step,
+        estimated_cost=video.estimated_cost,
+        cost_tier=video.cost_tier,
+        estimated_completion_at=video.estimated_completion_at,
         frames=[
             FrameResponse(
                 id=f.id,
@@ -314,13 +888,130 @@ async def get_video_status(
     )
 
 
+_PROGRESS_COLUMNS = {
+    "status": Video.status,
+    "progress": Video.progress,
+    "current_step": Video.current_step,
+    "task_id": Video.task_id,
+    "error_message": Video.error_message
+}
+
+
+def _normalize_progress_value(field: str, value):
+    """统一Redis与数据库返回值的类型"""
+    if field == "status" and isinstance(value, VideoStatus):
+        return value.value
+    if field == "progress":
+        return int(value or 0)
+    if field == "error_message":
+        return value or None
+    return value or ""
+
+
+@router.post("/progress:batch", response_model=BatchProgressResponse,
+             response_model_exclude_defaults=True, summary="批量查询处理进度")
+async def get_videos_progress(
+        request: BatchProgressRequest,
+        db: AsyncSession = Depends(get_async_db)
+):
+    """
+    批量查询视频处理进度
+
+    - 优先通过Redis pipeline(HMGET)读取，只返回请求的字段
+    - Redis中缺失的视频用一次 WHERE id IN (...) 查询补齐
+    """
+    video_ids = list(dict.fromkeys(request.video_ids))
+    fields = list(dict.fromkeys(request.fields or ["status", "progress"]))
+
+    try:
+        items = await progress_service.aget_fields(video_ids, fields)
+    except Exception as e:
+        logger.warning(f"Failed to read progress from redis: {e}")
+        items = {}
+
+    remaining = [vid for vid in video_ids if vid not in items]
+    if remaining:
+        stmt = select(Video.id, *[_PROGRESS_COLUMNS[f] for f in fields]).where(
+            Video.id.in_(remaining))
+        result = await db.execute(stmt)
+        for row in result.all():
+            items[row[0]] = dict(zip(fields, row[1:]))
+
+    return BatchProgressResponse(
+        items={
+            vid: {f: _normalize_progress_value(f, v) for f, v in
+                  items[vid].items()}
+            for vid in video_ids if vid in items
+        },
+        missing=[vid for vid in video_ids if vid not in items]
+    )
+
+
+@router.get("/batch/{batch_id}/progress", response_model=BatchProgressSummary,
+            summary="查询批次进度")
+async def get_batch_progress(
+        batch_id: str,
+        db: AsyncSession = Depends(get_async_db)
+):
+    """
+    查询批次进度(O(1))
+
+    计数由Worker在视频结束时写入Redis，Redis中不存在时读取回写到
+    batch_uploads 的计数
+    """
+    try:
+        counts = await batch_progress_service.aget(batch_id)
+    except Exception as e:
+        logger.warning(f"Failed to read batch counters from redis: {e}")
+        counts = None
+
+    if counts is None:
+        batch = await db.get(BatchUpload, batch_id)
+        if not batch:
+            raise HTTPException(status_code=404, detail="批次不存在")
+        counts = {
+            "total_count": batch.total_count,
+            "completed_count": batch.completed_count or 0,
+            "failed_count": batch.failed_count or 0
+        }
+
+    total = counts["total_count"]
+    finished = counts["completed_count"] + counts["failed_count"]
+    return BatchProgressSummary(
+        batch_id=batch_id,
+        processing_count=max(total - finished, 0),
+        progress=min(int(finished * 100 / total), 100) if total else 0,
+        **counts
+    )
+
+
 @router.get("/progress/{video_id}", response_model=TaskProgress,
             summary="查询处理进度")
 async def get_video_progress(
         video_id: str,
         db: AsyncSession = Depends(get_async_db)
 ):
-    """实时查询视频处理进度"""
+    """实时查询视频处理进度(优先读Redis，缺失时回退数据库)"""
+
+    try:
+        cached = await progress_service.aget(video_id)
+    except Exception as e:
+        logger.warning(f"Failed to read progress from redis: {e}")
+        cached = None
+
+    if cached:
+        eta_at = cached.get("eta_at")
+        return TaskProgress(
+            video_id=video_id,
+            task_id=cached.get("task_id", ""),
+            status=cached["status"],
+            progress=int(cached.get("progress") or 0),
+            current_step=cached.get("current_step") or "等待处理",
+            error_message=cached.get("error_message") or None,
+            eta_seconds=_eta_seconds(
+                cached["status"],
+                datetime.utcfromtimestamp(float(eta_at)) if eta_at else None)
+        )
 
     stmt = select(Video).where(Video.id == video_id)
     result = await db.execute(stmt)
@@ -335,10 +1026,60 @@ async def get_video_progress(
         status=video.status.value,
         progress=video.progress or 0,
         current_step=video.current_step or "等待处理",
-        error_message=video.error_message
+        error_message=video.error_message,
+        eta_seconds=_eta_seconds(video.status.value,
+                                 video.estimated_completion_at)
     )
 
 
+def _eta_seconds(status: str, completion_at: datetime = None):
+    """预计剩余秒数(已结束或未估算时为None)"""
+    if status in _FINAL_STATUSES or completion_at is None:
+        return None
+    return max(int((completion_at - datetime.utcnow()).total_seconds()), 0)
+
+
+@router.get("/queue/backlog", summary="查询各档位排队成本")
+async def get_queue_backlog():
+    """各成本档位(small/medium/large)当前排队的处理成本"""
+    try:
+        backlog = await cost_scheduler.abacklog()
+    except Exception as e:
+        logger.error(f"Failed to read queue backlog: {e}")
+        raise HTTPException(status_code=503, detail="调度状态暂不可用")
+    return {"unit": "megapixel_frames", "backlog": backlog}
+
+
+@router.get("/queue/projects", summary="查询各项目排队情况")
+async def get_project_queues(db: AsyncSession = Depends(get_async_db)):
+    """各项目的排队深度、在处理数量、最长等待时间与调度配置"""
+    try:
+        stats = await fair_scheduler.astats()
+    except Exception as e:
+        logger.error(f"Failed to read fair-share stats: {e}")
+        raise HTTPException(status_code=503, detail="调度状态暂不可用")
+
+    project_ids = [s["project_id"] for s in stats]
+    result = await db.execute(
+        select(Project.id, Project.name, Project.processing_weight,
+               Project.max_concurrency).where(Project.id.in_(project_ids)))
+    projects = {row.id: row for row in result}
+
+    for item in stats:
+        project = projects.get(item["project_id"])
+        item["project_name"] = project.name if project else None
+        item["processing_weight"] = (project.processing_weight
+                                     if project else 1) or 1
+        item["max_concurrency"] = (
+            project.max_concurrency if project and project.max_concurrency
+            else settings.FAIR_SHARE_DEFAULT_MAX_CONCURRENCY)
+
+    return {
+        "max_in_flight": tier_budgets(),
+        "projects": stats
+    }
+
+
 @router.post("/cancel/{video_id}", response_model=CancelTaskResponse,
              summary="取消任务")
 async def cancel_video_task(
@@ -361,20 +1102,23 @@ async def cancel_video_task(
             detail=f"无法取消已{video.status.value}的任务"
         )
 
-    if video.task_id:
-        celery_app.control.revoke(video.task_id, terminate=True,
-                                  signal='SIGKILL')
-        logger.info(f"Cancelled task: {video.task_id}")
+    # 协作式取消: Worker在下一个检查点发现标记后自行停止、清理并释放名额；
+    # 尚在调度队列中的作业由调度器跳过并结算成本。
+    # 不撤销Celery任务: task_id 是流水线最后一个阶段(finalize)，
+    # 撤销它会跳过名额与成本的释放
+    try:
+        await arequest_cancel(video_id)
+    except Exception as e:
+        logger.error(f"Failed to set cancel flag: {e}")
+        raise HTTPException(status_code=503, detail="取消失败，请稍后重试")
 
     video.status = VideoStatus.CANCELLED
     video.error_message = "任务已被用户取消"
     video.progress = 0
     await db.commit()
+    await progress_service.apublish_state(video)
 
-    try:
-        minio_service.delete_video_objects(video_id)
-    except Exception as e:
-        logger.error(f"Failed to clean up MinIO: {e}")
+    _schedule_cleanup(video_id)
 
     return CancelTaskResponse(
         video_id=video_id,
@@ -384,6 +1128,83 @@ async def cancel_video_task(
     )
 
 
+def _schedule_cleanup(video_id: str):
+    """投递后台任务删除视频在MinIO中的对象，响应不等待存储"""
+    try:
+        cleanup_video_objects.delay(video_id)
+    except Exception as e:
+        logger.error(f"Failed to schedule MinIO cleanup: {e}")
+
+
+@router.delete("/{video_id}", summary="删除视频")
+async def delete_video(
+        video_id: str,
+        db: AsyncSession = Depends(get_async_db)
+):
+    """删除视频及其帧、标注和任务关联，存储对象由后台任务清理"""
+    video = await db.get(Video, video_id)
+    if not video:
+        raise HTTPException(status_code=404, detail="视频不存在")
+
+    if video.status not in [VideoStatus.COMPLETED, VideoStatus.FAILED,
+                            VideoStatus.CANCELLED, VideoStatus.PENDING_REVIEW,
+                            VideoStatus.REVIEWED]:
+        # 处理中的视频先通知Worker停止，避免继续写入已删除的记录
+        try:
+            await arequest_cancel(video_id)
+        except Exception as e:
+            logger.error(f"Failed to set cancel flag: {e}")
+            raise HTTPException(status_code=503, detail="删除失败，请稍后重试")
+
+    task_ids = (await db.scalars(select(TaskVideo.task_id).where(
+        TaskVideo.video_id == video_id))).all()
+
+    await db.execute(delete(FrameAnnotation).where(
+        FrameAnnotation.video_id == video_id))
+    await db.execute(delete(Frame).where(Frame.video_id == video_id))
+    await db.execute(delete(TaskVideo).where(TaskVideo.video_id == video_id))
+    await db.execute(delete(Video).where(Video.id == video_id))
+
+    for task_id in set(task_ids):
+        await task_crud.update_statistics(db, task_id)
+    await db.commit()
+
+    _schedule_cleanup(video_id)
+    logger.info(f"Deleted video: {video_id}")
+
+    return {"message": "视频已删除", "video_id": video_id}
+
+
+@router.get("/{video_id}/frame/{frame_number}", summary="按需渲染视频帧")
+async def render_video_frame(
+        video_id: str,
+        frame_number: int,
+        w: Optional[int] = Query(None, ge=16, le=7680,
+                                 description="输出宽度(等比缩小，不放大)"),
+        fmt: str = Query("jpeg", alias="format", pattern="^(jpeg|png|webp)$"),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """从原视频或代理视频渲染任意帧(多级缓存，同一帧并发请求只渲染一次)"""
+    video = await db.get(Video, video_id)
+    if not video or not video.minio_path:
+        raise HTTPException(status_code=404, detail="视频不存在")
+    if frame_number < 0 or (video.total_frames and
+                            frame_number >= video.total_frames):
+        raise HTTPException(status_code=404, detail="帧号超出范围")
+
+    try:
+        data = await frame_renderer.render(video, frame_number, w, fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Frame render failed: {video_id}#{frame_number}, {e}")
+        raise HTTPException(status_code=500, detail="帧渲染失败")
+
+    # 同一视频同一帧的内容不会变化
+    return Response(content=data, media_type=RENDER_FORMATS[fmt],
+                    headers={"Cache-Control": "public, max-age=86400"})
+
+
 @router.get("/list", summary="列出所有视频")
 async def list_videos(
         skip: int = 0,
@@ -56,6 +56,7 @@ class Settings(BaseSettings):
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
+    REDIS_SOCKET_TIMEOUT: float = 5.0
     CELERY_BROKER_URL: str = ""
     CELERY_RESULT_BACKEND: str = ""
 
@@ -65,16 +66,110 @@ class Settings(BaseSettings):
     MINIO_SECRET_KEY: str = "minio123"
     MINIO_BUCKET: str = "video-frames"
     MINIO_SECURE: bool = False
+    MINIO_HTTP_POOL_SIZE: int = 10  # 每个主机的keep-alive连接数
+    MINIO_HTTP_TIMEOUT: int = 60  # 读超时(秒)
+    MINIO_UPLOAD_THREADS: int = 32  # 进程内共享的上传线程数
+    MINIO_UPLOAD_CONCURRENCY: int = 8  # 单次批量上传的在途请求上限
+    MINIO_UPLOAD_RETRIES: int = 3  # 临时错误的重试次数
+    MINIO_UPLOAD_BACKOFF_SECONDS: float = 0.2  # 重试退避基数(全抖动)
+    MINIO_ASYNC_THREADS: int = 16  # API进程中执行MinIO调用的线程数
 
     # 上传配置
-    UPLOAD_DIR: str = "/tmp/video_uploads"
+    UPLOAD_DIR: str = "/tmp/video_uploads"  # API本地暂存，探测后写入MinIO
     MAX_VIDEO_SIZE: int = 500 * 1024 * 1024  # 500MB
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # 流式写入的块大小
     ALLOWED_EXTENSIONS: str = ".mp4"
 
+    # 断点续传配置
+    RESUMABLE_PART_SIZE: int = 8 * 1024 * 1024  # 分片大小(S3要求除末片外不小于5MiB)
+    RESUMABLE_UPLOAD_TTL_SECONDS: int = 24 * 3600  # 未完成上传的保留时间
+    RESUMABLE_LOCK_MS: int = 10 * 60 * 1000  # 单个PATCH请求的最长写入时间
+
+    # 直传配置(客户端通过预签名URL直接上传到MinIO)
+    DIRECT_UPLOAD_URL_EXPIRES: int = 3600  # 预签名URL有效期(秒)
+    DIRECT_UPLOAD_MULTIPART_THRESHOLD: int = 64 * 1024 * 1024  # 超过时改用分片上传
+    STORAGE_EVENT_TOKEN: str = ""  # MinIO事件通知的auth_token，为空时不接收通知
+
+    # 源视频缓存(Worker节点本地，按需从MinIO下载)
+    SOURCE_CACHE_DIR: str = "/var/cache/video_sources"
+    SOURCE_CACHE_MAX_BYTES: int = 20 * 1024 * 1024 * 1024  # 超过时按LRU淘汰
+
+    # 分析代理视频(低分辨率全I帧，随机访问只需解码一帧)
+    PROXY_ENABLED: bool = True
+    PROXY_MAX_HEIGHT: int = 360
+    PROXY_JPEG_QUALITY: int = 70
+
+    # 按需渲染帧(Redis热点缓存 + 节点本地磁盘LRU)
+    RENDER_CACHE_DIR: str = "/var/cache/frame_renders"
+    RENDER_CACHE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024  # 超过时按LRU淘汰
+    RENDER_CACHE_SCAN_INTERVAL: int = 300  # 估算未超限时也定期扫描(其他进程的写入)
+    RENDER_HOT_TTL_SECONDS: int = 600
+    RENDER_HOT_MAX_BYTES: int = 512 * 1024  # 超过时只写磁盘缓存
+    RENDER_LOCK_MS: int = 10 * 1000  # 同一帧只渲染一次的跨进程锁
+    RENDER_THREADS: int = 4  # API进程内解码渲染的线程数
+
     # 并发配置
     MAX_CONCURRENT_UPLOADS: int = 5
     CELERY_WORKER_CONCURRENCY: int = 3
 
+    # 处理流水线配置
+    PIPELINE_SPOOL_DIR: str = "/tmp/video_uploads/spool"  # 阶段间帧暂存目录(节点本地，提取之后的阶段路由到同节点队列)
+    FRAME_SAMPLING_RATE: int = 2  # 帧采样率(每N帧提取1帧)
+    SHORT_CLIP_MAX_SECONDS: float = 10  # 不超过该时长的视频在批量上传时合并处理
+    SHORT_CLIP_BATCH_SIZE: int = 8  # 每个短视频批处理作业的视频数
+
+    # Worker预热配置
+    WORKER_WARMUP_ENABLED: bool = True  # 子进程初始化时预热OpenCV/连接池/帧缓冲
+    WORKER_WARMUP_CLIP: str = "/tmp/video_uploads/warmup.mp4"  # 预热用的小视频(首次启动时生成)
+    WORKER_FRAME_BUFFER_SIZE: str = "1920x1080"  # 预分配帧缓冲的分辨率
+
+    # 成本调度配置(成本单位: 百万像素帧)
+    COST_TIER_SMALL_MAX: float = 2000  # 约1分钟1080p30
+    COST_TIER_MEDIUM_MAX: float = 20000  # 约10分钟1080p30
+    COST_SECONDS_PER_UNIT: float = 0.01  # 未校准时每单位成本的处理秒数
+    COST_RATE_ALPHA: float = 0.2  # 处理速率滑动平均系数
+
+    # 公平调度配置(按项目加权轮询释放作业)
+    FAIR_SHARE_MAX_IN_FLIGHT_SMALL: int = 6  # small档位同时处理的视频数上限
+    FAIR_SHARE_MAX_IN_FLIGHT_MEDIUM: int = 4  # medium档位同时处理的视频数上限
+    FAIR_SHARE_MAX_IN_FLIGHT_LARGE: int = 2  # large档位同时处理的视频数上限
+    FAIR_SHARE_DEFAULT_MAX_CONCURRENCY: int = 4  # 项目未配置时每个档位的并发上限
+    FAIR_SHARE_DISPATCH_INTERVAL: int = 2  # 定时调度间隔(秒)
+    FAIR_SHARE_LOCK_MS: int = 15000  # 调度锁超时(毫秒，每派发一个作业续期)
+    FAIR_SHARE_HEARTBEAT_SECONDS: int = 30  # 处理阶段刷新占用心跳的最小间隔
+    FAIR_SHARE_RUNNING_TTL_SECONDS: int = 900  # 超过该时间无心跳的占用视为失效(Worker异常退出兜底)
+
+    # 内存准入配置(同一节点上所有Worker进程共享预算)
+    WORKER_NODE_NAME: str = ""  # 节点标识(默认主机名；同一节点的所有Worker需一致，用于内存预算与节点专用队列)
+    WORKER_MEMORY_BUDGET_MB: int = 3072  # 节点上并发任务可使用的内存总量
+    MEMORY_DECODER_FRAMES: int = 8  # 解码器内部缓存的参考帧数
+    MEMORY_JPEG_RATIO: float = 0.1  # JPEG大小与原始BGR帧之比
+    MEMORY_FRAME_INFO_BYTES: int = 2048  # 每个采样帧保留的特征信息
+    MEMORY_ADMISSION_RETRY_SECONDS: int = 5  # 预算不足时延迟重试的间隔
+    MEMORY_LEASE_TTL_SECONDS: int = 30 * 60  # 预留租约过期时间(与任务硬超时一致)
+    MEMORY_RATIO_ALPHA: float = 0.2  # 估算系数滑动平均系数
+    MEMORY_RATIO_MIN: float = 0.5  # 估算系数下限
+    MEMORY_RATIO_MAX: float = 4.0  # 估算系数上限
+
+    # 取消配置
+    CANCEL_CHECK_EVERY_FRAMES: int = 10  # 处理循环每N帧检查一次取消标记
+    CANCEL_FLAG_TTL_SECONDS: int = 3600  # 取消标记过期时间
+
+    # 帧分析配置
+    DEFAULT_SCENE_METRICS: str = "brightness"  # 默认场景变化指标(逗号分隔)
+    FRAME_INSERT_BATCH_SIZE: int = 500  # 帧记录批量写入的行数
+
+    # 进度上报配置
+    PROGRESS_TTL_SECONDS: int = 24 * 3600  # Redis进度哈希过期时间
+    PROGRESS_MAX_WRITES_PER_SECOND: int = 5  # 单个视频每秒最多写入次数
+    SSE_HEARTBEAT_SECONDS: int = 15  # SSE心跳间隔
+    BATCH_FLUSH_INTERVAL_SECONDS: int = 10  # 批次计数回写数据库的间隔
+    SSE_QUEUE_SIZE: int = 100  # 单个SSE连接的事件缓冲上限
+
+    # 相似帧检索配置
+    PHASH_INDEX_REFRESH_SECONDS: int = 30  # API进程检查索引更新的间隔
+    PHASH_INDEX_REBUILD_DELAY: int = 60  # 视频处理完成后延迟重建索引(合并多次请求)
+
     @property
     def SYNC_DATABASE_URL(self) -> str:
         """
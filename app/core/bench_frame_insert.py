@@ -0,0 +1,134 @@
+# !/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+@Version  : Python 3.12
+@Time     : 2026/10/19 17:10
+@Author   : wieszheng
+@Software : PyCharm
+"""
+import argparse
+import random
+import time
+import uuid
+
+from sqlalchemy import create_engine, insert, update, delete
+from sqlalchemy.orm import sessionmaker
+
+from app.models.base import Base
+from app.models.video import Video, Frame, FrameType
+
+
+def make_rows(video_id, count):
+    """构造模拟帧记录"""
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "video_id": video_id,
+            "frame_number": i * 2,
+            "timestamp": i * 2 / 30.0,
+            "minio_url": f"http://minio/frames/{video_id}/frame_{i * 2}.jpg",
+            "brightness": random.uniform(0, 255),
+            "sharpness": random.uniform(0, 500),
+            "scene_change_score": random.random(),
+            "phash": f"{random.getrandbits(64):016x}"
+        }
+        for i in range(count)
+    ]
+
+
+def run_orm(session_factory, video_id, rows, candidates):
+    """原实现: 逐帧add，每100帧提交，再全量回查逐行更新"""
+    db = session_factory()
+    try:
+        for i, row in enumerate(rows, 1):
+            data = {k: v for k, v in row.items() if k != "scene_change_score"}
+            db.add(Frame(**data))
+            if i % 100 == 0:
+                db.commit()
+        db.commit()
+
+        all_frames = db.query(Frame).filter(
+            Frame.video_id == video_id).order_by(Frame.frame_number).all()
+        for frame, row in zip(all_frames, rows):
+            frame.scene_change_score = row["scene_change_score"]
+        db.commit()
+
+        all_frames[0].frame_type = FrameType.FIRST
+        all_frames[-1].frame_type = FrameType.LAST
+        for idx in candidates:
+            all_frames[idx].is_first_candidate = True
+            all_frames[idx].confidence_score = 0.5
+        db.commit()
+    finally:
+        db.close()
+
+
+def run_bulk(session_factory, video_id, rows, candidates, batch_size):
+    """新实现: 批量INSERT(含特征)，一次按主键批量UPDATE标记"""
+    db = session_factory()
+    try:
+        for start in range(0, len(rows), batch_size):
+            db.execute(insert(Frame), rows[start:start + batch_size])
+            db.commit()
+
+        template = {"frame_type": None, "is_first_candidate": False,
+                    "is_last_candidate": False, "confidence_score": None}
+        marks = {}
+        marks[0] = dict(template, id=rows[0]["id"], frame_type=FrameType.FIRST)
+        marks[len(rows) - 1] = dict(template, id=rows[-1]["id"],
+                                    frame_type=FrameType.LAST)
+        for idx in candidates:
+            marks.setdefault(idx, dict(template, id=rows[idx]["id"])).update(
+                is_first_candidate=True, confidence_score=0.5)
+        db.execute(update(Frame), list(marks.values()))
+        db.commit()
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="帧记录写入基准测试")
+    parser.add_argument("--url", default="sqlite:///./bench_frames.db",
+                        help="同步数据库URL(mysql+pymysql / postgresql+psycopg2)")
+    parser.add_argument("--frames", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    Base.metadata.create_all(engine, tables=[Video.__table__,
+                                             Frame.__table__])
+    session_factory = sessionmaker(bind=engine)
+
+    candidates = random.sample(range(args.frames), 10)
+    results = {}
+
+    for name in ("orm", "bulk"):
+        video_id = str(uuid.uuid4())
+        rows = make_rows(video_id, args.frames)
+
+        with session_factory() as db:
+            db.add(Video(id=video_id, filename=f"bench_{name}.mp4"))
+            db.commit()
+
+        start = time.perf_counter()
+        if name == "orm":
+            run_orm(session_factory, video_id, rows, candidates)
+        else:
+            run_bulk(session_factory, video_id, rows, candidates,
+                     args.batch_size)
+        results[name] = time.perf_counter() - start
+
+        with session_factory() as db:
+            db.execute(delete(Frame).where(Frame.video_id == video_id))
+            db.execute(delete(Video).where(Video.id == video_id))
+            db.commit()
+
+    print(f"数据库: {engine.dialect.name}, 帧数: {args.frames}")
+    for name, elapsed in results.items():
+        print(f"  {name:5s}: {elapsed:.3f}s "
+              f"({args.frames / elapsed:.0f} 帧/秒)")
+    print(f"  加速比: {results['orm'] / results['bulk']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
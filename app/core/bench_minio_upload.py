@@ -0,0 +1,68 @@
+# !/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+@Version  : Python 3.12
+@Time     : 2026/10/19 23:50
+@Author   : wieszheng
+@Software : PyCharm
+
+本地启动MinIO后运行:
+docker run -p 9000:9000 minio/minio server /data
+python -m app.core.bench_minio_upload --endpoint localhost:9000
+"""
+import argparse
+import os
+import time
+import uuid
+
+from app.config import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MinIO帧上传吞吐基准测试")
+    parser.add_argument("--endpoint", default="localhost:9000")
+    parser.add_argument("--access-key", default="minioadmin")
+    parser.add_argument("--secret-key", default="minioadmin")
+    parser.add_argument("--bucket", default="bench-frames")
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--size", type=int, default=60 * 1024,
+                        help="单帧字节数(1080p JPEG约60KB)")
+    parser.add_argument("--concurrency", default="1,8,32")
+    args = parser.parse_args()
+
+    levels = [int(c) for c in args.concurrency.split(",")]
+    settings.MINIO_ENDPOINT = args.endpoint
+    settings.MINIO_ACCESS_KEY = args.access_key
+    settings.MINIO_SECRET_KEY = args.secret_key
+    settings.MINIO_BUCKET = args.bucket
+    settings.MINIO_UPLOAD_THREADS = max(levels)
+
+    from app.services.minio_service import MinIOService
+    service = MinIOService()
+
+    payload = os.urandom(args.size)
+    print(f"帧数: {args.frames}, 单帧: {args.size / 1024:.0f}KB")
+
+    for concurrency in levels:
+        video_id = f"bench-{uuid.uuid4()}"
+        frames = ((payload, f"frame_{i}", i / 30.0)
+                  for i in range(args.frames))
+
+        start = time.perf_counter()
+        if concurrency == 1:
+            # 原实现: 逐帧同步上传
+            for data, frame_type, timestamp in frames:
+                service.upload_frame(video_id, data, frame_type, timestamp)
+        else:
+            service.upload_frames_bulk(video_id, frames,
+                                       concurrency=concurrency)
+        elapsed = time.perf_counter() - start
+
+        mb = args.frames * args.size / 1024 / 1024
+        print(f"  并发 {concurrency:3d}: {elapsed:.2f}s, "
+              f"{args.frames / elapsed:.0f} 帧/秒, {mb / elapsed:.1f} MB/s")
+        service.delete_video_objects(video_id)
+
+
+if __name__ == "__main__":
+    main()
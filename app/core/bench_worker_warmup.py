@@ -0,0 +1,87 @@
+# !/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+@Version  : Python 3.12
+@Time     : 2026/10/19 22:50
+@Author   : wieszheng
+@Software : PyCharm
+"""
+import argparse
+import multiprocessing
+import statistics
+import time
+
+from app.tasks import worker_warmup
+
+
+class _FirstFrame(Exception):
+    """拿到首帧后中止提取"""
+
+
+def first_frame_seconds(video_path, connections):
+    """模拟首个任务: (可选)访问数据库/MinIO，然后解码并处理到第一帧"""
+    from app.services.frame_extractor import FrameExtractor
+
+    def stop(frame_data, frame_info):
+        raise _FirstFrame()
+
+    start = time.perf_counter()
+    if connections:
+        worker_warmup.warm_connections()
+    try:
+        FrameExtractor().extract_all_frames(video_path, stop, keep_data=False)
+    except _FirstFrame:
+        pass
+    return time.perf_counter() - start
+
+
+def child(mode, video_path, connections, queue):
+    """新fork的子进程: warm模式先执行worker_process_init的预热"""
+    worker_warmup.reset_connections()
+    warmup = 0.0
+    if mode == "warm":
+        start = time.perf_counter()
+        worker_warmup.warm_process(connections=connections)
+        warmup = time.perf_counter() - start
+    queue.put((warmup, first_frame_seconds(video_path, connections)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker子进程首帧耗时基准测试")
+    parser.add_argument("--video", default=None,
+                        help="测试视频(默认使用预热小视频)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--connections", action="store_true",
+                        help="首个任务包含数据库/MinIO/Redis访问(需相应服务可用)")
+    args = parser.parse_args()
+
+    # 与Celery一致: 父进程已导入任务模块后再fork子进程
+    worker_warmup.preload_modules()
+    video_path = args.video or worker_warmup.ensure_warmup_clip()
+
+    ctx = multiprocessing.get_context("fork")
+    results = {}
+    for mode in ("cold", "warm"):
+        samples = []
+        for _ in range(args.runs):
+            queue = ctx.Queue()
+            proc = ctx.Process(target=child,
+                               args=(mode, video_path, args.connections, queue))
+            proc.start()
+            samples.append(queue.get())
+            proc.join()
+        results[mode] = samples
+
+    print(f"视频: {video_path}, 每种模式 {args.runs} 个新子进程")
+    for mode, samples in results.items():
+        warmup = statistics.median(s[0] for s in samples)
+        first = statistics.median(s[1] for s in samples)
+        print(f"  {mode}: 预热 {warmup * 1000:.1f}ms, "
+              f"首帧 {first * 1000:.1f}ms (中位数)")
+    cold = statistics.median(s[1] for s in results["cold"])
+    warm = statistics.median(s[1] for s in results["warm"])
+    print(f"  首帧加速比: {cold / warm:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
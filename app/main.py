@@ -11,11 +11,16 @@ import os
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import make_asgi_app
 from contextlib import asynccontextmanager
 import logging
 
 from app.config import settings
 from app.database import init_async_db, close_async_db
+from app.redis_client import close_async_redis
+from app.services.event_broker import event_broker
+from app.services.async_storage import async_minio
+from app.services.frame_renderer import frame_renderer
 from app.api.v1 import api_router
 
 
@@ -35,6 +40,10 @@ async def lifespan(app: FastAPI):
     # 关闭时
     logger.info("Shutting down application...")
     await close_async_db()
+    await event_broker.close()
+    await close_async_redis()
+    async_minio.close()
+    frame_renderer.close()
     logger.info("Database closed")
 
 
@@ -71,6 +80,9 @@ async def admin_page():
 # 注册路由
 app.include_router(api_router, prefix="/api/v1")
 
+# Prometheus指标
+app.mount("/metrics", make_asgi_app())
+
 
 @app.get("/", tags=["root"])
 async def root():
@@ -24,6 +24,7 @@ from app.models.task import (
     TaskVideo,
     TaskStatus
 )
+from app.models.reference import ReferenceScreen
 
 __all__ = [
     "Video",
@@ -37,5 +38,6 @@ __all__ = [
     "ProjectStatus",
     "Task",
     "TaskVideo",
-    "TaskStatus"
+    "TaskStatus",
+    "ReferenceScreen"
 ]
@@ -50,6 +50,10 @@ class Project(Base):
     # 项目成员（JSON格式存储，或者可以创建单独的关联表）
     members: Mapped[Optional[str]] = mapped_column(String(100), index=True)
 
+    # 处理调度（公平调度权重与并发上限，为空时使用全局默认值）
+    processing_weight: Mapped[int] = mapped_column(Integer, default=1)
+    max_concurrency: Mapped[Optional[int]] = mapped_column(Integer)
+
     # 用户信息
     created_by: Mapped[str] = mapped_column(String(255), nullable=False)
     updated_by: Mapped[Optional[str]] = mapped_column(String(255))
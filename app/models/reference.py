@@ -0,0 +1,53 @@
+# !/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+@Version  : Python 3.12
+@Time     : 2026/10/19 14:30
+@Author   : wieszheng
+@Software : PyCharm
+"""
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, Integer, DateTime, ForeignKey, JSON
+from datetime import datetime
+from typing import List, Optional
+
+from app.models.base import Base
+
+
+class ReferenceScreen(Base):
+    """参考画面表 - 项目/任务的标准加载完成画面及其指纹"""
+    __tablename__ = "reference_screens"
+
+    id: Mapped[str] = mapped_column(String(255), primary_key=True)
+    name: Mapped[str] = mapped_column(String(255), nullable=False)
+
+    # 归属（项目或任务，至少一个）
+    project_id: Mapped[Optional[str]] = mapped_column(
+        ForeignKey("projects.id"),
+        nullable=True,
+        index=True
+    )
+    task_id: Mapped[Optional[str]] = mapped_column(
+        ForeignKey("tasks.id"),
+        nullable=True,
+        index=True
+    )
+
+    # 存储信息
+    object_name: Mapped[str] = mapped_column(String(255), nullable=False)
+    minio_url: Mapped[str] = mapped_column(String(255), nullable=False)
+    width: Mapped[Optional[int]] = mapped_column(Integer)
+    height: Mapped[Optional[int]] = mapped_column(Integer)
+
+    # 指纹信息（感知哈希十六进制 + 缩略灰度直方图）
+    phash: Mapped[str] = mapped_column(String(16), nullable=False)
+    histogram: Mapped[List[float]] = mapped_column(JSON, nullable=False)
+
+    # 用户信息
+    created_by: Mapped[Optional[str]] = mapped_column(String(255))
+
+    # 时间戳
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self) -> str:
+        return f"<ReferenceScreen(id={self.id}, name={self.name}, phash={self.phash})>"
@@ -7,7 +7,7 @@
 @Software : PyCharm
 """
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, DateTime, ForeignKey, Text, Float, Enum as SQLEnum
+from sqlalchemy import String, Integer, DateTime, ForeignKey, Text, Float, JSON, Enum as SQLEnum
 from datetime import datetime
 from typing import List, Optional
 import enum
@@ -46,6 +46,9 @@ class Task(Base):
         index=True
     )
 
+    # 分析配置 - 启用的场景变化指标（为空使用默认配置）
+    scene_metrics: Mapped[Optional[List[str]]] = mapped_column(JSON)
+
     # 统计信息
     total_videos: Mapped[int] = mapped_column(Integer, default=0)
     completed_videos: Mapped[int] = mapped_column(Integer, default=0)
@@ -28,6 +28,8 @@ class Video(Base):
     filename: Mapped[str] = mapped_column(String(255), nullable=False)
     original_filename: Mapped[Optional[str]] = mapped_column(String(255))
     file_size: Mapped[Optional[int]] = mapped_column(Integer)
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64),
+                                                        index=True)  # SHA-256
 
     # 视频属性
     duration: Mapped[Optional[float]] = mapped_column(Float)
@@ -37,8 +39,16 @@ class Video(Base):
     total_frames: Mapped[Optional[int]] = mapped_column(Integer)
     extracted_frames: Mapped[Optional[int]] = mapped_column(Integer)
 
+    # 调度信息(成本单位: 百万像素帧)
+    estimated_cost: Mapped[Optional[float]] = mapped_column(Float)
+    cost_tier: Mapped[Optional[str]] = mapped_column(String(16), index=True)
+    estimated_completion_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime)
+
     # 存储路径
     minio_path: Mapped[Optional[str]] = mapped_column(String(255))
+    proxy_path: Mapped[Optional[str]] = mapped_column(String(255))  # 分析代理视频
+    seek_index_path: Mapped[Optional[str]] = mapped_column(String(255))  # 定位索引
 
     # 处理状态
     status: Mapped[VideoStatus] = mapped_column(
@@ -118,6 +128,7 @@ class Frame(Base):
     brightness: Mapped[Optional[float]] = mapped_column(Float)
     sharpness: Mapped[Optional[float]] = mapped_column(Float)
     has_motion: Mapped[Optional[bool]] = mapped_column(Boolean)
+    phash: Mapped[Optional[str]] = mapped_column(String(16))  # 感知哈希(十六进制)
 
     # 时间戳
     created_at: Mapped[datetime] = mapped_column(DateTime,
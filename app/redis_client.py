@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@FileName: redis_client
+@Author  : shwezheng
+@Time    : 2026/10/19 17:40
+@Software: PyCharm
+"""
+import redis
+import redis.asyncio as aioredis
+from loguru import logger
+
+from app.config import settings
+
+_sync_client = None
+_async_client = None
+_async_binary_client = None
+
+
+def get_redis() -> redis.Redis:
+    """
+    获取同步Redis客户端(供Celery使用)
+
+    连接池在fork后会自动重建，可在prefork worker中安全复用
+    """
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = redis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            decode_responses=True,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT
+        )
+    return _sync_client
+
+
+def get_async_redis() -> aioredis.Redis:
+    """获取异步Redis客户端(供FastAPI使用)"""
+    global _async_client
+    if _async_client is None:
+        _async_client = aioredis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            decode_responses=True,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT
+        )
+    return _async_client
+
+
+def get_async_binary_redis() -> aioredis.Redis:
+    """获取返回原始字节的异步Redis客户端(缓存图片等二进制数据)"""
+    global _async_binary_client
+    if _async_binary_client is None:
+        _async_binary_client = aioredis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT
+        )
+    return _async_binary_client
+
+
+async def close_async_redis():
+    """关闭异步Redis连接"""
+    global _async_client, _async_binary_client
+    if _async_binary_client is not None:
+        await _async_binary_client.aclose()
+        _async_binary_client = None
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+        logger.info("Async redis closed")
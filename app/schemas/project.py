@@ -25,6 +25,8 @@ class ProjectCreate(BaseModel):
     created_by: str = Field(description="创建人")
     start_date: Optional[datetime] = Field(None, description="开始日期")
     end_date: Optional[datetime] = Field(None, description="结束日期")
+    processing_weight: int = Field(1, ge=1, le=100, description="公平调度权重")
+    max_concurrency: Optional[int] = Field(None, ge=1, description="同时处理的视频数上限")
 
 
 class ProjectUpdate(BaseModel):
@@ -35,6 +37,8 @@ class ProjectUpdate(BaseModel):
     description: Optional[str] = None
     tag: Optional[str] = Field(None, min_length=1, max_length=100)
     members: Optional[str] = Field(None, min_length=1, max_length=100)
+    processing_weight: Optional[int] = Field(None, ge=1, le=100)
+    max_concurrency: Optional[int] = Field(None, ge=1)
 
 
 class ProjectStatistics(BaseModel):
@@ -83,6 +87,8 @@ class ProjectResponse(BaseModel):
     start_date: Optional[datetime]
     end_date: Optional[datetime]
     archived_at: Optional[datetime]
+    processing_weight: int = 1
+    max_concurrency: Optional[int] = None
 
     # 统计信息
     statistics: ProjectStatistics
@@ -0,0 +1,32 @@
+# !/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+@Version  : Python 3.12
+@Time     : 2026/10/19 14:40
+@Author   : wieszheng
+@Software : PyCharm
+"""
+from pydantic import BaseModel, ConfigDict, field_serializer
+from typing import Optional
+from datetime import datetime
+
+
+class ReferenceScreenResponse(BaseModel):
+    """参考画面响应"""
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    name: str
+    project_id: Optional[str] = None
+    task_id: Optional[str] = None
+    url: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+    phash: str
+    created_by: Optional[str] = None
+    created_at: datetime
+
+    @field_serializer('created_at')
+    def format_datetime(self, value: datetime) -> str:
+        """格式化时间为标准格式"""
+        return value.strftime("%Y-%m-%d %H:%M:%S")
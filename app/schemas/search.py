@@ -0,0 +1,44 @@
+# !/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+@Version  : Python 3.12
+@Time     : 2026/10/19 16:50
+@Author   : wieszheng
+@Software : PyCharm
+"""
+from pydantic import BaseModel, ConfigDict
+from typing import Optional, List
+
+
+class SimilarFrameItem(BaseModel):
+    """相似帧"""
+    model_config = ConfigDict(from_attributes=True)
+
+    frame_id: str
+    video_id: str
+    video_filename: Optional[str] = None
+    frame_number: int
+    timestamp: float
+    url: str
+    distance: int
+
+
+class SimilarFrameResponse(BaseModel):
+    """相似帧检索响应"""
+    model_config = ConfigDict(from_attributes=True)
+
+    project_id: str
+    query_phash: str
+    index_size: int
+    elapsed_ms: float
+    frames: List[SimilarFrameItem] = []
+
+
+class PhashIndexInfo(BaseModel):
+    """感知哈希索引信息"""
+    model_config = ConfigDict(from_attributes=True)
+
+    project_id: str
+    exists: bool
+    size: int = 0
+    built_at: Optional[float] = None
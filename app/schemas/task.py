@@ -20,6 +20,8 @@ class TaskCreate(BaseModel):
     name: str = Field(min_length=1, max_length=200, description="任务名称")
     description: Optional[str] = Field(None, description="任务描述")
     project_id: Optional[str] = Field(None, description="所属项目ID")
+    scene_metrics: Optional[List[str]] = Field(
+        None, description="启用的场景变化指标（为空使用默认配置）")
     created_by: str = Field(description="创建人")
 
 
@@ -30,6 +32,7 @@ class TaskUpdate(BaseModel):
     name: Optional[str] = Field(None, min_length=1, max_length=200)
     description: Optional[str] = None
     project_id: Optional[str] = None
+    scene_metrics: Optional[List[str]] = None
     status: Optional[str] = None
 
 
@@ -132,6 +135,7 @@ class TaskResponse(BaseModel):
     description: Optional[str]
     status: str
     project_id: Optional[str]
+    scene_metrics: Optional[List[str]] = None
     created_by: str
     created_at: datetime
     updated_at: datetime
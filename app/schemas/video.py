@@ -7,7 +7,7 @@
 @Software: PyCharm
 """
 from pydantic import BaseModel, Field, ConfigDict, field_serializer
-from typing import Optional, List
+from typing import Optional, List, Dict, Any, Literal
 from datetime import datetime
 
 
@@ -41,6 +41,39 @@ class FrameDetailResponse(BaseModel):
     scene_change_score: Optional[float] = None
 
 
+class ResumableUploadCreate(BaseModel):
+    """创建断点续传上传"""
+    filename: str = Field(..., description="原始文件名")
+    length: int = Field(..., gt=0, description="文件总字节数")
+    task_id: Optional[str] = Field(None, description="关联的任务ID（可选）")
+
+
+class ResumableUploadResponse(BaseModel):
+    """断点续传上传状态"""
+    upload_id: str
+    video_id: str
+    filename: str
+    length: int
+    offset: int
+    status: str
+    part_size: int
+
+
+class DirectUploadCreate(ResumableUploadCreate):
+    """创建直传上传"""
+
+
+class DirectUploadResponse(BaseModel):
+    """直传上传(预签名URL)"""
+    upload_id: str
+    video_id: str
+    object_name: str
+    method: str = "PUT"
+    urls: List[str] = Field(..., description="单个PUT URL，或按分片号排列的分片URL")
+    part_size: Optional[int] = Field(None, description="分片大小(分片上传时)")
+    expires_in: int
+
+
 class VideoUploadResponse(BaseModel):
     """单视频上传响应"""
     model_config = ConfigDict(from_attributes=True)
@@ -49,6 +82,14 @@ class VideoUploadResponse(BaseModel):
     task_id: str
     status: str
     message: str
+    estimated_cost: Optional[float] = None
+    cost_tier: Optional[str] = None
+    estimated_completion_at: Optional[datetime] = None
+
+    @field_serializer('estimated_completion_at')
+    def format_datetime(self, value: Optional[datetime]) -> Optional[str]:
+        """格式化时间为标准格式"""
+        return value.strftime("%Y-%m-%d %H:%M:%S") if value else None
 
 
 class BatchUploadResponse(BaseModel):
@@ -71,6 +112,27 @@ class TaskProgress(BaseModel):
     progress: int = Field(ge=0, le=100, description="进度百分比")
     current_step: str
     error_message: Optional[str] = None
+    eta_seconds: Optional[int] = Field(None, description="预计剩余秒数")
+
+
+ProgressField = Literal["status", "progress", "current_step", "task_id",
+                        "error_message"]
+
+
+class BatchProgressRequest(BaseModel):
+    """批量进度查询请求"""
+    video_ids: List[str] = Field(..., min_length=1, max_length=500,
+                                 description="视频ID列表")
+    fields: Optional[List[ProgressField]] = Field(
+        None, description="返回字段(默认status和progress)")
+
+
+class BatchProgressResponse(BaseModel):
+    """批量进度查询响应"""
+    items: Dict[str, Dict[str, Any]] = Field(
+        description="{video_id: {字段: 值}}")
+    missing: List[str] = Field(default_factory=list,
+                               description="不存在的视频ID")
 
 
 class VideoStatusResponse(BaseModel):
@@ -89,12 +151,15 @@ class VideoStatusResponse(BaseModel):
     frames: List[FrameResponse] = []
     progress: int = 0
     current_step: Optional[str] = None
+    estimated_cost: Optional[float] = None
+    cost_tier: Optional[str] = None
+    estimated_completion_at: Optional[datetime] = None
     created_at: datetime
 
-    @field_serializer('created_at')
-    def format_datetime(self, value: datetime) -> str:
+    @field_serializer('created_at', 'estimated_completion_at')
+    def format_datetime(self, value: Optional[datetime]) -> Optional[str]:
         """格式化时间为标准格式"""
-        return value.strftime("%Y-%m-%d %H:%M:%S")
+        return value.strftime("%Y-%m-%d %H:%M:%S") if value else None
 
 
 class BatchStatusResponse(BaseModel):
@@ -109,6 +174,16 @@ class BatchStatusResponse(BaseModel):
     videos: List[VideoStatusResponse]
 
 
+class BatchProgressSummary(BaseModel):
+    """批次进度汇总"""
+    batch_id: str
+    total_count: int
+    completed_count: int
+    failed_count: int
+    processing_count: int
+    progress: int = Field(ge=0, le=100, description="已结束视频占比")
+
+
 class CancelTaskResponse(BaseModel):
     """取消任务响应"""
     model_config = ConfigDict(from_attributes=True)
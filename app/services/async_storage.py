@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@FileName: async_storage
+@Author  : shwezheng
+@Time    : 2026/10/20 00:10
+@Software: PyCharm
+"""
+import asyncio
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import List, Optional, Tuple
+
+from prometheus_client import Histogram
+
+from app.config import settings
+from app.services.minio_service import MinIOService
+
+logger = logging.getLogger(__name__)
+
+MINIO_OPERATION_SECONDS = Histogram(
+    "minio_operation_seconds",
+    "MinIO操作耗时(API进程)",
+    ["operation", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+
+
+class AsyncMinIOService:
+    """
+    MinIO异步门面(供FastAPI处理函数使用)
+
+    同步SDK调用在专用线程池中执行，不阻塞事件循环；
+    使用独立的客户端与连接池，与Worker侧的 minio_service 互不影响
+    """
+
+    def __init__(self):
+        self._service: Optional[MinIOService] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def service(self) -> MinIOService:
+        if self._service is None:
+            self._service = MinIOService(ensure_bucket=False)
+        return self._service
+
+    async def _run(self, operation: str, func, *args, **kwargs):
+        """在线程池中执行并记录耗时"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.MINIO_ASYNC_THREADS,
+                thread_name_prefix="minio-async")
+
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            return await loop.run_in_executor(
+                self._executor, partial(func, *args, **kwargs))
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            MINIO_OPERATION_SECONDS.labels(operation, status).observe(
+                time.perf_counter() - start)
+
+    async def upload_qrcode(self, qr_data: bytes, qr_type: str,
+                            file_extension: str = "png") -> Tuple[str, str]:
+        return await self._run("upload_qrcode", self.service.upload_qrcode,
+                               qr_data, qr_type, file_extension)
+
+    async def upload_reference_image(
+            self,
+            reference_id: str,
+            image_data: bytes,
+            file_extension: str = "png"
+    ) -> Tuple[str, str]:
+        return await self._run("upload_reference_image",
+                               self.service.upload_reference_image,
+                               reference_id, image_data, file_extension)
+
+    async def upload_video(self, video_id: str, file_path: str,
+                           filename: str) -> str:
+        return await self._run("upload_video", self.service.upload_video,
+                               video_id, file_path, filename)
+
+    async def delete_object(self, object_name: str):
+        return await self._run("delete_object", self.service.delete_object,
+                               object_name)
+
+    async def delete_video_objects(self, video_id: str):
+        return await self._run("delete_video_objects",
+                               self.service.delete_video_objects, video_id)
+
+    async def create_multipart_upload(self, object_name: str) -> str:
+        return await self._run("create_multipart_upload",
+                               self.service.create_multipart_upload,
+                               object_name)
+
+    async def upload_part(self, object_name: str, upload_id: str,
+                          part_number: int, data: bytes) -> str:
+        return await self._run("upload_part", self.service.upload_part,
+                               object_name, upload_id, part_number, data)
+
+    async def complete_multipart_upload(self, object_name: str,
+                                        upload_id: str,
+                                        parts: List[Tuple[int, str]]):
+        return await self._run("complete_multipart_upload",
+                               self.service.complete_multipart_upload,
+                               object_name, upload_id, parts)
+
+    async def abort_multipart_upload(self, object_name: str, upload_id: str):
+        return await self._run("abort_multipart_upload",
+                               self.service.abort_multipart_upload,
+                               object_name, upload_id)
+
+    async def presigned_put_url(self, object_name: str, expires: int) -> str:
+        return await self._run("presigned_put_url",
+                               self.service.presigned_put_url,
+                               object_name, expires)
+
+    async def presigned_part_urls(self, object_name: str, upload_id: str,
+                                  part_count: int, expires: int) -> List[str]:
+        return await self._run("presigned_part_urls",
+                               self.service.presigned_part_urls,
+                               object_name, upload_id, part_count, expires)
+
+    async def list_uploaded_parts(self, object_name: str,
+                                  upload_id: str) -> List[Tuple[int, str]]:
+        return await self._run("list_uploaded_parts",
+                               self.service.list_uploaded_parts,
+                               object_name, upload_id)
+
+    async def object_size(self, object_name: str) -> Optional[int]:
+        return await self._run("object_size", self.service.object_size,
+                               object_name)
+
+    async def get_object_url(self, object_name: str,
+                             expires: int = 3600) -> str:
+        return await self._run("get_object_url", self.service.get_object_url,
+                               object_name, expires)
+
+    def close(self):
+        """关闭线程池(应用退出时调用)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+# 全局单例
+async_minio = AsyncMinIOService()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@FileName: batch_progress
+@Author  : shwezheng
+@Time    : 2026/10/19 19:20
+@Software: PyCharm
+"""
+import logging
+from typing import Dict, Optional
+
+from sqlalchemy import update
+
+from app.config import settings
+from app.enums import VideoStatus
+from app.models.video import BatchUpload
+from app.redis_client import get_redis, get_async_redis
+
+logger = logging.getLogger(__name__)
+
+# 待回写数据库的批次
+DIRTY_BATCHES_KEY = "batch:dirty"
+
+_COMPLETED_STATES = {
+    VideoStatus.PENDING_REVIEW,
+    VideoStatus.REVIEWED,
+    VideoStatus.COMPLETED
+}
+_FAILED_STATES = {VideoStatus.FAILED, VideoStatus.CANCELLED}
+
+
+def _key(batch_id: str, name: str) -> str:
+    return f"batch:{batch_id}:{name}"
+
+
+class BatchProgressService:
+    """
+    批次进度计数
+
+    完成/失败的视频ID分别记录在Redis集合中:
+    - SADD幂等，任务重试不会重复计数；失败后重试成功会从失败集合移到完成集合
+    - SCARD为O(1)，查询批次进度无需扫描视频表
+    - 变更的批次记入脏集合，由定时任务批量回写 batch_uploads
+    """
+
+    @staticmethod
+    def record(pipe, batch_id: str, video_id: str, status: VideoStatus):
+        """
+        在pipeline中追加计数命令(状态未结束时不计数)
+
+        Args:
+        pipe: Redis pipeline(同步或异步)
+        batch_id: 批次ID
+        video_id: 视频ID
+        status: 视频当前状态
+        """
+        if not batch_id:
+            return
+        if status in _COMPLETED_STATES:
+            target, other = "completed", "failed"
+        elif status in _FAILED_STATES:
+            target, other = "failed", "completed"
+        else:
+            return
+
+        pipe.srem(_key(batch_id, other), video_id)
+        pipe.sadd(_key(batch_id, target), video_id)
+        for name in ("completed", "failed"):
+            pipe.expire(_key(batch_id, name), settings.PROGRESS_TTL_SECONDS)
+        pipe.sadd(DIRTY_BATCHES_KEY, batch_id)
+
+    async def ainit(self, batch_id: str, total_count: int):
+        """创建批次时记录总数"""
+        key = _key(batch_id, "meta")
+        try:
+            async with get_async_redis().pipeline(transaction=True) as pipe:
+                pipe.hset(key, "total", total_count)
+                pipe.expire(key, settings.PROGRESS_TTL_SECONDS)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to init batch counters: {e}")
+
+    async def areject(self, batch_id: str, count: int):
+        """
+        记录未创建视频记录就被拒绝的文件(格式、大小、探测失败等)，计入失败数
+
+        总数按上传的文件数记录，不计入时批次永远无法达到100%
+        """
+        if not count:
+            return
+        key = _key(batch_id, "failed")
+        try:
+            async with get_async_redis().pipeline(transaction=True) as pipe:
+                pipe.sadd(key, *[f"rejected:{i}" for i in range(count)])
+                pipe.expire(key, settings.PROGRESS_TTL_SECONDS)
+                pipe.sadd(DIRTY_BATCHES_KEY, batch_id)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to record rejected files: {e}")
+
+    async def aget(self, batch_id: str) -> Optional[Dict[str, int]]:
+        """
+        读取批次计数(O(1))
+
+        Returns:
+        {"total_count", "completed_count", "failed_count"}，
+        Redis中没有批次信息时返回None
+        """
+        async with get_async_redis().pipeline(transaction=False) as pipe:
+            pipe.hget(_key(batch_id, "meta"), "total")
+            pipe.scard(_key(batch_id, "completed"))
+            pipe.scard(_key(batch_id, "failed"))
+            total, completed, failed = await pipe.execute()
+
+        if total is None:
+            return None
+        return {
+            "total_count": int(total),
+            "completed_count": completed,
+            "failed_count": failed
+        }
+
+    def flush(self, db, limit: int = 500) -> int:
+        """
+        将变更过的批次计数回写数据库(同步会话，定时任务调用)
+
+        Returns:
+        回写的批次数
+        """
+        client = get_redis()
+        batch_ids = client.spop(DIRTY_BATCHES_KEY, limit)
+        if not batch_ids:
+            return 0
+
+        pipe = client.pipeline(transaction=False)
+        for batch_id in batch_ids:
+            pipe.scard(_key(batch_id, "completed"))
+            pipe.scard(_key(batch_id, "failed"))
+        counts = pipe.execute()
+
+        rows = [
+            {
+                "id": batch_id,
+                "completed_count": counts[i * 2],
+                "failed_count": counts[i * 2 + 1]
+            }
+            for i, batch_id in enumerate(batch_ids)
+        ]
+
+        try:
+            db.execute(update(BatchUpload), rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            client.sadd(DIRTY_BATCHES_KEY, *batch_ids)
+            raise
+
+        return len(rows)
+
+
+# 全局单例
+batch_progress_service = BatchProgressService()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@FileName: cancellation
+@Author  : shwezheng
+@Time    : 2026/10/19 22:10
+@Software: PyCharm
+"""
+import logging
+
+from app.config import settings
+from app.redis_client import get_redis, get_async_redis
+
+logger = logging.getLogger(__name__)
+
+_CANCEL_KEY = "video:cancel:{video_id}"
+
+
+class TaskCancelled(Exception):
+    """视频处理被用户取消"""
+
+
+class CancellationToken:
+    """
+    协作式取消检查点(Worker侧)
+
+    处理循环每隔 CANCEL_CHECK_EVERY_FRAMES 帧调用一次 checkpoint()，
+    发现取消标记后抛出TaskCancelled，由任务自行清理并结束，
+    不再依赖SIGKILL终止整个Worker子进程
+    """
+
+    def __init__(self, video_id: str):
+        self.video_id = video_id
+        self.cancelled = False
+        self._calls = 0
+
+    def check(self):
+        """立即检查取消标记(Redis不可用时视为未取消)"""
+        if not self.cancelled:
+            try:
+                self.cancelled = bool(get_redis().exists(
+                    _CANCEL_KEY.format(video_id=self.video_id)))
+            except Exception as e:
+                logger.warning(f"Failed to read cancel flag: {e}")
+        if self.cancelled:
+            raise TaskCancelled(f"Task cancelled by user: {self.video_id}")
+
+    def checkpoint(self):
+        """按帧计数节流的检查，每N次调用才访问一次Redis"""
+        self._calls += 1
+        if self.cancelled or \
+                self._calls % settings.CANCEL_CHECK_EVERY_FRAMES == 0:
+            self.check()
+
+
+async def arequest_cancel(video_id: str):
+    """设置取消标记(API侧)"""
+    await get_async_redis().set(_CANCEL_KEY.format(video_id=video_id), 1,
+                                ex=settings.CANCEL_FLAG_TTL_SECONDS)
+
+
+def clear_cancel(video_id: str):
+    """清除取消标记(任务清理完成后调用)"""
+    try:
+        get_redis().delete(_CANCEL_KEY.format(video_id=video_id))
+    except Exception as e:
+        logger.warning(f"Failed to clear cancel flag: {e}")
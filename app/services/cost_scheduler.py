@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@FileName: cost_scheduler
+@Author  : shwezheng
+@Time    : 2026/10/19 20:50
+@Software: PyCharm
+"""
+import time
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+
+from app.config import settings
+from app.redis_client import get_redis, get_async_redis
+
+logger = logging.getLogger(__name__)
+
+COST_TIERS = ("small", "medium", "large")
+
+# 每个档位排队中的成本总量
+_BACKLOG_KEY = "pipeline:backlog:{tier}"
+# 每单位成本的实际处理秒数(指数滑动平均)
+_RATE_KEY = "pipeline:seconds_per_cost"
+
+# 扣减排队成本，不低于0(与并发的入队累加保持原子)
+_DECREMENT = """
+local value = tonumber(redis.call('INCRBYFLOAT', KEYS[1], -tonumber(ARGV[1])))
+if value < 0 then
+    redis.call('SET', KEYS[1], 0)
+    return '0'
+end
+return tostring(value)
+"""
+
+
+def estimate_cost(video_info: Dict, sampling_rate: int = None) -> float:
+    """
+    估算处理成本(单位: 百万像素帧)
+
+    成本 = 时长 × 帧率 × 分辨率 / 采样率
+
+    Args:
+    video_info: VideoProcessor.extract_video_info 的返回值
+    sampling_rate: 采样率(默认使用配置)
+
+    Returns:
+    处理成本
+    """
+    sampling_rate = sampling_rate or settings.FRAME_SAMPLING_RATE
+    frames = video_info["duration"] * video_info["fps"] / sampling_rate
+    megapixels = video_info["width"] * video_info["height"] / 1_000_000
+    return round(frames * megapixels, 2)
+
+
+def cost_tier(cost: float) -> str:
+    """按成本划分档位"""
+    if cost <= settings.COST_TIER_SMALL_MAX:
+        return "small"
+    if cost <= settings.COST_TIER_MEDIUM_MAX:
+        return "medium"
+    return "large"
+
+
+def cpu_queue(tier: Optional[str]) -> str:
+    """档位对应的CPU队列(未知档位回落到通用CPU队列)"""
+    if tier in COST_TIERS:
+        return f"video_cpu_{tier}"
+    return "video_cpu"
+
+
+class CostScheduler:
+    """
+    按成本估算完成时间
+
+    - 上传时按档位排队成本估算完成时间；作业成功提交调度后才累加排队成本
+    - 完成/失败时扣减，并用实际耗时校准每单位成本的处理秒数
+    """
+
+    async def aestimate(self, tier: str, cost: float) -> datetime:
+        """
+        估算完成时间(API侧，不修改排队成本)
+
+        Returns:
+        预计完成时间(UTC)
+        """
+        client = get_async_redis()
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.get(_BACKLOG_KEY.format(tier=tier))
+                pipe.get(_RATE_KEY)
+                backlog, rate = await pipe.execute()
+            backlog = float(backlog or 0) + cost
+            rate = float(rate) if rate else settings.COST_SECONDS_PER_UNIT
+        except Exception as e:
+            logger.warning(f"Failed to read scheduler state: {e}")
+            backlog, rate = cost, settings.COST_SECONDS_PER_UNIT
+
+        # 档位内排在前面的成本 + 自身成本，按CPU并发数分摊
+        seconds = backlog * rate / max(settings.CELERY_WORKER_CONCURRENCY, 1)
+        return datetime.utcfromtimestamp(time.time() + seconds)
+
+    async def aenqueue(self, tier: Optional[str], cost: Optional[float]):
+        """
+        登记入队(API侧，作业成功提交调度后调用)
+
+        之后作业的每个结束路径(完成、失败、取消、调度跳过)都要调用 complete
+        """
+        if tier not in COST_TIERS or not cost:
+            return
+        try:
+            await get_async_redis().incrbyfloat(
+                _BACKLOG_KEY.format(tier=tier), cost)
+        except Exception as e:
+            logger.warning(f"Failed to update scheduler state: {e}")
+
+    def complete(self, tier: Optional[str], cost: Optional[float],
+                 elapsed: Optional[float] = None):
+        """
+        登记处理结束(Worker侧)
+
+        Args:
+        tier: 成本档位
+        cost: 处理成本
+        elapsed: 实际处理秒数(失败时为None，不参与校准)
+        """
+        if tier not in COST_TIERS or not cost:
+            return
+
+        client = get_redis()
+        try:
+            client.eval(_DECREMENT, 1, _BACKLOG_KEY.format(tier=tier), cost)
+
+            if elapsed and elapsed > 0:
+                observed = elapsed / cost
+                current = client.get(_RATE_KEY)
+                rate = (observed if current is None else
+                        float(current) * (1 - settings.COST_RATE_ALPHA) +
+                        observed * settings.COST_RATE_ALPHA)
+                client.set(_RATE_KEY, rate)
+        except Exception as e:
+            logger.warning(f"Failed to update scheduler state: {e}")
+
+    async def abacklog(self) -> Dict[str, float]:
+        """各档位排队成本"""
+        client = get_async_redis()
+        async with client.pipeline(transaction=False) as pipe:
+            for tier in COST_TIERS:
+                pipe.get(_BACKLOG_KEY.format(tier=tier))
+            values = await pipe.execute()
+        return {tier: round(float(v or 0), 2)
+                for tier, v in zip(COST_TIERS, values)}
+
+
+# 全局单例
+cost_scheduler = CostScheduler()
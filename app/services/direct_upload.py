@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@FileName: direct_upload
+@Author  : shwezheng
+@Time    : 2026/10/20 01:40
+@Software: PyCharm
+"""
+import math
+import uuid
+import logging
+from typing import Dict, Optional
+
+from app.config import settings
+from app.redis_client import get_async_redis
+from app.services.async_storage import async_minio
+from app.services.minio_service import MinIOService
+from app.services.resumable_upload import UploadConflict
+
+logger = logging.getLogger(__name__)
+
+_STATE_KEY = "upload:direct:{upload_id}"
+_OBJECT_KEY = "upload:direct:object:{object_name}"  # 对象名 -> 上传ID(事件通知用)
+
+# 状态迁移: uploading -> completing -> completed -> registering -> (删除)
+#           uploading/completed -> aborting -> (删除)
+_TRANSITION = """
+if redis.call('HGET', KEYS[1], 'status') == ARGV[1] then
+    redis.call('HSET', KEYS[1], 'status', ARGV[2])
+    return 1
+end
+return 0
+"""
+
+
+class DirectUploadService:
+    """
+    客户端直传MinIO
+
+    - API只签发预签名URL，视频数据不经过API进程与共享卷
+    - 小文件使用单个PUT；超过 DIRECT_UPLOAD_MULTIPART_THRESHOLD 时按
+      RESUMABLE_PART_SIZE 签发每个分片的PUT URL，合并时由服务端列出分片ETag
+    - 完成由客户端调用或MinIO事件通知触发，状态迁移保证只登记一次
+    """
+
+    @staticmethod
+    def _key(upload_id: str) -> str:
+        return _STATE_KEY.format(upload_id=upload_id)
+
+    async def _transition(self, upload_id: str, from_status: str,
+                          to_status: str) -> bool:
+        return bool(await get_async_redis().eval(
+            _TRANSITION, 1, self._key(upload_id), from_status, to_status))
+
+    async def create(self, filename: str, length: int,
+                     task_id: str = None) -> Dict:
+        """
+        创建直传上传并签发URL
+
+        Args:
+        filename: 原始文件名
+        length: 文件总字节数
+        task_id: 关联的任务ID
+
+        Returns:
+        上传状态，另含 urls(分片上传时按分片号排列)与 expires_in
+        """
+        upload_id = str(uuid.uuid4())
+        video_id = str(uuid.uuid4())
+        object_name = MinIOService.original_object_name(video_id, filename)
+        expires = settings.DIRECT_UPLOAD_URL_EXPIRES
+
+        s3_upload_id = ""
+        part_count = 0
+        if length > settings.DIRECT_UPLOAD_MULTIPART_THRESHOLD:
+            part_count = math.ceil(length / settings.RESUMABLE_PART_SIZE)
+            s3_upload_id = await async_minio.create_multipart_upload(
+                object_name)
+            urls = await async_minio.presigned_part_urls(
+                object_name, s3_upload_id, part_count, expires)
+        else:
+            urls = [await async_minio.presigned_put_url(object_name, expires)]
+
+        state = {
+            "upload_id": upload_id,
+            "video_id": video_id,
+            "filename": filename,
+            "object_name": object_name,
+            "s3_upload_id": s3_upload_id,
+            "part_count": part_count,
+            "task_id": task_id or "",
+            "length": length,
+            "status": "uploading"
+        }
+        # 状态比URL多保留一个有效期，允许URL过期前开始的上传完成后再登记
+        ttl = expires * 2
+        client = get_async_redis()
+        pipe = client.pipeline(transaction=False)
+        pipe.hset(self._key(upload_id), mapping=state)
+        pipe.expire(self._key(upload_id), ttl)
+        pipe.set(_OBJECT_KEY.format(object_name=object_name), upload_id,
+                 ex=ttl)
+        await pipe.execute()
+        logger.info(f"Direct upload created: {upload_id} -> {object_name}")
+
+        state = self._decode(state)
+        state["urls"] = urls
+        state["expires_in"] = expires
+        return state
+
+    async def get(self, upload_id: str) -> Optional[Dict]:
+        """查询上传状态(不存在或已过期时返回None)"""
+        state = await get_async_redis().hgetall(self._key(upload_id))
+        return self._decode(state) if state else None
+
+    async def find_by_object(self, object_name: str) -> Optional[str]:
+        """按对象名查找上传ID"""
+        return await get_async_redis().get(
+            _OBJECT_KEY.format(object_name=object_name))
+
+    @staticmethod
+    def _decode(state: Dict) -> Dict:
+        state = dict(state)
+        state["length"] = int(state["length"])
+        state["part_count"] = int(state["part_count"])
+        state["task_id"] = state["task_id"] or None
+        return state
+
+    async def complete(self, upload_id: str) -> Dict:
+        """
+        确认对象已上传完整(分片上传时先合并)，并占有登记权
+
+        Returns:
+        上传状态(status=registering)；调用方登记失败时调用 reopen
+        """
+        state = await self.get(upload_id)
+        if state is None:
+            raise KeyError(upload_id)
+
+        if await self._transition(upload_id, "uploading", "completing"):
+            try:
+                await self._assemble(state)
+            except Exception:
+                await self._transition(upload_id, "completing", "uploading")
+                raise
+            await self._transition(upload_id, "completing", "completed")
+
+        if not await self._transition(upload_id, "completed", "registering"):
+            raise UploadConflict("上传正在登记或尚未完成", 0)
+        state["status"] = "registering"
+        return state
+
+    async def _assemble(self, state: Dict):
+        """合并分片并校验对象大小(大小不一致时删除对象)"""
+        object_name = state["object_name"]
+        if state["s3_upload_id"]:
+            parts = await async_minio.list_uploaded_parts(
+                object_name, state["s3_upload_id"])
+            if len(parts) < state["part_count"]:
+                raise UploadConflict(
+                    f"分片未上传完整: {len(parts)}/{state['part_count']}", 0)
+            await async_minio.complete_multipart_upload(
+                object_name, state["s3_upload_id"], sorted(parts))
+            # 分片上传已不存在，之后放弃时按普通对象删除
+            state["s3_upload_id"] = ""
+            await get_async_redis().hset(self._key(state["upload_id"]),
+                                         "s3_upload_id", "")
+
+        size = await async_minio.object_size(object_name)
+        if size is None:
+            raise UploadConflict("对象尚未上传", 0)
+        if size != state["length"]:
+            # 不一致的对象不能登记，直接删除
+            await async_minio.delete_object(object_name)
+            raise ValueError(f"文件大小不一致: 声明 {state['length']}, "
+                             f"实际 {size}")
+
+    async def reopen(self, upload_id: str):
+        """登记失败(非视频本身的问题)时释放登记权，允许重试"""
+        await self._transition(upload_id, "registering", "completed")
+
+    async def forget(self, upload_id: str):
+        """登记完成或作废后删除上传状态"""
+        state = await self.get(upload_id)
+        if state is None:
+            return
+        await get_async_redis().delete(
+            self._key(upload_id),
+            _OBJECT_KEY.format(object_name=state["object_name"]))
+
+    async def abort(self, upload_id: str) -> bool:
+        """
+        放弃上传，删除已上传的分片或对象
+
+        正在合并或登记时抛出UploadConflict(登记中的对象不能删除)
+        """
+        state = await self.get(upload_id)
+        if state is None:
+            return False
+        if await self._transition(upload_id, "uploading", "aborting"):
+            if state["s3_upload_id"]:
+                await async_minio.abort_multipart_upload(
+                    state["object_name"], state["s3_upload_id"])
+            else:
+                await async_minio.delete_object(state["object_name"])
+        elif await self._transition(upload_id, "completed", "aborting"):
+            await async_minio.delete_object(state["object_name"])
+        else:
+            raise UploadConflict("上传正在合并或登记，无法取消", 0)
+        await self.forget(upload_id)
+        logger.info(f"Direct upload aborted: {upload_id}")
+        return True
+
+
+# 全局单例
+direct_upload_service = DirectUploadService()
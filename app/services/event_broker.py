@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@FileName: event_broker
+@Author  : shwezheng
+@Time    : 2026/10/19 18:30
+@Software: PyCharm
+"""
+import json
+import asyncio
+import logging
+from typing import Dict, List, Optional, Set
+
+from app.config import settings
+from app.redis_client import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+
+class EventBroker:
+    """
+    进程内事件分发器
+
+    每个API进程只持有一个Redis pub/sub连接，按频道引用计数订阅，
+    收到的消息扇出到各个SSE连接的有界队列
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def subscribe(self, channels: List[str]) -> asyncio.Queue:
+        """
+        订阅频道
+
+        Args:
+        channels: 频道列表
+
+        Returns:
+        接收事件(dict)的队列
+        """
+        queue = asyncio.Queue(maxsize=settings.SSE_QUEUE_SIZE)
+        async with self._lock:
+            if self._pubsub is None:
+                self._pubsub = get_async_redis().pubsub()
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.create_task(self._run())
+
+            new_channels = [c for c in channels if c not in self._subscribers]
+            for channel in channels:
+                self._subscribers.setdefault(channel, set()).add(queue)
+            if new_channels:
+                await self._pubsub.subscribe(*new_channels)
+        return queue
+
+    async def unsubscribe(self, channels: List[str], queue: asyncio.Queue):
+        """取消订阅，频道无订阅者时退订Redis"""
+        async with self._lock:
+            idle_channels = []
+            for channel in channels:
+                queues = self._subscribers.get(channel)
+                if queues is None:
+                    continue
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[channel]
+                    idle_channels.append(channel)
+
+            if idle_channels and self._pubsub is not None:
+                try:
+                    await self._pubsub.unsubscribe(*idle_channels)
+                except Exception as e:
+                    logger.warning(f"Failed to unsubscribe channels: {e}")
+
+    def subscriber_count(self) -> int:
+        """当前SSE连接数"""
+        queues = set()
+        for subs in self._subscribers.values():
+            queues.update(subs)
+        return len(queues)
+
+    def _dispatch(self, channel: str, data: str):
+        """分发消息，队列满时丢弃最旧的事件(事件均为状态快照，可覆盖)"""
+        queues = self._subscribers.get(channel)
+        if not queues:
+            return
+
+        try:
+            event = json.loads(data)
+        except ValueError:
+            logger.warning(f"Invalid event on {channel}: {data!r}")
+            return
+
+        for queue in list(queues):
+            if queue.full():
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait(event)
+
+    async def _run(self):
+        """读取pub/sub消息的后台协程，连接异常时重建并重新订阅"""
+        while True:
+            if not self._subscribers:
+                await asyncio.sleep(1.0)
+                continue
+
+            try:
+                message = await self._pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Event pubsub error, reconnecting: {e}")
+                await asyncio.sleep(1.0)
+                await self._reconnect()
+                continue
+
+            if message and message.get("type") == "message":
+                self._dispatch(message["channel"], message["data"])
+
+    async def _reconnect(self):
+        async with self._lock:
+            old = self._pubsub
+            self._pubsub = get_async_redis().pubsub()
+            try:
+                if self._subscribers:
+                    await self._pubsub.subscribe(*self._subscribers.keys())
+            except Exception as e:
+                logger.warning(f"Failed to resubscribe channels: {e}")
+            if old is not None:
+                try:
+                    await old.aclose()
+                except Exception:
+                    pass
+
+    async def close(self):
+        """关闭订阅连接(应用退出时调用)"""
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+
+
+# 全局单例
+event_broker = EventBroker()
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@FileName: fair_scheduler
+@Author  : shwezheng
+@Time    : 2026/10/19 21:30
+@Software: PyCharm
+"""
+import json
+import time
+import uuid
+import logging
+from typing import Callable, Dict, List, Optional
+
+from app.config import settings
+from app.redis_client import get_redis, get_async_redis
+from app.services.cost_scheduler import COST_TIERS
+
+logger = logging.getLogger(__name__)
+
+# 未关联项目的视频归入默认分组
+DEFAULT_PROJECT = "__default__"
+
+_PROJECTS_KEY = "fairshare:projects"  # 有排队作业的项目
+_QUEUE_KEY = "fairshare:queue:{project}:{tier}"  # 项目各档位排队作业(LIST)
+_RUNNING_KEY = "fairshare:running:{project}:{tier}"  # 项目各档位在处理的视频(ZSET，分数为最近心跳时间)
+_TIER_RUNNING_KEY = "fairshare:tier_running:{tier}"  # 档位在处理的视频
+_ALL_RUNNING_KEY = "fairshare:running"  # 全局在处理的视频
+_ACTIVE_KEY = "fairshare:active"  # 有在处理视频的项目
+_VIDEO_KEY = "fairshare:video:{video_id}"  # 占用名额的作业所属项目与档位(HASH)
+_CURSOR_KEY = "fairshare:cursor"  # 轮转起点
+_LOCK_KEY = "fairshare:lock"
+
+# 所有档位队列都为空时才移出项目集合，避免与入队并发时丢失项目
+_DROP_IF_EMPTY = """
+for i = 1, #KEYS - 1 do
+    if redis.call('LLEN', KEYS[i]) > 0 then
+        return 0
+    end
+end
+redis.call('SREM', KEYS[#KEYS], ARGV[1])
+return 1
+"""
+
+_REFRESH_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def tier_budgets() -> Dict[str, int]:
+    """各档位同时处理的视频数上限"""
+    return {
+        "small": settings.FAIR_SHARE_MAX_IN_FLIGHT_SMALL,
+        "medium": settings.FAIR_SHARE_MAX_IN_FLIGHT_MEDIUM,
+        "large": settings.FAIR_SHARE_MAX_IN_FLIGHT_LARGE
+    }
+
+
+def job_tier(job: Dict) -> str:
+    """作业所属档位(短视频批处理为small，未知档位按medium)"""
+    if job.get("clips"):
+        return "small"
+    tier = job.get("cost_tier")
+    return tier if tier in COST_TIERS else "medium"
+
+
+class FairScheduler:
+    """
+    按项目公平调度
+
+    - 上传时作业进入项目对应成本档位的队列，由调度器按加权轮询释放到Celery
+    - 每个档位有独立的在途上限，大视频占满自己的名额时不影响小视频派发
+    - 每轮每个项目在每个档位最多派发 weight 个作业，项目并发上限按档位分别计算
+    - 处理阶段定期心跳，超过 FAIR_SHARE_RUNNING_TTL_SECONDS 无心跳的占用视为失效
+    - 视频处理结束时释放占用，并立即触发下一次调度
+    """
+
+    def __init__(self):
+        self._last_heartbeat: Dict[str, float] = {}
+
+    async def asubmit(self, project_id: Optional[str], job: Dict):
+        """
+        作业入队(API侧)
+
+        Args:
+        project_id: 项目ID(为空归入默认分组)
+        job: 作业参数，包含 video_id(单个视频)或 slot_id(批处理作业)
+        """
+        project = project_id or DEFAULT_PROJECT
+        job = dict(job, project_id=project, enqueued_at=time.time())
+        queue = _QUEUE_KEY.format(project=project, tier=job_tier(job))
+        async with get_async_redis().pipeline(transaction=True) as pipe:
+            pipe.rpush(queue, json.dumps(job))
+            pipe.sadd(_PROJECTS_KEY, project)
+            await pipe.execute()
+
+    def release(self, video_id: str):
+        """
+        释放作业占用的并发名额(Worker侧，处理结束或失败时调用)
+
+        Args:
+        video_id: 视频ID，批处理作业为其 slot_id
+        """
+        self._last_heartbeat.pop(video_id, None)
+        client = get_redis()
+        project, tier = client.hmget(_VIDEO_KEY.format(video_id=video_id),
+                                     "project", "tier")
+        if project is None:
+            return
+        pipe = client.pipeline(transaction=True)
+        pipe.zrem(_RUNNING_KEY.format(project=project, tier=tier), video_id)
+        pipe.zrem(_TIER_RUNNING_KEY.format(tier=tier), video_id)
+        pipe.zrem(_ALL_RUNNING_KEY, video_id)
+        pipe.delete(_VIDEO_KEY.format(video_id=video_id))
+        for t in COST_TIERS:
+            pipe.zcard(_RUNNING_KEY.format(project=project, tier=t))
+        if not any(pipe.execute()[-len(COST_TIERS):]):
+            client.srem(_ACTIVE_KEY, project)
+
+    def heartbeat(self, video_id: str):
+        """
+        刷新占用的心跳时间(Worker侧，处理阶段中定期调用)
+
+        按 FAIR_SHARE_HEARTBEAT_SECONDS 节流；占用不存在(已释放或已失效)时不做处理
+
+        Args:
+        video_id: 视频ID，批处理作业为其 slot_id
+        """
+        now = time.time()
+        if now - self._last_heartbeat.get(video_id, 0) < \
+                settings.FAIR_SHARE_HEARTBEAT_SECONDS:
+            return
+        if len(self._last_heartbeat) > 1024:
+            # 其他进程释放的占用不会从这里移除，定期丢弃过期的记录
+            self._last_heartbeat = {
+                k: v for k, v in self._last_heartbeat.items()
+                if now - v < settings.FAIR_SHARE_HEARTBEAT_SECONDS}
+        self._last_heartbeat[video_id] = now
+
+        client = get_redis()
+        video_key = _VIDEO_KEY.format(video_id=video_id)
+        project, tier = client.hmget(video_key, "project", "tier")
+        if project is None:
+            return
+        pipe = client.pipeline(transaction=True)
+        pipe.zadd(_RUNNING_KEY.format(project=project, tier=tier),
+                  {video_id: now}, xx=True)
+        pipe.zadd(_TIER_RUNNING_KEY.format(tier=tier), {video_id: now},
+                  xx=True)
+        pipe.zadd(_ALL_RUNNING_KEY, {video_id: now}, xx=True)
+        pipe.expire(video_key, settings.FAIR_SHARE_RUNNING_TTL_SECONDS)
+        pipe.execute()
+
+    def dispatch(
+            self,
+            load_configs: Callable[[List[str]], Dict[str, Dict]],
+            start: Callable[[Dict], bool]
+    ) -> int:
+        """
+        执行一次加权轮询调度(档位从小到大依次派发)
+
+        Args:
+        load_configs: 读取项目配置 {project: {"weight", "max_concurrency"}}
+        start: 启动作业的回调(返回False表示作业无需启动，如已取消；
+            抛出异常时作业放回队首，等待下一次调度)
+
+        Returns:
+        本次派发的作业数
+        """
+        client = get_redis()
+        token = uuid.uuid4().hex
+        if not client.set(_LOCK_KEY, token, nx=True,
+                          px=settings.FAIR_SHARE_LOCK_MS):
+            return 0
+
+        try:
+            projects = sorted(client.smembers(_PROJECTS_KEY))
+            if not projects:
+                return 0
+
+            self._expire_stale(client)
+
+            # 轮转起点，避免总是同一个项目先派发
+            offset = client.incr(_CURSOR_KEY) % len(projects)
+            projects = projects[offset:] + projects[:offset]
+
+            configs = load_configs(projects)
+            dispatched = 0
+            for tier, limit in tier_budgets().items():
+                budget = limit - client.zcard(
+                    _TIER_RUNNING_KEY.format(tier=tier))
+                if budget <= 0:
+                    continue
+                count = self._dispatch_tier(client, token, tier, budget,
+                                            projects, configs, start)
+                if count is None:
+                    # 调度锁已失效，其他调度者可能已开始派发
+                    logger.warning("Fair-share dispatch lock lost, stopping")
+                    break
+                dispatched += count
+
+            for project in projects:
+                client.eval(_DROP_IF_EMPTY, len(COST_TIERS) + 1,
+                            *[_QUEUE_KEY.format(project=project, tier=t)
+                              for t in COST_TIERS],
+                            _PROJECTS_KEY, project)
+            return dispatched
+
+        finally:
+            client.eval(_RELEASE_LOCK, 1, _LOCK_KEY, token)
+
+    def _dispatch_tier(self, client, token: str, tier: str, budget: int,
+                       projects: List[str], configs: Dict[str, Dict],
+                       start: Callable[[Dict], bool]) -> Optional[int]:
+        """
+        在一个档位内按项目加权轮询派发
+
+        Returns:
+        派发的作业数，调度锁失效时返回None
+        """
+        running = {p: client.zcard(_RUNNING_KEY.format(project=p, tier=tier))
+                   for p in projects}
+        drained = set()
+        dispatched = 0
+
+        while budget > 0:
+            progressed = False
+            for project in projects:
+                if budget <= 0:
+                    break
+                if project in drained:
+                    continue
+
+                config = configs.get(project, {})
+                cap = (config.get("max_concurrency") or
+                       settings.FAIR_SHARE_DEFAULT_MAX_CONCURRENCY)
+                quota = min(config.get("weight") or 1,
+                            cap - running[project], budget)
+                queue = _QUEUE_KEY.format(project=project, tier=tier)
+
+                for _ in range(max(quota, 0)):
+                    # 每个作业都要访问数据库与Broker，逐个续期调度锁
+                    if not client.eval(_REFRESH_LOCK, 1, _LOCK_KEY, token,
+                                       settings.FAIR_SHARE_LOCK_MS):
+                        return None
+
+                    raw = client.lpop(queue)
+                    if raw is None:
+                        drained.add(project)
+                        break
+
+                    job = json.loads(raw)
+                    slot = job.get("slot_id") or job["video_id"]
+                    self._mark_running(client, project, tier, slot)
+                    try:
+                        started = start(job)
+                    except Exception as e:
+                        # 启动失败(数据库或Broker异常): 放回队首，本轮不再派发该项目
+                        logger.error(f"Failed to start job {slot}: {e}")
+                        self.release(slot)
+                        pipe = client.pipeline(transaction=True)
+                        pipe.lpush(queue, raw)
+                        pipe.sadd(_PROJECTS_KEY, project)
+                        pipe.execute()
+                        drained.add(project)
+                        break
+                    if not started:
+                        self.release(slot)
+                        continue
+
+                    running[project] += 1
+                    budget -= 1
+                    dispatched += 1
+                    progressed = True
+
+            if not progressed:
+                break
+
+        return dispatched
+
+    @staticmethod
+    def _mark_running(client, project: str, tier: str, video_id: str):
+        now = time.time()
+        video_key = _VIDEO_KEY.format(video_id=video_id)
+        pipe = client.pipeline(transaction=True)
+        pipe.zadd(_RUNNING_KEY.format(project=project, tier=tier),
+                  {video_id: now})
+        pipe.zadd(_TIER_RUNNING_KEY.format(tier=tier), {video_id: now})
+        pipe.zadd(_ALL_RUNNING_KEY, {video_id: now})
+        pipe.sadd(_ACTIVE_KEY, project)
+        pipe.hset(video_key, mapping={"project": project, "tier": tier})
+        pipe.expire(video_key, settings.FAIR_SHARE_RUNNING_TTL_SECONDS)
+        pipe.execute()
+
+    @staticmethod
+    def _expire_stale(client):
+        """清理长时间无心跳的占用(Worker异常退出等情况)"""
+        deadline = time.time() - settings.FAIR_SHARE_RUNNING_TTL_SECONDS
+        stale = client.zrangebyscore(_ALL_RUNNING_KEY, 0, deadline)
+        if not stale:
+            return
+        for video_id in stale:
+            project, tier = client.hmget(
+                _VIDEO_KEY.format(video_id=video_id), "project", "tier")
+            for t in ([tier] if tier else COST_TIERS):
+                if project:
+                    client.zrem(_RUNNING_KEY.format(project=project, tier=t),
+                                video_id)
+                client.zrem(_TIER_RUNNING_KEY.format(tier=t), video_id)
+            client.delete(_VIDEO_KEY.format(video_id=video_id))
+        client.zrem(_ALL_RUNNING_KEY, *stale)
+        logger.warning(f"清理超时的调度占用: {len(stale)} 个视频")
+
+    async def astats(self) -> List[Dict]:
+        """
+        各项目排队深度、在处理数量与最长等待时间
+
+        Returns:
+        [{"project_id", "queued", "running", "queued_by_tier",
+          "running_by_tier", "oldest_wait_seconds"}]
+        """
+        client = get_async_redis()
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.smembers(_PROJECTS_KEY)
+            pipe.smembers(_ACTIVE_KEY)
+            queued_projects, active_projects = await pipe.execute()
+
+        projects = sorted(set(queued_projects) | set(active_projects))
+        async with client.pipeline(transaction=False) as pipe:
+            for project in projects:
+                for tier in COST_TIERS:
+                    queue = _QUEUE_KEY.format(project=project, tier=tier)
+                    pipe.llen(queue)
+                    pipe.zcard(_RUNNING_KEY.format(project=project, tier=tier))
+                    pipe.lindex(queue, 0)
+            values = iter(await pipe.execute())
+
+        now = time.time()
+        stats = []
+        for project in projects:
+            queued, running, heads = {}, {}, []
+            for tier in COST_TIERS:
+                queued[tier], running[tier], head = (
+                    next(values), next(values), next(values))
+                if head:
+                    heads.append(json.loads(head)["enqueued_at"])
+            if not any(queued.values()) and not any(running.values()):
+                continue
+            oldest_wait = round(now - min(heads), 1) if heads else None
+            stats.append({
+                "project_id": project,
+                "queued": sum(queued.values()),
+                "running": sum(running.values()),
+                "queued_by_tier": queued,
+                "running_by_tier": running,
+                "oldest_wait_seconds": oldest_wait
+            })
+        return stats
+
+
+# 全局单例
+fair_scheduler = FairScheduler()
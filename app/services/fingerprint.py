@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@FileName: fingerprint
+@Author  : shwezheng
+@Time    : 2026/10/19 14:05
+@Software: PyCharm
+"""
+import logging
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from app.services.scene_metrics import SceneFrame
+
+logger = logging.getLogger(__name__)
+
+
+def compute_phash(gray: np.ndarray) -> int:
+    """
+    计算感知哈希(pHash, 64位)
+
+    Args:
+    gray: 灰度图(可为缩略图)
+
+    Returns:
+    int: 64位哈希值
+    """
+    resized = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA)
+    dct = cv2.dct(np.float32(resized))
+    block = dct[:8, :8].flatten()
+
+    # 中值不含直流分量，避免整体亮度主导
+    median = np.median(block[1:])
+    bits = np.packbits(block > median)
+    return int.from_bytes(bits.tobytes(), "big")
+
+
+def phash_to_hex(value: int) -> str:
+    """64位哈希转16位十六进制字符串"""
+    return f"{value:016x}"
+
+
+def hex_to_phash(value: str) -> int:
+    """十六进制字符串转64位哈希"""
+    return int(value, 16)
+
+
+def fingerprint_image(image: np.ndarray) -> Dict:
+    """
+    计算图片指纹(感知哈希 + 缩略灰度直方图)
+
+    与帧提取时使用相同的缩略流程，保证参考图与视频帧可直接比较
+
+    Args:
+    image: BGR或灰度图像
+
+    Returns:
+    dict: {"phash": int, "histogram": np.ndarray}
+    """
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+    frame = SceneFrame(image)
+    return {
+        "phash": compute_phash(frame.small),
+        "histogram": frame.hist.flatten()
+    }
+
+
+def hamming_distances(hashes: np.ndarray, refs: np.ndarray) -> np.ndarray:
+    """
+    批量计算汉明距离
+
+    Args:
+    hashes: 帧哈希数组(N,) uint64
+    refs: 参考哈希数组(R,) uint64
+
+    Returns:
+    np.ndarray: (N, R) 距离矩阵
+    """
+    xor = np.bitwise_xor(hashes[:, None], refs[None, :])
+    return np.bitwise_count(xor).astype(np.int32)
+
+
+def histogram_correlations(hists: np.ndarray,
+                           ref_hists: np.ndarray) -> np.ndarray:
+    """
+    批量计算直方图相关系数(与cv2.HISTCMP_CORREL一致)
+
+    Args:
+    hists: 帧直方图矩阵(N, B)
+    ref_hists: 参考直方图矩阵(R, B)
+
+    Returns:
+    np.ndarray: (N, R) 相关系数矩阵
+    """
+    a = hists - hists.mean(axis=1, keepdims=True)
+    b = ref_hists - ref_hists.mean(axis=1, keepdims=True)
+    a_norm = np.linalg.norm(a, axis=1, keepdims=True)
+    b_norm = np.linalg.norm(b, axis=1, keepdims=True)
+    a = np.divide(a, a_norm, out=np.zeros_like(a), where=a_norm > 0)
+    b = np.divide(b, b_norm, out=np.zeros_like(b), where=b_norm > 0)
+    return a @ b.T
+
+
+def build_reference_arrays(
+        references: List[Dict]
+) -> Optional[tuple[np.ndarray, np.ndarray]]:
+    """
+    将参考指纹列表转换为向量化比较所需的数组
+
+    Args:
+    references: [{"phash": int|str, "histogram": list|np.ndarray}]
+
+    Returns:
+    (哈希数组, 直方图矩阵)，无参考时返回None
+    """
+    if not references:
+        return None
+
+    hashes = np.array(
+        [hex_to_phash(r["phash"]) if isinstance(r["phash"], str)
+         else r["phash"] for r in references],
+        dtype=np.uint64
+    )
+    hists = np.array([np.asarray(r["histogram"], dtype=np.float32)
+                      for r in references])
+    return hashes, hists
@@ -10,6 +10,10 @@ import logging
 from typing import List, Dict, Tuple, Optional
 import numpy as np
 
+from app.services.fingerprint import (hamming_distances,
+                                      histogram_correlations,
+                                      build_reference_arrays)
+
 logger = logging.getLogger(__name__)
 
 
@@ -36,16 +40,27 @@ class FrameAnalyzer:
             # 质量要求
             'min_brightness': 30.0,  # 最低亮度要求
             'min_sharpness': 80.0,  # 最低清晰度要求
+
+            # 参考画面匹配参数
+            'reference_max_distance': 10,  # 感知哈希最大汉明距离
+            'reference_min_hist_correl': 0.9,  # 直方图最小相关系数
+            'reference_stable_frames': 3,  # 连续匹配帧数
         }
 
     def analyze_first_last_frames(
             self,
             frames_info: List[Dict],
-            scene_scores: List[float]
+            scene_scores: List[float],
+            references: Optional[List[Dict]] = None
     ) -> Tuple[int, int, float]:
         """
         分析并标记首尾帧 - 全视频范围搜索
 
+        Args:
+        frames_info: 帧信息列表
+        scene_scores: 场景变化分数
+        references: 参考画面指纹列表(可选)，提供时优先按参考画面确定尾帧
+
         Returns:
         (first_frame_idx, last_frame_idx, confidence)
 
@@ -58,9 +73,16 @@ class FrameAnalyzer:
         # 1. 寻找首帧 - 从稳定到变化的转折点（全视频搜索）
         first_idx = self._find_transition_start(frames_info, scene_scores)
 
-        # 2. 寻找尾帧 - 从变化到稳定的转折点（全视频搜索）
-        last_idx = self._find_transition_end(frames_info, scene_scores,
-                                             first_idx)
+        # 2. 寻找尾帧 - 优先匹配参考画面，否则找从变化到稳定的转折点
+        last_idx = None
+        if references:
+            last_idx = self._find_last_frame_by_reference(
+                frames_info, references, first_idx)
+
+        matched_reference = last_idx is not None
+        if not matched_reference:
+            last_idx = self._find_transition_end(frames_info, scene_scores,
+                                                 first_idx)
 
         # 3. 计算置信度
         confidence = self._calculate_confidence(
@@ -69,6 +91,8 @@ class FrameAnalyzer:
             last_idx,
             scene_scores
         )
+        if matched_reference:
+            confidence = min(confidence + 0.1, 1.0)
 
         logger.info(
             f"识别完成: 首帧={first_idx}/{len(frames_info)} ({first_idx / len(frames_info) * 100:.1f}%), "
@@ -235,6 +259,68 @@ class FrameAnalyzer:
         return self._find_last_frame_fallback(frames_info, scene_scores,
                                               first_idx)
 
+    def _find_last_frame_by_reference(
+            self,
+            frames_info: List[Dict],
+            references: List[Dict],
+            first_idx: int
+    ) -> Optional[int]:
+        """
+        按参考画面指纹寻找尾帧
+
+        策略:
+        1.
+        向量化计算所有帧与参考画面的汉明距离和直方图相关系数
+        2.
+        首帧之后第一个连续N帧都匹配参考画面的帧即为尾帧
+
+        Returns:
+        尾帧索引，未匹配返回None
+        """
+        if not all('phash' in f and 'histogram' in f for f in frames_info):
+            logger.warning("帧信息缺少指纹特征，跳过参考画面匹配")
+            return None
+
+        ref_arrays = build_reference_arrays(references)
+        if ref_arrays is None:
+            return None
+        ref_hashes, ref_hists = ref_arrays
+
+        hashes = np.array([f['phash'] for f in frames_info], dtype=np.uint64)
+        hists = np.array([f['histogram'] for f in frames_info],
+                         dtype=np.float32)
+
+        # (N, R) -> 每帧只要匹配任意一张参考图即可
+        distances = hamming_distances(hashes, ref_hashes)
+        correls = histogram_correlations(hists, ref_hists)
+        matched = np.any(
+            (distances <= self.config['reference_max_distance']) &
+            (correls >= self.config['reference_min_hist_correl']),
+            axis=1
+        )
+
+        # 连续稳定匹配: 窗口内全部匹配
+        window = self.config['reference_stable_frames']
+        if len(matched) < window:
+            return None
+        stable = np.convolve(matched.astype(np.int32),
+                             np.ones(window, dtype=np.int32),
+                             mode='valid') == window
+        stable[:first_idx + 1] = False
+
+        hits = np.flatnonzero(stable)
+        if len(hits) == 0:
+            logger.info("未找到与参考画面匹配的稳定帧")
+            return None
+
+        last_idx = int(hits[0])
+        logger.info(
+            f"参考画面匹配成功: frame={last_idx}, "
+            f"distance={int(distances[last_idx].min())}, "
+            f"correl={float(correls[last_idx].max()):.3f}"
+        )
+        return last_idx
+
     def _calculate_frame_quality(self, frame: Dict) -> float:
         """
         计算帧的质量分数
@@ -9,31 +9,70 @@
 import cv2
 import numpy as np
 import logging
-from typing import List, Tuple, Dict
+import threading
+from typing import Callable, List, Tuple, Dict, Optional
 from pathlib import Path
 
+from app.config import settings
+from app.services.scene_metrics import SceneChangeDetector
+from app.services.fingerprint import compute_phash
+
 logger = logging.getLogger(__name__)
 
 
+class FrameBuffers(threading.local):
+    """
+    可复用的帧缓冲区(每个线程一份)
+
+    cap.read / cvtColor / Laplacian 传入尺寸一致的目标数组时直接写入，
+    避免每帧重新分配数MB内存；尺寸变化时OpenCV会返回新数组并替换缓存
+    """
+
+    def __init__(self):
+        self.frame: Optional[np.ndarray] = None
+        self.gray: Optional[np.ndarray] = None
+        self.laplacian: Optional[np.ndarray] = None
+
+    def preallocate(self, width: int, height: int):
+        """按分辨率预分配缓冲区(Worker进程初始化时调用)"""
+        self.frame = np.empty((height, width, 3), dtype=np.uint8)
+        self.gray = np.empty((height, width), dtype=np.uint8)
+        self.laplacian = np.empty((height, width), dtype=np.float64)
+
+
+# 全局单例
+frame_buffers = FrameBuffers()
+
+
 class FrameExtractor:
     """帧提取器"""
 
-    def __init__(self, sampling_rate: int = 2):
+    def __init__(
+            self,
+            sampling_rate: int = None,
+            scene_metrics: Optional[List[str]] = None
+    ):
         """
         初始化
 
         Args:
         sampling_rate: 采样率，1
         表示提取所有帧，2
-        表示每2帧提取1帧
+        表示每2帧提取1帧(默认使用配置)
+        scene_metrics: 启用的场景变化指标(为空使用默认配置)
 
         """
-        self.sampling_rate = sampling_rate
+        self.sampling_rate = sampling_rate or settings.FRAME_SAMPLING_RATE
+        self.scene_detector = SceneChangeDetector(scene_metrics)
 
     def extract_all_frames(
             self,
             video_path: str,
-            output_callback=None
+            output_callback=None,
+            keep_data: bool = True,
+            checkpoint: Optional[Callable[[], None]] = None,
+            frame_sink: Optional[Callable[[np.ndarray], None]] = None,
+            timestamps: Optional[List[float]] = None
     ) -> List[Dict]:
         """
         提取视频所有帧
@@ -41,6 +80,11 @@ class FrameExtractor:
         Args:
         video_path: 视频路径
         output_callback: 回调函数，参数为(frame_data, frame_info)
+        keep_data: 返回的帧信息中是否保留JPEG数据(由回调处理数据时可关闭以节省内存)
+        checkpoint: 每解码一帧调用一次的取消检查点(抛出异常即中止解码)
+        frame_sink: 接收每一个解码帧(含未采样的帧)，如写入代理视频；
+            帧缓冲区会被下一帧复用，不能保留引用
+        timestamps: 如提供，追加每一个解码帧的显示时间戳(毫秒)，用于构建定位索引
 
 
         Returns:
@@ -48,6 +92,7 @@ class FrameExtractor:
         """
         cap = cv2.VideoCapture(video_path)
         frames_info = []
+        self.scene_detector.reset()
 
         try:
             total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
@@ -58,9 +103,19 @@ class FrameExtractor:
                 f"开始提取帧: total={total_frames}, sampling_rate={self.sampling_rate}")
 
             while True:
-                ret, frame = cap.read()
+                ret, frame = cap.read(frame_buffers.frame)
                 if not ret:
                     break
+                frame_buffers.frame = frame
+
+                if checkpoint:
+                    checkpoint()
+
+                if frame_sink:
+                    frame_sink(frame)
+
+                if timestamps is not None:
+                    timestamps.append(cap.get(cv2.CAP_PROP_POS_MSEC))
 
                 if frame_number % self.sampling_rate != 0:
                     frame_number += 1
@@ -86,10 +141,11 @@ class FrameExtractor:
                 frame_info = {
                     'frame_number': frame_number,
                     'timestamp': timestamp_ms,
-                    'data': frame_data,
                     'size': len(frame_data),
                     **features
                 }
+                if keep_data:
+                    frame_info['data'] = frame_data
 
                 frames_info.append(frame_info)
 
@@ -109,6 +165,8 @@ class FrameExtractor:
 
             logger.info(
                 f"帧提取完成: extracted={extracted_count}, total={total_frames}")
+            logger.info(
+                f"场景指标耗时: {self.scene_detector.cost_report()}")
 
             return frames_info
 
@@ -126,19 +184,34 @@ class FrameExtractor:
         Returns:
         Dict: 特征字典
         """
-        # 转灰度图
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        # 转灰度图(复用缓冲区)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=frame_buffers.gray)
+        frame_buffers.gray = gray
 
         # 亮度 (平均像素值)
         brightness = float(np.mean(gray))
 
         # 清晰度 (Laplacian方差)
-        laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
+        laplacian = cv2.Laplacian(gray, cv2.CV_64F,
+                                  dst=frame_buffers.laplacian)
+        frame_buffers.laplacian = laplacian
+        laplacian_var = laplacian.var()
         sharpness = float(laplacian_var)
 
+        # 场景变化 (与前一采样帧比较，复用同一份灰度图)
+        scene_score, metric_scores = self.scene_detector.update(gray,
+                                                                brightness)
+
+        # 指纹 (感知哈希 + 缩略直方图，用于参考画面匹配)
+        scene_frame = self.scene_detector.current_frame
+
         return {
             'brightness': brightness,
-            'sharpness': sharpness
+            'sharpness': sharpness,
+            'scene_change_score': scene_score,
+            'scene_metrics': metric_scores,
+            'phash': compute_phash(scene_frame.small),
+            'histogram': scene_frame.hist.flatten()
         }
 
     def calculate_scene_changes(self, frames_info: List[Dict]) -> List[float]:
@@ -155,6 +228,10 @@ class FrameExtractor:
         if len(frames_info) < 2:
             return [0.0] * len(frames_info)
 
+        # 提取时已增量计算
+        if all('scene_change_score' in f for f in frames_info):
+            return [f['scene_change_score'] for f in frames_info]
+
         scene_scores = [0.0]  # 第一帧场景变化为0
 
         for i in range(1, len(frames_info)):
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@FileName: frame_renderer
+@Author  : shwezheng
+@Time    : 2026/10/20 03:40
+@Software: PyCharm
+"""
+import os
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, Optional
+
+from prometheus_client import Counter
+
+from app.config import settings
+from app.models.video import Video
+from app.redis_client import get_async_binary_redis
+from app.services.proxy_video import local_proxy, proxy_size
+from app.services.seek_index import load_seek_index
+from app.services.source_cache import SourceCache, source_cache
+from app.services.video_processor import VideoProcessor
+
+logger = logging.getLogger(__name__)
+
+RENDER_FORMATS = {"jpeg": "image/jpeg", "png": "image/png", "webp": "image/webp"}
+
+_HOT_KEY = "render:frame:{key}"
+_LOCK_KEY = "render:frame:{key}:lock"
+
+_RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+FRAME_RENDER_REQUESTS = Counter(
+    "frame_render_requests_total",
+    "按需渲染帧请求(按命中层级)",
+    ["tier"]
+)
+
+
+class RenderCache(SourceCache):
+    """
+    渲染结果的节点本地磁盘缓存(复用源视频缓存的LRU淘汰)
+
+    淘汰需要扫描整个目录，只在估算大小(上次扫描结果 + 本进程此后写入)
+    超过上限，或距上次扫描超过 RENDER_CACHE_SCAN_INTERVAL 时执行
+    """
+
+    def __init__(self, root: str = None, max_bytes: int = None):
+        super().__init__(root or settings.RENDER_CACHE_DIR,
+                         max_bytes or settings.RENDER_CACHE_MAX_BYTES)
+        self._estimated_bytes = 0
+        self._scanned_at = 0.0
+        self._mutex = threading.Lock()
+
+    def read(self, name: str) -> Optional[bytes]:
+        path = os.path.join(self.root, name)
+        if not self._touch(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            # 刚被淘汰
+            return None
+
+    def write(self, name: str, data: bytes):
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, name)
+        part_path = f"{path}.part"
+        with open(part_path, "wb") as f:
+            f.write(data)
+        os.replace(part_path, path)
+
+        with self._mutex:
+            self._estimated_bytes += len(data)
+            if self._estimated_bytes <= self.max_bytes and \
+                    time.monotonic() - self._scanned_at < \
+                    settings.RENDER_CACHE_SCAN_INTERVAL:
+                return
+            self._scanned_at = time.monotonic()
+
+        self.evict(keep=path)
+        with self._mutex:
+            if self.used_bytes is not None:
+                self._estimated_bytes = self.used_bytes
+
+
+class FrameRenderer:
+    """
+    按需渲染视频帧
+
+    - 逐级查找: Redis热点缓存 -> 本地磁盘LRU -> 解码渲染
+    - 输出宽度不超过代理视频时从全I帧代理视频渲染，否则从原视频按定位索引渲染
+    - 同一帧的并发请求只渲染一次: 进程内共享同一个渲染任务；
+      跨进程由Redis锁选出一个渲染者，其余请求等待热点缓存
+    """
+
+    def __init__(self):
+        self.disk = RenderCache()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def _run(self, func, *args, **kwargs):
+        """在渲染线程池中执行(OpenCV解码与编码期间释放GIL)"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.RENDER_THREADS,
+                thread_name_prefix="frame-render")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, partial(func, *args, **kwargs))
+
+    async def render(self, video: Video, frame_number: int,
+                     width: Optional[int] = None, fmt: str = "jpeg") -> bytes:
+        """
+        渲染视频帧
+
+        Args:
+        video: 视频记录(需已上传到MinIO)
+        frame_number: 帧号
+        width: 输出宽度，为空或超过原视频宽度时按原视频宽度
+        fmt: 图片格式 jpeg/png/webp
+
+        Returns:
+        图片数据
+        """
+        if not width or (video.width and width > video.width):
+            width = video.width
+        key = f"{video.id}_{frame_number}_{width or 0}.{fmt}"
+
+        task = self._inflight.get(key)
+        if task is None:
+            use_proxy = bool(
+                video.proxy_path and width and video.width and video.height and
+                width <= proxy_size(video.width, video.height)[0])
+            job = partial(
+                VideoProcessor.read_frame, frame_number=frame_number,
+                width=width, fmt=fmt)
+            task = asyncio.ensure_future(self._load(
+                key, partial(self._render, job, video.id, video.minio_path,
+                             video.proxy_path if use_proxy else None,
+                             video.seek_index_path)))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        # 单个请求断开不取消共享的渲染任务
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def _render(job, video_id: str, source_object: str,
+                proxy_object: Optional[str],
+                index_object: Optional[str]) -> bytes:
+        """在渲染线程中取得本地视频文件并解码"""
+        if proxy_object:
+            # 代理视频为恒定帧率全I帧，直接按帧号定位
+            return job(local_proxy(video_id, proxy_object))
+        index = load_seek_index(video_id, index_object) \
+            if index_object else None
+        return job(source_cache.get(video_id, source_object), index=index)
+
+    async def _load(self, key: str, render) -> bytes:
+        client = get_async_binary_redis()
+        hot_key = _HOT_KEY.format(key=key)
+
+        data = await client.get(hot_key)
+        if data is not None:
+            FRAME_RENDER_REQUESTS.labels("redis").inc()
+            return data
+
+        data = await self._run(self.disk.read, key)
+        if data is not None:
+            FRAME_RENDER_REQUESTS.labels("disk").inc()
+            await self._promote(hot_key, data)
+            return data
+
+        lock_key = _LOCK_KEY.format(key=key)
+        token = str(uuid.uuid4())
+        if await client.set(lock_key, token, nx=True,
+                            px=settings.RENDER_LOCK_MS):
+            try:
+                return await self._render_and_store(key, hot_key, render)
+            finally:
+                await client.eval(_RELEASE_LOCK, 1, lock_key, token)
+
+        # 其他进程正在渲染同一帧: 锁存在期间等待热点缓存
+        deadline = time.monotonic() + settings.RENDER_LOCK_MS / 1000
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            data = await client.get(hot_key)
+            if data is not None:
+                FRAME_RENDER_REQUESTS.labels("shared").inc()
+                return data
+            if not await client.exists(lock_key):
+                # 渲染者失败，或结果超过热点缓存上限只写入了磁盘缓存
+                break
+
+        data = await self._run(self.disk.read, key)
+        if data is not None:
+            FRAME_RENDER_REQUESTS.labels("disk").inc()
+            return data
+        return await self._render_and_store(key, hot_key, render)
+
+    async def _render_and_store(self, key: str, hot_key: str,
+                                render) -> bytes:
+        start = time.perf_counter()
+        data = await self._run(render)
+        FRAME_RENDER_REQUESTS.labels("render").inc()
+        logger.info(f"Frame rendered: {key}, {len(data) >> 10}KB in "
+                    f"{(time.perf_counter() - start) * 1000:.0f}ms")
+
+        await self._run(self.disk.write, key, data)
+        await self._promote(hot_key, data)
+        return data
+
+    @staticmethod
+    async def _promote(hot_key: str, data: bytes):
+        """写入热点缓存(过大的图片只保留在磁盘缓存)"""
+        if len(data) <= settings.RENDER_HOT_MAX_BYTES:
+            await get_async_binary_redis().set(
+                hot_key, data, ex=settings.RENDER_HOT_TTL_SECONDS)
+
+    def close(self):
+        """关闭线程池(应用退出时调用)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+# 全局单例
+frame_renderer = FrameRenderer()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@FileName: frame_spool
+@Author  : shwezheng
+@Time    : 2026/10/19 20:00
+@Software: PyCharm
+"""
+import os
+import shutil
+import logging
+from typing import Dict, List
+
+import numpy as np
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class FrameSpool:
+    """
+    流水线阶段之间的帧暂存目录
+
+    CPU阶段写入JPEG帧与特征清单，IO阶段读取上传；
+    目录位于提取节点本地，之后的阶段投递到同节点的专用队列
+
+    目录结构:
+    {PIPELINE_SPOOL_DIR}/{video_id}/
+        frames/{frame_number}.jpg
+        manifest.npz
+        proxy.avi              (分析代理视频)
+        seek_index.npz         (定位索引)
+    """
+
+    def __init__(self, video_id: str, root: str = None):
+        self.video_id = video_id
+        self.path = os.path.join(root or settings.PIPELINE_SPOOL_DIR,
+                                 video_id)
+        self.frames_dir = os.path.join(self.path, "frames")
+        self.manifest_path = os.path.join(self.path, "manifest.npz")
+        self.proxy_path = os.path.join(self.path, "proxy.avi")
+        self.index_path = os.path.join(self.path, "seek_index.npz")
+
+    def prepare(self):
+        """创建(或清空后重建)暂存目录"""
+        self.cleanup()
+        os.makedirs(self.frames_dir, exist_ok=True)
+
+    def frame_path(self, frame_number: int) -> str:
+        return os.path.join(self.frames_dir, f"{frame_number}.jpg")
+
+    def write_frame(self, frame_number: int, data: bytes):
+        with open(self.frame_path(frame_number), "wb") as f:
+            f.write(data)
+
+    def read_frame(self, frame_number: int) -> bytes:
+        with open(self.frame_path(frame_number), "rb") as f:
+            return f.read()
+
+    def save_manifest(self, frames_info: List[Dict], frame_ids: List[str]):
+        """
+        保存帧特征清单
+
+        Args:
+        frames_info: 提取阶段的帧信息(不含图像数据)
+        frame_ids: 预分配的帧记录ID(与frames_info顺序一致)
+        """
+        count = len(frames_info)
+        np.savez(
+            self.manifest_path,
+            frame_id=np.array(frame_ids, dtype=np.str_),
+            frame_number=np.array([f['frame_number'] for f in frames_info],
+                                  dtype=np.int64),
+            timestamp=np.array([f['timestamp'] for f in frames_info],
+                               dtype=np.float64),
+            brightness=np.array([f['brightness'] for f in frames_info],
+                                dtype=np.float64),
+            sharpness=np.array([f['sharpness'] for f in frames_info],
+                               dtype=np.float64),
+            scene_change_score=np.array(
+                [f.get('scene_change_score', 0.0) for f in frames_info],
+                dtype=np.float64),
+            phash=np.array([f['phash'] for f in frames_info],
+                           dtype=np.uint64),
+            histogram=(np.stack([f['histogram'] for f in frames_info])
+                       if count else np.zeros((0, 0), dtype=np.float32))
+        )
+
+    def load_manifest(self) -> List[Dict]:
+        """
+        读取帧特征清单
+
+        Returns:
+        帧信息列表(字段与FrameExtractor输出一致，另含id)
+        """
+        with np.load(self.manifest_path, allow_pickle=False) as npz:
+            columns = {name: npz[name] for name in npz.files}
+
+        frames_info = []
+        for i in range(len(columns['frame_id'])):
+            frames_info.append({
+                'id': str(columns['frame_id'][i]),
+                'frame_number': int(columns['frame_number'][i]),
+                'timestamp': float(columns['timestamp'][i]),
+                'brightness': float(columns['brightness'][i]),
+                'sharpness': float(columns['sharpness'][i]),
+                'scene_change_score': float(columns['scene_change_score'][i]),
+                'phash': int(columns['phash'][i]),
+                'histogram': columns['histogram'][i]
+            })
+        return frames_info
+
+    def cleanup(self):
+        """删除暂存目录"""
+        if os.path.isdir(self.path):
+            shutil.rmtree(self.path, ignore_errors=True)
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@FileName: memory_admission
+@Author  : shwezheng
+@Time    : 2026/10/19 23:20
+@Software: PyCharm
+"""
+import json
+import time
+import socket
+import logging
+import resource
+from typing import Optional
+
+from app.config import settings
+from app.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+_LEASES_KEY = "memory:node:{node}:leases"  # 租约过期时间(ZSET)
+_BYTES_KEY = "memory:node:{node}:bytes"  # 租约预留字节数(HASH)
+_RATIO_KEY = "memory:ratio"  # 实际峰值/估算值(指数滑动平均)
+_SAMPLES_KEY = "memory:samples"  # 最近的任务内存记录
+_MAX_SAMPLES = 1000
+
+# 清理过期租约后检查预算，节点空闲时总是放行(避免超大任务永远无法执行)
+_ACQUIRE = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], 0, ARGV[1])
+for _, id in ipairs(expired) do
+    redis.call('HDEL', KEYS[2], id)
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, ARGV[1])
+
+local used = 0
+for _, v in ipairs(redis.call('HVALS', KEYS[2])) do
+    used = used + tonumber(v)
+end
+if used > 0 and used + tonumber(ARGV[3]) > tonumber(ARGV[4]) then
+    return 0
+end
+redis.call('HSET', KEYS[2], ARGV[2], ARGV[3])
+redis.call('ZADD', KEYS[1], ARGV[5], ARGV[2])
+return 1
+"""
+
+
+def estimate_task_bytes(width: int, height: int, frames: int = 0,
+                        keep_data: bool = False) -> int:
+    """
+    按分辨率估算单个任务的内存峰值增量(未校准)
+
+    - 帧缓冲: BGR + 灰度 + Laplacian(float64)
+    - 解码器内部的参考帧(YUV420)与一帧JPEG编码缓冲
+    - 每个采样帧保留的特征信息，keep_data时另加JPEG数据
+
+    Args:
+    width: 视频宽度
+    height: 视频高度
+    frames: 采样帧数
+    keep_data: 是否在内存中保留所有帧的JPEG数据
+
+    Returns:
+    估算字节数
+    """
+    pixels = max(width or 0, 1) * max(height or 0, 1)
+    buffers = pixels * (3 + 1 + 8)
+    decoder = pixels * 1.5 * settings.MEMORY_DECODER_FRAMES
+    jpeg = pixels * 3 * settings.MEMORY_JPEG_RATIO
+    per_frame = settings.MEMORY_FRAME_INFO_BYTES + (jpeg if keep_data else 0)
+    return int(buffers + decoder + jpeg + max(frames, 0) * per_frame)
+
+
+def _read_proc_status(field: str) -> Optional[int]:
+    """读取/proc/self/status中的内存字段(字节)，非Linux返回None"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss() -> bool:
+    """重置当前进程的峰值RSS(Linux 4.0+)，使VmHWM只反映本次任务"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class MemoryLease:
+    """内存预留租约"""
+
+    __slots__ = ("task_id", "raw_bytes", "estimated_bytes", "start_rss",
+                 "peak_reset")
+
+    def __init__(self, task_id: str, raw_bytes: int, estimated_bytes: int,
+                 start_rss: int, peak_reset: bool):
+        self.task_id = task_id
+        self.raw_bytes = raw_bytes
+        self.estimated_bytes = estimated_bytes
+        self.start_rss = start_rss
+        self.peak_reset = peak_reset
+
+
+class MemoryAdmission:
+    """
+    节点内存准入控制
+
+    - 同一节点上所有Worker进程共享一份预算(WORKER_MEMORY_BUDGET_MB)
+    - 任务开始前按分辨率估算峰值并预留，超出预算时由任务自行延迟重试
+    - 任务结束后记录实际峰值RSS，校准估算系数
+
+    预热后的子进程已持有预分配帧缓冲与之前任务留下的堆内存，
+    峰值相对任务开始时RSS的增量常接近0；校准改用峰值减去子进程初始化时的基线，
+    并将系数限制在 [MEMORY_RATIO_MIN, MEMORY_RATIO_MAX]
+    """
+
+    def __init__(self):
+        self.node = settings.WORKER_NODE_NAME or socket.gethostname()
+        self.baseline_rss: Optional[int] = None
+
+    def mark_baseline(self):
+        """记录子进程的RSS基线(worker_process_init中、预热之前调用)"""
+        self.baseline_rss = _read_proc_status("VmRSS")
+
+    @staticmethod
+    def _clamp(ratio: float) -> float:
+        return min(max(ratio, settings.MEMORY_RATIO_MIN),
+                   settings.MEMORY_RATIO_MAX)
+
+    def ratio(self) -> float:
+        """实际峰值与估算值之比(未校准时为1)"""
+        try:
+            value = get_redis().get(_RATIO_KEY)
+            return self._clamp(float(value)) if value else 1.0
+        except Exception:
+            return 1.0
+
+    def try_acquire(self, task_id: str,
+                    raw_bytes: int) -> Optional[MemoryLease]:
+        """
+        预留内存
+
+        Args:
+        task_id: Celery任务ID
+        raw_bytes: estimate_task_bytes 的估算值
+
+        Returns:
+        租约；预算不足时返回None(Redis不可用时直接放行)
+        """
+        estimated = int(raw_bytes * self.ratio())
+        now = time.time()
+        try:
+            admitted = get_redis().eval(
+                _ACQUIRE, 2,
+                _LEASES_KEY.format(node=self.node),
+                _BYTES_KEY.format(node=self.node),
+                now, task_id, estimated,
+                settings.WORKER_MEMORY_BUDGET_MB * 1024 * 1024,
+                now + settings.MEMORY_LEASE_TTL_SECONDS
+            )
+        except Exception as e:
+            logger.warning(f"Memory admission unavailable: {e}")
+            admitted = 1
+
+        if not admitted:
+            return None
+        return MemoryLease(
+            task_id=task_id,
+            raw_bytes=raw_bytes,
+            estimated_bytes=estimated,
+            start_rss=_read_proc_status("VmRSS") or 0,
+            peak_reset=_reset_peak_rss()
+        )
+
+    def release(self, lease: MemoryLease, **labels) -> Optional[int]:
+        """
+        释放预留，记录实际峰值并校准估算系数
+
+        Args:
+        lease: try_acquire返回的租约
+        labels: 附加记录的字段(阶段、分辨率等)
+
+        Returns:
+        本次任务的峰值内存(相对子进程基线，字节)，无法测量时为None
+        """
+        if lease.peak_reset:
+            peak = _read_proc_status("VmHWM")
+        else:
+            # 无法重置时只能拿到进程生命周期内的峰值，不参与校准
+            peak = None
+        # 非prefork子进程(未记录基线)时退回相对任务开始时的增量
+        baseline = self.baseline_rss or lease.start_rss
+        delta = peak - baseline if peak else None
+
+        client = get_redis()
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.hdel(_BYTES_KEY.format(node=self.node), lease.task_id)
+            pipe.zrem(_LEASES_KEY.format(node=self.node), lease.task_id)
+            pipe.lpush(_SAMPLES_KEY, json.dumps(dict(
+                labels,
+                node=self.node,
+                task_id=lease.task_id,
+                estimated_bytes=lease.estimated_bytes,
+                peak_bytes=delta,
+                max_rss_bytes=resource.getrusage(
+                    resource.RUSAGE_SELF).ru_maxrss * 1024
+            )))
+            pipe.ltrim(_SAMPLES_KEY, 0, _MAX_SAMPLES - 1)
+            pipe.execute()
+
+            if delta and delta > 0 and lease.raw_bytes > 0:
+                observed = self._clamp(delta / lease.raw_bytes)
+                current = client.get(_RATIO_KEY)
+                ratio = (observed if current is None else
+                         float(current) * (1 - settings.MEMORY_RATIO_ALPHA) +
+                         observed * settings.MEMORY_RATIO_ALPHA)
+                client.set(_RATIO_KEY, ratio)
+        except Exception as e:
+            logger.warning(f"Failed to release memory lease: {e}")
+
+        logger.info(f"任务内存: estimated={lease.estimated_bytes >> 20}MB, "
+                    f"peak={delta >> 20 if delta else '-'}MB")
+        return delta
+
+
+# 全局单例
+memory_admission = MemoryAdmission()
@@ -7,10 +7,18 @@
 @Software: PyCharm
 """
 import json
+import time
 import uuid
-from datetime import datetime
+import random
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, List, Optional, Tuple
 
+import urllib3
 from minio import Minio
+from minio.datatypes import Part
+from minio.deleteobjects import DeleteObject
 from minio.error import S3Error
 
 import io
@@ -20,19 +28,124 @@ from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# 可重试的S3错误码(服务端繁忙或临时故障)
+_RETRYABLE_S3_CODES = {"SlowDown", "InternalError", "ServiceUnavailable",
+                       "RequestTimeout", "XMinioServerNotInitialized"}
+
 
 class MinIOService:
     """MinIO服务类"""
 
-    def __init__(self):
-        """初始化MinIO客户端"""
-        self.client = Minio(
+    def __init__(self, ensure_bucket: bool = True):
+        """
+        初始化MinIO客户端
+
+        Args:
+        ensure_bucket: 是否检查并配置bucket(额外的客户端实例可跳过)
+        """
+        self.client = self._create_client()
+        self._upload_client: Optional[Minio] = None
+        self._upload_pool: Optional[ThreadPoolExecutor] = None
+        if ensure_bucket:
+            self._ensure_bucket()
+
+    @staticmethod
+    def _create_client(retries: urllib3.Retry = None,
+                       maxsize: int = None) -> Minio:
+        """创建使用独立HTTP连接池的客户端(keep-alive连接在请求间复用)"""
+        http_client = urllib3.PoolManager(
+            num_pools=4,
+            maxsize=maxsize or settings.MINIO_HTTP_POOL_SIZE,
+            timeout=urllib3.Timeout(connect=5,
+                                    read=settings.MINIO_HTTP_TIMEOUT),
+            retries=retries or urllib3.Retry(
+                total=5,
+                backoff_factor=0.2,
+                status_forcelist=[500, 502, 503, 504]
+            )
+        )
+        return Minio(
             settings.MINIO_ENDPOINT,
             access_key=settings.MINIO_ACCESS_KEY,
             secret_key=settings.MINIO_SECRET_KEY,
-            secure=settings.MINIO_SECURE
+            secure=settings.MINIO_SECURE,
+            http_client=http_client
         )
-        self._ensure_bucket()
+
+    @property
+    def upload_client(self) -> Minio:
+        """
+        帧图片上传专用客户端(按需创建)
+
+        连接数不少于上传线程数，避免并发上传时连接被丢弃重建；
+        传输层只重试建连失败，其余错误由 _put_with_retry 带抖动重试。
+        其他调用仍使用 self.client 的传输层重试
+        """
+        if self._upload_client is None:
+            self._upload_client = self._create_client(
+                retries=urllib3.Retry(total=2, read=0, status=0,
+                                      backoff_factor=0.1),
+                maxsize=max(settings.MINIO_HTTP_POOL_SIZE,
+                            settings.MINIO_UPLOAD_THREADS))
+        return self._upload_client
+
+    def reset_client(self):
+        """
+        重建客户端与连接池
+
+        fork出的Worker子进程不能复用父进程的socket与线程，需在子进程初始化时调用
+        """
+        self.client = self._create_client()
+        self._upload_client = None
+        self._upload_pool = None
+
+    @property
+    def upload_pool(self) -> ThreadPoolExecutor:
+        """进程内共享的上传线程池(按需创建)"""
+        if self._upload_pool is None:
+            self._upload_pool = ThreadPoolExecutor(
+                max_workers=settings.MINIO_UPLOAD_THREADS,
+                thread_name_prefix="minio-upload")
+        return self._upload_pool
+
+    @staticmethod
+    def _frame_object_name(video_id: str, frame_type: str,
+                           timestamp: float) -> str:
+        return f"{video_id}/frame_{frame_type}_{timestamp:.2f}.jpg"
+
+    @staticmethod
+    def _object_url(object_name: str) -> str:
+        return f"http://{settings.MINIO_ENDPOINT}/{settings.MINIO_BUCKET}/{object_name}"
+
+    def _put_with_retry(self, object_name: str, data: bytes,
+                        content_type: str):
+        """上传单个对象，临时错误按指数退避+全抖动重试"""
+        attempts = settings.MINIO_UPLOAD_RETRIES + 1
+        for attempt in range(attempts):
+            try:
+                self.upload_client.put_object(
+                    bucket_name=settings.MINIO_BUCKET,
+                    object_name=object_name,
+                    data=io.BytesIO(data),
+                    length=len(data),
+                    content_type=content_type
+                )
+                return
+            except S3Error as e:
+                if e.code not in _RETRYABLE_S3_CODES or \
+                        attempt == attempts - 1:
+                    raise
+                error = e
+            except (urllib3.exceptions.HTTPError, OSError) as e:
+                if attempt == attempts - 1:
+                    raise
+                error = e
+
+            delay = random.uniform(
+                0, settings.MINIO_UPLOAD_BACKOFF_SECONDS * 2 ** attempt)
+            logger.warning(f"Upload {object_name} failed ({error}), "
+                           f"retrying in {delay:.2f}s")
+            time.sleep(delay)
 
     def _ensure_bucket(self):
         """确保bucket存在并设置访问策略"""
@@ -89,18 +202,12 @@ class MinIOService:
 
         """
         try:
-            object_name = f"{video_id}/frame_{frame_type}_{timestamp:.2f}.jpg"
-
-            self.client.put_object(
-                bucket_name=settings.MINIO_BUCKET,
-                object_name=object_name,
-                data=io.BytesIO(frame_data),
-                length=len(frame_data),
-                content_type=content_type
-            )
+            object_name = self._frame_object_name(video_id, frame_type,
+                                                  timestamp)
+            self._put_with_retry(object_name, frame_data, content_type)
 
             # 生成访问URL
-            url = f"http://{settings.MINIO_ENDPOINT}/{settings.MINIO_BUCKET}/{object_name}"
+            url = self._object_url(object_name)
 
             logger.info(f"Uploaded frame: {object_name}")
 
@@ -110,6 +217,67 @@ class MinIOService:
             logger.error(f"Upload frame error: {e}")
             raise
 
+    def upload_frames_bulk(
+            self,
+            video_id: str,
+            frames: Iterable[Tuple[bytes, str, float]],
+            concurrency: int = None,
+            checkpoint: Optional[Callable[[], None]] = None,
+            content_type: str = "image/jpeg"
+    ) -> List[str]:
+        """
+        并发批量上传帧图片
+
+        使用进程内共享线程池，单次调用最多 concurrency 个请求在途；
+        frames 按需迭代，内存中只保留在途帧的数据
+
+        Args:
+        video_id: 视频ID
+        frames: (图片字节数据, 帧类型, 时间戳) 的可迭代对象
+        concurrency: 在途请求上限(默认 MINIO_UPLOAD_CONCURRENCY)
+        checkpoint: 每提交一帧前调用的取消检查点(抛出异常即中止)
+        content_type: 内容类型
+
+        Returns:
+        List[str]: 访问URL，顺序与输入一致
+        """
+        window = max(concurrency or settings.MINIO_UPLOAD_CONCURRENCY, 1)
+        pending = deque()
+        urls = []
+
+        try:
+            for frame_data, frame_type, timestamp in frames:
+                if checkpoint:
+                    checkpoint()
+                if len(pending) >= window:
+                    urls.append(self._wait_upload(pending.popleft()))
+
+                object_name = self._frame_object_name(video_id, frame_type,
+                                                      timestamp)
+                future = self.upload_pool.submit(
+                    self._put_with_retry, object_name, frame_data,
+                    content_type)
+                pending.append((future, self._object_url(object_name)))
+
+            while pending:
+                urls.append(self._wait_upload(pending.popleft()))
+
+        except BaseException:
+            # 取消尚未开始的上传，已在途的请求自然结束
+            for future, _ in pending:
+                future.cancel()
+            raise
+
+        logger.info(f"Uploaded {len(urls)} frames: {video_id}")
+        return urls
+
+    @staticmethod
+    def _wait_upload(item) -> str:
+        """等待上传完成并返回URL(上传失败时抛出原异常)"""
+        future, url = item
+        future.result()
+        return url
+
     def upload_video(
             self,
             video_id: str,
@@ -129,7 +297,7 @@ class MinIOService:
         str: MinIO中的对象名称
         """
         try:
-            object_name = f"{video_id}/original/{filename}"
+            object_name = self.original_object_name(video_id, filename)
 
             self.client.fput_object(
                 bucket_name=settings.MINIO_BUCKET,
@@ -145,30 +313,199 @@ class MinIOService:
             logger.error(f"Upload video error: {e}")
             raise
 
-    def delete_video_objects(self, video_id: str):
+    @staticmethod
+    def original_object_name(video_id: str, filename: str) -> str:
+        """原始视频的对象名称"""
+        return f"{video_id}/original/{filename}"
+
+    @staticmethod
+    def proxy_object_name(video_id: str) -> str:
+        """分析代理视频的对象名称"""
+        return f"{video_id}/proxy/proxy.avi"
+
+    def upload_proxy(self, video_id: str, file_path: str) -> str:
         """
-        删除视频相关的所有对象
+        上传分析代理视频
+
+        Args:
+        video_id: 视频ID
+        file_path: 本地代理视频路径
+
+        Returns:
+        str: MinIO中的对象名称
+        """
+        object_name = self.proxy_object_name(video_id)
+        self.client.fput_object(
+            bucket_name=settings.MINIO_BUCKET,
+            object_name=object_name,
+            file_path=file_path,
+            content_type="video/x-msvideo"
+        )
+        logger.info(f"Uploaded proxy video: {object_name}")
+        return object_name
+
+    @staticmethod
+    def seek_index_object_name(video_id: str) -> str:
+        """定位索引的对象名称"""
+        return f"{video_id}/index/seek_index.npz"
+
+    def upload_seek_index(self, video_id: str, file_path: str) -> str:
+        """
+        上传视频定位索引
 
         Args:
         video_id: 视频ID
+        file_path: 本地索引文件路径
+
+        Returns:
+        str: MinIO中的对象名称
+        """
+        object_name = self.seek_index_object_name(video_id)
+        self.client.fput_object(
+            bucket_name=settings.MINIO_BUCKET,
+            object_name=object_name,
+            file_path=file_path,
+            content_type="application/octet-stream"
+        )
+        logger.info(f"Uploaded seek index: {object_name}")
+        return object_name
+
+    def create_multipart_upload(self, object_name: str,
+                                content_type: str = "video/mp4") -> str:
+        """
+        创建分片上传
+
+        Returns:
+        str: S3 UploadId
+        """
+        return self.client._create_multipart_upload(
+            settings.MINIO_BUCKET, object_name,
+            {"Content-Type": content_type})
 
+    def upload_part(self, object_name: str, upload_id: str,
+                    part_number: int, data: bytes) -> str:
         """
+        上传单个分片(除最后一个分片外不得小于5MiB)
+
+        Returns:
+        str: 分片ETag
+        """
+        return self.client._upload_part(
+            settings.MINIO_BUCKET, object_name, data, None, upload_id,
+            part_number)
+
+    def complete_multipart_upload(self, object_name: str, upload_id: str,
+                                  parts: List[Tuple[int, str]]):
+        """
+        合并分片为完整对象(服务端只登记分片列表，不复制数据)
+
+        Args:
+        parts: [(分片号, ETag)]，按分片号升序
+        """
+        self.client._complete_multipart_upload(
+            settings.MINIO_BUCKET, object_name, upload_id,
+            [Part(number, etag) for number, etag in parts])
+        logger.info(f"Completed multipart upload: {object_name}")
+
+    def abort_multipart_upload(self, object_name: str, upload_id: str):
+        """放弃分片上传并释放已上传的分片"""
+        self.client._abort_multipart_upload(
+            settings.MINIO_BUCKET, object_name, upload_id)
+
+    def presigned_put_url(self, object_name: str, expires: int) -> str:
+        """生成单次PUT上传的预签名URL"""
+        return self.client.presigned_put_object(
+            settings.MINIO_BUCKET, object_name,
+            expires=timedelta(seconds=expires))
+
+    def presigned_part_urls(self, object_name: str, upload_id: str,
+                            part_count: int, expires: int) -> List[str]:
+        """为分片上传的每个分片生成预签名PUT URL(分片号从1开始)"""
+        return [
+            self.client.get_presigned_url(
+                "PUT", settings.MINIO_BUCKET, object_name,
+                expires=timedelta(seconds=expires),
+                extra_query_params={"uploadId": upload_id,
+                                    "partNumber": str(number)})
+            for number in range(1, part_count + 1)
+        ]
+
+    def list_uploaded_parts(self, object_name: str,
+                            upload_id: str) -> List[Tuple[int, str]]:
+        """
+        列出分片上传中已上传的分片(客户端直传时由服务端查询ETag)
+
+        Returns:
+        [(分片号, ETag)]
+        """
+        parts = []
+        marker = None
+        while True:
+            result = self.client._list_parts(
+                settings.MINIO_BUCKET, object_name, upload_id,
+                part_number_marker=marker)
+            parts.extend((p.part_number, p.etag) for p in result.parts)
+            if not result.is_truncated:
+                return parts
+            marker = result.next_part_number_marker
+
+    def object_size(self, object_name: str) -> Optional[int]:
+        """对象大小(字节)，对象不存在时返回None"""
         try:
-            objects = self.client.list_objects(
-                settings.MINIO_BUCKET,
-                prefix=f"{video_id}/",
-                recursive=True
-            )
+            return self.client.stat_object(settings.MINIO_BUCKET,
+                                           object_name).size
+        except S3Error as e:
+            if e.code == "NoSuchKey":
+                return None
+            raise
+
+    def download_object(self, object_name: str, file_path: str):
+        """下载对象到本地文件(先写临时文件，完成后重命名)"""
+        self.client.fget_object(settings.MINIO_BUCKET, object_name, file_path)
+        logger.info(f"Downloaded object: {object_name} -> {file_path}")
+
+    def delete_video_objects(self, video_id: str) -> int:
+        """
+        删除视频相关的所有对象
+
+        列举结果以生成器形式交给 remove_objects，
+        SDK按每批1000个对象发起批量删除，边列举边删除
+
+        Args:
+        video_id: 视频ID
 
-            for obj in objects:
-                self.client.remove_object(settings.MINIO_BUCKET,
-                                          obj.object_name)
-                logger.info(f"Deleted object: {obj.object_name}")
+        Returns:
+        int: 删除的对象数
+        """
+        deleted = 0
+
+        def pending_objects():
+            nonlocal deleted
+            for obj in self.client.list_objects(
+                    settings.MINIO_BUCKET,
+                    prefix=f"{video_id}/",
+                    recursive=True
+            ):
+                deleted += 1
+                yield DeleteObject(obj.object_name)
 
+        try:
+            # 返回值是删除失败的对象(惰性执行，必须迭代)
+            errors = list(self.client.remove_objects(settings.MINIO_BUCKET,
+                                                     pending_objects()))
         except S3Error as e:
             logger.error(f"Delete objects error: {e}")
             raise
 
+        if errors:
+            for error in errors[:10]:
+                logger.error(f"Delete object error: {error}")
+            raise RuntimeError(
+                f"Failed to delete {len(errors)} objects of {video_id}")
+
+        logger.info(f"Deleted {deleted} objects: {video_id}")
+        return deleted
+
     def get_object_url(self, object_name: str, expires: int = 3600) -> str:
         """
         获取对象的预签名URL
@@ -251,6 +588,60 @@ class MinIOService:
             logger.error(f"Upload QR code error: {e}")
             raise
 
+    def upload_reference_image(
+            self,
+            reference_id: str,
+            image_data: bytes,
+            file_extension: str = "png"
+    ) -> tuple[str, str]:
+        """
+        上传参考画面截图到MinIO
+
+        Args:
+            reference_id: 参考画面ID
+            image_data: 图片字节数据
+            file_extension: 文件扩展名
+
+        Returns:
+            tuple[str, str]: (对象名称, 访问URL)
+        """
+        try:
+            object_name = f"references/{reference_id}.{file_extension}"
+            content_type = 'image/png' if file_extension == 'png' else 'image/jpeg'
+
+            self.client.put_object(
+                bucket_name=settings.MINIO_BUCKET,
+                object_name=object_name,
+                data=io.BytesIO(image_data),
+                length=len(image_data),
+                content_type=content_type
+            )
+
+            url = f"http://{settings.MINIO_ENDPOINT}/{settings.MINIO_BUCKET}/{object_name}"
+
+            logger.info(f"Uploaded reference image: {object_name}")
+
+            return object_name, url
+
+        except S3Error as e:
+            logger.error(f"Upload reference image error: {e}")
+            raise
+
+    def delete_object(self, object_name: str):
+        """
+        删除单个对象
+
+        Args:
+        object_name: 对象名称
+
+        """
+        try:
+            self.client.remove_object(settings.MINIO_BUCKET, object_name)
+            logger.info(f"Deleted object: {object_name}")
+        except S3Error as e:
+            logger.error(f"Delete object error: {e}")
+            raise
+
 
 # 全局单例
 minio_service = MinIOService()
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@FileName: phash_index
+@Author  : shwezheng
+@Time    : 2026/10/19 16:20
+@Software: PyCharm
+"""
+import io
+import time
+import uuid
+import logging
+import threading
+from itertools import combinations
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from minio.error import S3Error
+
+from app.config import settings
+from app.services.fingerprint import hex_to_phash
+
+logger = logging.getLogger(__name__)
+
+# 64位哈希切分为4段，每段16位
+_CHUNKS = 4
+_CHUNK_BITS = 16
+# 查询半径上限: 4段 x 每段最多3位差异
+MAX_QUERY_DISTANCE = _CHUNKS * 4 - 1
+# 少于该数量时直接全量扫描
+_BRUTE_FORCE_SIZE = 4096
+
+_SAVE_LOCK_KEY = "phash:index:{project_id}:save"
+_SAVE_LOCK_MS = 60000
+
+_RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _chunk_masks(radius: int) -> np.ndarray:
+    """16位内汉明距离不超过radius的所有异或掩码"""
+    masks = [0]
+    for r in range(1, radius + 1):
+        for bits in combinations(range(_CHUNK_BITS), r):
+            mask = 0
+            for b in bits:
+                mask |= 1 << b
+            masks.append(mask)
+    return np.array(masks, dtype=np.uint16)
+
+
+class MultiIndexHash:
+    """
+    感知哈希多索引(Multi-Index Hashing)
+
+    根据鸽巢原理，汉明距离<=d的两个哈希至少有一段的差异<=d//4，
+    先按段查候选，再用精确汉明距离过滤
+    """
+
+    def __init__(
+            self,
+            hashes: np.ndarray,
+            frame_ids: np.ndarray,
+            video_ids: np.ndarray,
+            built_at: Optional[float] = None
+    ):
+        self.hashes = hashes.astype(np.uint64)
+        self.frame_ids = frame_ids
+        self.video_ids = video_ids
+        self.built_at = built_at or time.time()
+
+        # 每段: (排序后的段值, 对应行号)
+        self._tables = []
+        for i in range(_CHUNKS):
+            shift = np.uint64(i * _CHUNK_BITS)
+            values = ((self.hashes >> shift) & np.uint64(0xFFFF)).astype(
+                np.uint16)
+            order = np.argsort(values, kind='stable')
+            self._tables.append((values[order], order))
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def search(
+            self,
+            query: int,
+            max_distance: int = 8,
+            limit: int = 50
+    ) -> List[Tuple[int, int]]:
+        """
+        查询相似哈希
+
+        Args:
+        query: 64位查询哈希
+        max_distance: 最大汉明距离
+        limit: 最多返回条数
+
+        Returns:
+        List[(行号, 距离)]，按距离升序
+        """
+        if len(self) == 0:
+            return []
+
+        max_distance = min(max_distance, MAX_QUERY_DISTANCE)
+        query = np.uint64(query)
+
+        if len(self) <= _BRUTE_FORCE_SIZE:
+            candidates = np.arange(len(self))
+        else:
+            candidates = self._candidates(query, max_distance // _CHUNKS)
+
+        if len(candidates) == 0:
+            return []
+
+        distances = np.bitwise_count(
+            np.bitwise_xor(self.hashes[candidates], query)).astype(np.int32)
+        keep = distances <= max_distance
+        candidates, distances = candidates[keep], distances[keep]
+
+        order = np.argsort(distances, kind='stable')[:limit]
+        return [(int(candidates[i]), int(distances[i])) for i in order]
+
+    def _candidates(self, query: np.uint64, chunk_radius: int) -> np.ndarray:
+        """按段收集候选行号"""
+        masks = _chunk_masks(chunk_radius)
+        found = []
+        for i, (values, order) in enumerate(self._tables):
+            shift = np.uint64(i * _CHUNK_BITS)
+            chunk = np.uint16((query >> shift) & np.uint64(0xFFFF))
+            targets = np.unique(np.bitwise_xor(masks, chunk))
+
+            left = np.searchsorted(values, targets, side='left')
+            right = np.searchsorted(values, targets, side='right')
+            for lo, hi in zip(left, right):
+                if hi > lo:
+                    found.append(order[lo:hi])
+
+        if not found:
+            return np.array([], dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+    def to_bytes(self) -> bytes:
+        """序列化为npz"""
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            hashes=self.hashes,
+            frame_ids=self.frame_ids,
+            video_ids=self.video_ids,
+            built_at=np.array([self.built_at])
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "MultiIndexHash":
+        """从npz反序列化"""
+        with np.load(io.BytesIO(data), allow_pickle=False) as npz:
+            return cls(
+                npz["hashes"],
+                npz["frame_ids"],
+                npz["video_ids"],
+                float(npz["built_at"][0])
+            )
+
+
+class PhashIndexService:
+    """
+    项目级感知哈希索引服务
+
+    - Worker侧: 从数据库构建索引并持久化到MinIO
+    - API侧: 按需从MinIO加载并缓存在进程内
+    """
+
+    def __init__(self):
+        self._cache: Dict[str, Tuple[str, MultiIndexHash, float]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def object_name(project_id: str) -> str:
+        return f"indexes/phash/{project_id}.npz"
+
+    def build(self, db, project_id: str) -> MultiIndexHash:
+        """
+        从数据库构建项目索引(同步会话)
+
+        Args:
+        db: 同步数据库会话
+        project_id: 项目ID
+
+        Returns:
+        MultiIndexHash
+        """
+        from app.models.task import Task, TaskVideo
+        from app.models.video import Frame
+
+        # 构建时间取查询开始前: 之后提交的帧触发的重建不会被误判为已包含
+        built_at = time.time()
+        rows = (
+            db.query(Frame.id, Frame.video_id, Frame.phash)
+            .join(TaskVideo, TaskVideo.video_id == Frame.video_id)
+            .join(Task, Task.id == TaskVideo.task_id)
+            .filter(Task.project_id == project_id, Frame.phash.isnot(None))
+            .distinct()
+            .all()
+        )
+
+        hashes = np.array([hex_to_phash(r.phash) for r in rows],
+                          dtype=np.uint64)
+        frame_ids = np.array([r.id for r in rows], dtype=np.str_)
+        video_ids = np.array([r.video_id for r in rows], dtype=np.str_)
+
+        logger.info(f"感知哈希索引构建完成: project={project_id}, size={len(rows)}")
+        return MultiIndexHash(hashes, frame_ids, video_ids, built_at=built_at)
+
+    def save(self, project_id: str, index: MultiIndexHash) -> bool:
+        """
+        持久化索引到MinIO
+
+        并发重建时按项目加锁，已保存的索引不比本次旧时跳过，避免旧快照覆盖新快照
+
+        Returns:
+        是否写入
+        """
+        from app.redis_client import get_redis
+        from app.services.minio_service import minio_service
+
+        client = get_redis()
+        lock_key = _SAVE_LOCK_KEY.format(project_id=project_id)
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + _SAVE_LOCK_MS / 1000
+        while not client.set(lock_key, token, nx=True, px=_SAVE_LOCK_MS):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"等待索引保存锁超时: project={project_id}")
+            time.sleep(0.1)
+
+        try:
+            stored = self.stored_built_at(project_id)
+            if stored is not None and stored >= index.built_at:
+                logger.info(f"已有更新的感知哈希索引，跳过保存: "
+                            f"project={project_id}")
+                return False
+
+            data = index.to_bytes()
+            minio_service.client.put_object(
+                bucket_name=settings.MINIO_BUCKET,
+                object_name=self.object_name(project_id),
+                data=io.BytesIO(data),
+                length=len(data),
+                content_type="application/octet-stream",
+                metadata={"built-at": repr(index.built_at)}
+            )
+            logger.info(
+                f"感知哈希索引已保存: project={project_id}, bytes={len(data)}")
+            return True
+
+        finally:
+            client.eval(_RELEASE_LOCK, 1, lock_key, token)
+
+    def stored_built_at(self, project_id: str) -> Optional[float]:
+        """已持久化索引的构建时间(不存在返回None)"""
+        from app.services.minio_service import minio_service
+
+        try:
+            stat = minio_service.client.stat_object(
+                settings.MINIO_BUCKET, self.object_name(project_id))
+        except S3Error as e:
+            if e.code == "NoSuchKey":
+                return None
+            raise
+
+        built_at = (stat.metadata or {}).get("x-amz-meta-built-at")
+        if not built_at:
+            return stat.last_modified.timestamp()
+        return float(built_at)
+
+    def load(self, project_id: str) -> Optional[MultiIndexHash]:
+        """
+        加载项目索引(带进程内缓存，按ETag判断是否需要重新下载)
+
+        Returns:
+        MultiIndexHash，索引不存在返回None
+        """
+        from app.services.minio_service import minio_service
+
+        now = time.time()
+        cached = self._cache.get(project_id)
+        if cached and now - cached[2] < settings.PHASH_INDEX_REFRESH_SECONDS:
+            return cached[1]
+
+        with self._lock:
+            object_name = self.object_name(project_id)
+            try:
+                stat = minio_service.client.stat_object(settings.MINIO_BUCKET,
+                                                        object_name)
+            except S3Error as e:
+                if e.code == "NoSuchKey":
+                    self._cache.pop(project_id, None)
+                    return None
+                raise
+
+            if cached and cached[0] == stat.etag:
+                self._cache[project_id] = (stat.etag, cached[1], now)
+                return cached[1]
+
+            response = minio_service.client.get_object(settings.MINIO_BUCKET,
+                                                       object_name)
+            try:
+                index = MultiIndexHash.from_bytes(response.read())
+            finally:
+                response.close()
+                response.release_conn()
+
+            self._cache[project_id] = (stat.etag, index, now)
+            logger.info(
+                f"感知哈希索引已加载: project={project_id}, size={len(index)}")
+            return index
+
+
+# 全局单例
+phash_index_service = PhashIndexService()
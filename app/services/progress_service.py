@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@FileName: progress_service
+@Author  : shwezheng
+@Time    : 2026/10/19 17:45
+@Software: PyCharm
+"""
+import json
+import time
+import logging
+import threading
+from datetime import timezone
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.models.video import Video, VideoStatus
+from app.redis_client import get_redis, get_async_redis
+from app.services.batch_progress import batch_progress_service
+
+logger = logging.getLogger(__name__)
+
+# 这些状态由调用方显式设置最终进度，落库时不使用最近一次上报的进度
+_FINAL_STATES = {
+    VideoStatus.PENDING_REVIEW,
+    VideoStatus.COMPLETED,
+    VideoStatus.FAILED,
+    VideoStatus.CANCELLED
+}
+
+
+def progress_key(video_id: str) -> str:
+    return f"video:progress:{video_id}"
+
+
+def video_channel(video_id: str) -> str:
+    return f"video:events:{video_id}"
+
+
+def batch_channel(batch_id: str) -> str:
+    return f"batch:events:{batch_id}"
+
+
+def task_channel(task_id: str) -> str:
+    return f"task:events:{task_id}"
+
+
+def _event_channels(video_id: str, batch_id: str = None,
+                    task_id: str = None) -> List[str]:
+    """视频事件需要发布到的频道"""
+    channels = [video_channel(video_id)]
+    if batch_id:
+        channels.append(batch_channel(batch_id))
+    if task_id:
+        channels.append(task_channel(task_id))
+    return channels
+
+
+def _video_state(video: Video) -> Dict[str, str]:
+    """视频状态转换为Redis哈希字段"""
+    return {
+        "status": video.status.value,
+        "progress": str(video.progress or 0),
+        "current_step": video.current_step or "",
+        "task_id": video.task_id or "",
+        "error_message": video.error_message or "",
+        "eta_at": (f"{video.estimated_completion_at.replace(tzinfo=timezone.utc).timestamp():.0f}"
+                   if video.estimated_completion_at else ""),
+        "updated_at": f"{time.time():.3f}"
+    }
+
+
+def _state_event(video_id: str, state: Dict[str, str]) -> str:
+    """状态事件JSON"""
+    return json.dumps({
+        "event": "status",
+        "video_id": video_id,
+        "status": state["status"],
+        "progress": int(state["progress"]),
+        "current_step": state["current_step"],
+        "task_id": state["task_id"],
+        "error_message": state["error_message"] or None
+    })
+
+
+class ProgressService:
+    """
+    视频处理进度服务
+
+    - 进度写入Redis哈希(带TTL)，单个视频每秒最多写入N次
+    - 只有状态转换时才落库
+    - 查询时优先读Redis，缺失或异常时回退数据库
+    - 每次写入同时发布到视频/批次/任务频道，供SSE推送
+    """
+
+    def __init__(self):
+        # video_id -> (窗口起始时间, 窗口内写入次数)
+        self._windows: Dict[str, Tuple[float, int]] = {}
+        # video_id -> (进度, 步骤)，状态转换时写回数据库
+        self._latest: Dict[str, Tuple[int, str]] = {}
+        # video_id -> (批次ID, 业务任务ID)，决定事件发布频道
+        self._bindings: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+        self._lock = threading.Lock()
+
+    def bind(self, video_id: str, batch_id: str = None, task_id: str = None):
+        """登记视频所属批次与业务任务(Worker开始处理时调用)"""
+        self._bindings[video_id] = (batch_id, task_id)
+
+    def _allow(self, video_id: str) -> bool:
+        """固定窗口限流"""
+        now = time.monotonic()
+        with self._lock:
+            start, count = self._windows.get(video_id, (now, 0))
+            if now - start >= 1.0:
+                start, count = now, 0
+            if count >= settings.PROGRESS_MAX_WRITES_PER_SECOND:
+                self._windows[video_id] = (start, count)
+                return False
+            self._windows[video_id] = (start, count + 1)
+            return True
+
+    def release(self, video_id: str):
+        """释放本进程内该视频的限流与绑定信息(阶段任务结束时调用)"""
+        self._forget(video_id)
+
+    def _forget(self, video_id: str):
+        with self._lock:
+            self._windows.pop(video_id, None)
+            self._latest.pop(video_id, None)
+            self._bindings.pop(video_id, None)
+
+    def latest(self, video_id: str) -> Optional[Tuple[int, str]]:
+        """本进程最近一次上报的进度"""
+        return self._latest.get(video_id)
+
+    def report(self, video_id: str, progress: int, step: str) -> bool:
+        """
+        上报处理进度(Worker侧)
+
+        Args:
+        video_id: 视频ID
+        progress: 进度百分比(0 - 100)
+        step: 当前步骤描述
+
+        Returns:
+        是否实际写入了Redis(被限流时返回False)
+        """
+        self._latest[video_id] = (progress, step)
+        if not self._allow(video_id):
+            return False
+
+        fields = {
+            "progress": str(progress),
+            "current_step": step,
+            "updated_at": f"{time.time():.3f}"
+        }
+        event = json.dumps({"event": "progress", "video_id": video_id,
+                            "progress": progress, "current_step": step})
+
+        key = progress_key(video_id)
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.hset(key, mapping=fields)
+        pipe.expire(key, settings.PROGRESS_TTL_SECONDS)
+        for channel in _event_channels(video_id, *self._bindings.get(
+                video_id, (None, None))):
+            pipe.publish(channel, event)
+        pipe.execute()
+        return True
+
+    def commit_state(self, db, video: Video):
+        """
+        状态转换时调用: 带上最近进度提交数据库，并同步完整状态到Redis
+
+        Args:
+        db: 同步数据库会话
+        video: 已修改状态的视频对象
+        """
+        latest = self._latest.get(video.id)
+        if latest and video.status not in _FINAL_STATES:
+            video.progress, video.current_step = latest
+        db.commit()
+
+        try:
+            self.publish_state(video)
+        except Exception as e:
+            logger.warning(f"Failed to sync progress to redis: {e}")
+
+        if video.status in _FINAL_STATES:
+            self._forget(video.id)
+
+    def publish_state(self, video: Video):
+        """将视频完整状态写入Redis、更新批次计数并发布状态事件(不受限流影响)"""
+        _, task_id = self._bindings.get(video.id, (None, None))
+        state = _video_state(video)
+        event = _state_event(video.id, state)
+
+        key = progress_key(video.id)
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.hset(key, mapping=state)
+        pipe.expire(key, settings.PROGRESS_TTL_SECONDS)
+        batch_progress_service.record(pipe, video.batch_id, video.id,
+                                      video.status)
+        for channel in _event_channels(video.id, video.batch_id, task_id):
+            pipe.publish(channel, event)
+        pipe.execute()
+
+    async def apublish_state(self, video: Video, task_id: str = None):
+        """
+        将视频完整状态写入Redis并发布状态事件(API侧)
+
+        状态已落库，失败只记录日志
+        """
+        state = _video_state(video)
+        event = _state_event(video.id, state)
+
+        key = progress_key(video.id)
+        try:
+            async with get_async_redis().pipeline(transaction=True) as pipe:
+                pipe.hset(key, mapping=state)
+                pipe.expire(key, settings.PROGRESS_TTL_SECONDS)
+                batch_progress_service.record(pipe, video.batch_id, video.id,
+                                              video.status)
+                for channel in _event_channels(video.id, video.batch_id,
+                                               task_id):
+                    pipe.publish(channel, event)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to sync progress to redis: {e}")
+
+    async def aget(self, video_id: str) -> Optional[Dict[str, str]]:
+        """
+        读取Redis中的进度(API侧)
+
+        Returns:
+        进度字段字典，不存在或缺少状态时返回None
+        """
+        data = await get_async_redis().hgetall(progress_key(video_id))
+        if not data or "status" not in data:
+            return None
+        return data
+
+    async def aget_many(self, video_ids: List[str]) -> Dict[str, Dict[str, str]]:
+        """
+        批量读取Redis中的进度(单次pipeline往返)
+
+        Returns:
+        {video_id: 进度字段}，只包含Redis中存在完整状态的视频
+        """
+        if not video_ids:
+            return {}
+        async with get_async_redis().pipeline(transaction=False) as pipe:
+            for video_id in video_ids:
+                pipe.hgetall(progress_key(video_id))
+            results = await pipe.execute()
+        return {
+            video_id: data
+            for video_id, data in zip(video_ids, results)
+            if data and "status" in data
+        }
+
+    async def aget_fields(
+            self,
+            video_ids: List[str],
+            fields: List[str]
+    ) -> Dict[str, Dict[str, Optional[str]]]:
+        """
+        批量读取指定字段(HMGET投影，单次pipeline往返)
+
+        Args:
+        video_ids: 视频ID列表
+        fields: 需要的字段
+
+        Returns:
+        {video_id: {字段: 值}}，只包含Redis中存在状态的视频
+        """
+        if not video_ids:
+            return {}
+        projection = ["status"] + [f for f in fields if f != "status"]
+        async with get_async_redis().pipeline(transaction=False) as pipe:
+            for video_id in video_ids:
+                pipe.hmget(progress_key(video_id), projection)
+            results = await pipe.execute()
+
+        found = {}
+        for video_id, values in zip(video_ids, results):
+            if values[0] is None:
+                continue
+            row = dict(zip(projection, values))
+            found[video_id] = {f: row[f] for f in fields}
+        return found
+
+
+# 全局单例
+progress_service = ProgressService()
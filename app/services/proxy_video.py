@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@FileName: proxy_video
+@Author  : shwezheng
+@Time    : 2026/10/20 02:40
+@Software: PyCharm
+"""
+import os
+import logging
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def proxy_size(width: int, height: int,
+               max_height: int = None) -> Tuple[int, int]:
+    """按最大高度等比缩小(不放大)，宽高取偶数"""
+    max_height = max_height or settings.PROXY_MAX_HEIGHT
+    if height <= max_height:
+        return width - width % 2, height - height % 2
+    scaled_width = int(round(width * max_height / height))
+    return scaled_width - scaled_width % 2, max_height
+
+
+class ProxyWriter:
+    """
+    分析代理视频写入器
+
+    使用MJPEG编码(每帧都是独立的JPEG，即全I帧)，帧号与原视频一一对应；
+    在原视频必经的顺序解码过程中顺带写入，只增加缩放与JPEG编码的开销。
+    原视频是长GOP的H.264，定位任意帧需要从前一个关键帧开始解码；
+    代理视频定位任意帧只需解码一帧
+    """
+
+    def __init__(self, path: str, fps: float, width: int, height: int):
+        self.path = path
+        self.size = proxy_size(width, height)
+        self.frames = 0
+        self._resized: Optional[np.ndarray] = None
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._writer = cv2.VideoWriter(
+            path, cv2.VideoWriter_fourcc(*"MJPG"), fps or 25, self.size)
+        if not self._writer.isOpened():
+            raise RuntimeError(f"无法创建代理视频: {path}")
+        self._writer.set(cv2.VIDEOWRITER_PROP_QUALITY,
+                         settings.PROXY_JPEG_QUALITY)
+
+    def write(self, frame: np.ndarray):
+        """写入一帧(复用缩放缓冲区)"""
+        if (frame.shape[1], frame.shape[0]) != self.size:
+            self._resized = cv2.resize(frame, self.size, dst=self._resized,
+                                       interpolation=cv2.INTER_AREA)
+            frame = self._resized
+        self._writer.write(frame)
+        self.frames += 1
+
+    def release(self):
+        """释放编码器(可重复调用)"""
+        self._writer.release()
+
+    def close(self):
+        self.release()
+        logger.info(f"代理视频已生成: {self.path}, {self.frames} 帧, "
+                    f"{self.size[0]}x{self.size[1]}, "
+                    f"{os.path.getsize(self.path) >> 20}MB")
+
+    def discard(self):
+        """生成失败时删除未完成的文件"""
+        self.release()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def open_proxy_writer(path: str, fps: float, width: int,
+                      height: int) -> Optional[ProxyWriter]:
+    """创建代理视频写入器；未启用或创建失败时返回None(不影响正常处理)"""
+    if not settings.PROXY_ENABLED or not width or not height:
+        return None
+    try:
+        return ProxyWriter(path, fps, width, height)
+    except Exception as e:
+        logger.warning(f"Proxy writer unavailable: {e}")
+        return None
+
+
+def local_proxy(video_id: str, proxy_object: str) -> str:
+    """代理视频的本地路径(经由节点本地缓存)"""
+    from app.services.source_cache import source_cache
+
+    return source_cache.get(f"{video_id}.proxy", proxy_object)
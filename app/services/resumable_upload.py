@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@FileName: resumable_upload
+@Author  : shwezheng
+@Time    : 2026/10/20 01:10
+@Software: PyCharm
+"""
+import json
+import uuid
+import logging
+from typing import AsyncIterator, Dict, Optional
+
+from starlette.requests import ClientDisconnect
+
+from app.config import settings
+from app.redis_client import get_async_redis
+from app.services.async_storage import async_minio
+from app.services.minio_service import MinIOService
+
+logger = logging.getLogger(__name__)
+
+_STATE_KEY = "upload:resumable:{upload_id}"
+_LOCK_KEY = "upload:resumable:{upload_id}:lock"
+_MIN_PART_SIZE = 5 * 1024 * 1024  # S3分片下限(最后一个分片除外)
+
+_REFRESH_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# 状态迁移: uploading -> completing -> completed -> registering -> (删除)
+#           uploading/completed -> aborting -> (删除)
+_TRANSITION = """
+if redis.call('HGET', KEYS[1], 'status') == ARGV[1] then
+    redis.call('HSET', KEYS[1], 'status', ARGV[2])
+    return 1
+end
+return 0
+"""
+
+
+class UploadConflict(Exception):
+    """偏移量不一致或上传正被其他请求写入"""
+
+    def __init__(self, message: str, offset: int):
+        super().__init__(message)
+        self.offset = offset
+
+
+class ResumableUploadService:
+    """
+    断点续传(tus风格)
+
+    - 每个上传对应一个S3分片上传，PATCH的数据按 RESUMABLE_PART_SIZE 切成分片直接写入MinIO，
+      合并时服务端只登记分片列表，不复制数据
+    - 上传状态(偏移量、已提交分片)保存在Redis；偏移量只计入已提交的分片，
+      连接中断时未凑满最小分片的尾部数据被丢弃，客户端查询偏移量后从该处续传
+    - Redis状态过期后遗留的分片由MinIO的过期分片清理回收
+    """
+
+    @staticmethod
+    def _key(upload_id: str) -> str:
+        return _STATE_KEY.format(upload_id=upload_id)
+
+    async def _transition(self, upload_id: str, from_status: str,
+                          to_status: str) -> bool:
+        return bool(await get_async_redis().eval(
+            _TRANSITION, 1, self._key(upload_id), from_status, to_status))
+
+    async def create(self, filename: str, length: int,
+                     task_id: str = None) -> Dict:
+        """
+        创建上传
+
+        Args:
+        filename: 原始文件名
+        length: 文件总字节数
+        task_id: 关联的任务ID
+
+        Returns:
+        上传状态
+        """
+        upload_id = str(uuid.uuid4())
+        video_id = str(uuid.uuid4())
+        object_name = MinIOService.original_object_name(video_id, filename)
+        s3_upload_id = await async_minio.create_multipart_upload(object_name)
+
+        state = {
+            "upload_id": upload_id,
+            "video_id": video_id,
+            "filename": filename,
+            "object_name": object_name,
+            "s3_upload_id": s3_upload_id,
+            "task_id": task_id or "",
+            "length": length,
+            "offset": 0,
+            "parts": "[]",
+            "status": "uploading"
+        }
+        client = get_async_redis()
+        await client.hset(self._key(upload_id), mapping=state)
+        await client.expire(self._key(upload_id),
+                            settings.RESUMABLE_UPLOAD_TTL_SECONDS)
+        logger.info(f"Resumable upload created: {upload_id} -> {object_name}")
+        return self._decode(state)
+
+    async def get(self, upload_id: str) -> Optional[Dict]:
+        """查询上传状态(不存在或已过期时返回None)"""
+        state = await get_async_redis().hgetall(self._key(upload_id))
+        # 只有部分字段的状态(删除后被迟到的分片提交重建)视为不存在
+        return self._decode(state) if state and "length" in state else None
+
+    async def _acquire(self, upload_id: str, offset: int) -> str:
+        """获取写入锁，返回锁令牌(已被其他请求持有时抛出UploadConflict)"""
+        token = str(uuid.uuid4())
+        if not await get_async_redis().set(
+                _LOCK_KEY.format(upload_id=upload_id), token, nx=True,
+                px=settings.RESUMABLE_LOCK_MS):
+            raise UploadConflict("上传正在被其他请求写入", offset)
+        return token
+
+    async def _refresh(self, upload_id: str, token: str, offset: int):
+        """续期写入锁(锁已过期被其他请求取得时抛出UploadConflict)"""
+        if not await get_async_redis().eval(
+                _REFRESH_LOCK, 1, _LOCK_KEY.format(upload_id=upload_id),
+                token, settings.RESUMABLE_LOCK_MS):
+            raise UploadConflict("写入锁已过期，请查询偏移量后续传", offset)
+
+    async def _release(self, upload_id: str, token: str):
+        await get_async_redis().eval(
+            _RELEASE_LOCK, 1, _LOCK_KEY.format(upload_id=upload_id), token)
+
+    @staticmethod
+    def _decode(state: Dict) -> Dict:
+        state = dict(state)
+        state["length"] = int(state["length"])
+        state["offset"] = int(state["offset"])
+        state["parts"] = json.loads(state["parts"])
+        state["task_id"] = state["task_id"] or None
+        return state
+
+    async def _commit_part(self, state: Dict, data: bytes, token: str):
+        """
+        上传一个分片并立即持久化状态(进程中断时已提交的分片不丢失)
+
+        提交前续期写入锁: 慢速连接上一次PATCH可能超过锁的有效期，
+        锁已失效时不再提交，避免与重试的请求提交同一个分片号
+        """
+        await self._refresh(state["upload_id"], token, state["offset"])
+        part_number = len(state["parts"]) + 1
+        etag = await async_minio.upload_part(
+            state["object_name"], state["s3_upload_id"], part_number, data)
+        state["parts"].append([part_number, etag, len(data)])
+        state["offset"] += len(data)
+
+        client = get_async_redis()
+        await client.hset(self._key(state["upload_id"]), mapping={
+            "offset": state["offset"],
+            "parts": json.dumps(state["parts"])
+        })
+        await client.expire(self._key(state["upload_id"]),
+                            settings.RESUMABLE_UPLOAD_TTL_SECONDS)
+
+    async def write(self, upload_id: str, offset: int,
+                    chunks: AsyncIterator[bytes]) -> Dict:
+        """
+        从指定偏移量写入数据
+
+        Args:
+        upload_id: 上传ID
+        offset: 客户端认为的当前偏移量(必须与服务端一致)
+        chunks: 请求体数据块
+
+        Returns:
+        更新后的上传状态
+        """
+        state = await self.get(upload_id)
+        if state is None:
+            raise KeyError(upload_id)
+        if state["status"] != "uploading":
+            raise UploadConflict("上传已完成", state["offset"])
+        if offset != state["offset"]:
+            raise UploadConflict(
+                f"偏移量不一致: 服务端为 {state['offset']}", state["offset"])
+
+        token = await self._acquire(upload_id, state["offset"])
+        try:
+            # 持锁后重新读取，防止与刚结束的请求或取消交错
+            state = await self.get(upload_id)
+            if state is None:
+                raise KeyError(upload_id)
+            if state["status"] != "uploading":
+                raise UploadConflict("上传已完成或已取消", state["offset"])
+            if offset != state["offset"]:
+                raise UploadConflict(
+                    f"偏移量不一致: 服务端为 {state['offset']}",
+                    state["offset"])
+
+            buffer = bytearray()
+            received = offset
+            try:
+                async for chunk in chunks:
+                    received += len(chunk)
+                    if received > state["length"]:
+                        raise ValueError("数据超出声明的文件长度")
+                    buffer += chunk
+                    while len(buffer) >= settings.RESUMABLE_PART_SIZE:
+                        data = bytes(buffer[:settings.RESUMABLE_PART_SIZE])
+                        del buffer[:settings.RESUMABLE_PART_SIZE]
+                        await self._commit_part(state, data, token)
+            except ClientDisconnect:
+                logger.info(f"Resumable upload interrupted: {upload_id} "
+                            f"at {received}/{state['length']}")
+
+            # 尾部数据满足最小分片或已到文件末尾时提交，否则丢弃由客户端重传
+            if buffer and (len(buffer) >= _MIN_PART_SIZE or
+                           state["offset"] + len(buffer) == state["length"]):
+                await self._commit_part(state, bytes(buffer), token)
+            return state
+
+        finally:
+            await self._release(upload_id, token)
+
+    async def complete(self, upload_id: str) -> Dict:
+        """
+        合并分片生成原始视频对象，并占有登记权
+
+        合并后登记失败(调用 reopen)时可再次调用，跳过合并直接重新登记
+
+        Returns:
+        上传状态(status=registering)
+        """
+        state = await self.get(upload_id)
+        if state is None:
+            raise KeyError(upload_id)
+
+        if state["status"] == "uploading":
+            if state["offset"] != state["length"]:
+                raise UploadConflict(
+                    f"上传未完成: {state['offset']}/{state['length']}",
+                    state["offset"])
+
+            # 只允许一个请求执行合并
+            if await self._transition(upload_id, "uploading", "completing"):
+                try:
+                    await async_minio.complete_multipart_upload(
+                        state["object_name"], state["s3_upload_id"],
+                        [(number, etag)
+                         for number, etag, _ in state["parts"]])
+                except Exception:
+                    await self._transition(upload_id, "completing",
+                                           "uploading")
+                    raise
+                await self._transition(upload_id, "completing", "completed")
+
+        if not await self._transition(upload_id, "completed", "registering"):
+            raise UploadConflict("上传正在合并或登记", state["offset"])
+        state["status"] = "registering"
+        return state
+
+    async def reopen(self, upload_id: str):
+        """登记失败(非视频本身的问题)时释放登记权，允许重试"""
+        await self._transition(upload_id, "registering", "completed")
+
+    async def abort(self, upload_id: str) -> bool:
+        """
+        放弃上传并删除已上传的分片(已合并未登记时删除对象)
+
+        持有写入锁执行，正在写入、合并或登记时抛出UploadConflict
+        """
+        state = await self.get(upload_id)
+        if state is None:
+            return False
+        token = await self._acquire(upload_id, state["offset"])
+        try:
+            if await self._transition(upload_id, "uploading", "aborting"):
+                await async_minio.abort_multipart_upload(
+                    state["object_name"], state["s3_upload_id"])
+            elif await self._transition(upload_id, "completed", "aborting"):
+                await async_minio.delete_object(state["object_name"])
+            else:
+                raise UploadConflict("上传正在合并或登记，无法取消",
+                                     state["offset"])
+            await get_async_redis().delete(self._key(upload_id))
+        finally:
+            await self._release(upload_id, token)
+        logger.info(f"Resumable upload aborted: {upload_id}")
+        return True
+
+    async def forget(self, upload_id: str):
+        """视频登记完成后删除上传状态"""
+        await get_async_redis().delete(self._key(upload_id))
+
+
+# 全局单例
+resumable_upload_service = ResumableUploadService()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@FileName: scene_metrics
+@Author  : shwezheng
+@Time    : 2026/10/19 10:12
+@Software: PyCharm
+"""
+import time
+import logging
+from typing import Dict, List, Optional, Tuple, Type
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 指标计算使用的缩略图宽度与直方图分箱数
+SCENE_THUMB_WIDTH = 64
+SCENE_HIST_BINS = 64
+
+# 场景变化指标注册表
+_SCENE_METRICS: Dict[str, Type["SceneMetric"]] = {}
+
+
+def register_scene_metric(cls: Type["SceneMetric"]) -> Type["SceneMetric"]:
+    """
+    注册场景变化指标(类装饰器)
+
+    用法:
+    @register_scene_metric
+    class MyMetric(SceneMetric):
+        name = "my_metric"
+    """
+    if not cls.name:
+        raise ValueError(f"场景指标缺少名称: {cls.__name__}")
+    _SCENE_METRICS[cls.name] = cls
+    return cls
+
+
+def available_scene_metrics() -> Dict[str, str]:
+    """获取所有已注册的场景变化指标 {名称: 描述}"""
+    return {name: cls.description for name, cls in _SCENE_METRICS.items()}
+
+
+class SceneFrame:
+    """
+    单帧共享的预处理结果
+
+    灰度转换与缩放每帧只做一次，直方图按需计算并缓存，
+    作为下一帧的"前一帧"继续复用
+    """
+
+    __slots__ = ("small", "brightness", "_hist")
+
+    def __init__(self, gray: np.ndarray, brightness: Optional[float] = None):
+        h, w = gray.shape[:2]
+        thumb_h = max(1, int(h * SCENE_THUMB_WIDTH / max(w, 1)))
+        self.small = cv2.resize(gray, (SCENE_THUMB_WIDTH, thumb_h),
+                                interpolation=cv2.INTER_AREA)
+        self.brightness = (float(brightness) if brightness is not None
+                           else float(np.mean(self.small)))
+        self._hist = None
+
+    @property
+    def hist(self) -> np.ndarray:
+        """归一化灰度直方图(L1)"""
+        if self._hist is None:
+            hist = cv2.calcHist([self.small], [0], None, [SCENE_HIST_BINS],
+                                [0, 256])
+            cv2.normalize(hist, hist, alpha=1, norm_type=cv2.NORM_L1)
+            self._hist = hist
+        return self._hist
+
+
+class SceneMetric:
+    """场景变化指标基类，compute返回0-1之间的分数(越大变化越明显)"""
+
+    name: str = ""
+    description: str = ""
+    weight: float = 1.0
+
+    def compute(self, prev: SceneFrame, curr: SceneFrame) -> float:
+        raise NotImplementedError
+
+
+@register_scene_metric
+class BrightnessMetric(SceneMetric):
+    """亮度差异(与原有实现一致)"""
+
+    name = "brightness"
+    description = "平均亮度差异"
+
+    def compute(self, prev: SceneFrame, curr: SceneFrame) -> float:
+        return min(abs(curr.brightness - prev.brightness) / 50.0, 1.0)
+
+
+@register_scene_metric
+class HistCorrelMetric(SceneMetric):
+    """灰度直方图相关性"""
+
+    name = "hist_correl"
+    description = "灰度直方图相关性(1 - correl)"
+
+    def compute(self, prev: SceneFrame, curr: SceneFrame) -> float:
+        correl = cv2.compareHist(prev.hist, curr.hist, cv2.HISTCMP_CORREL)
+        return float(np.clip(1.0 - correl, 0.0, 1.0))
+
+
+@register_scene_metric
+class AbsDiffMetric(SceneMetric):
+    """像素绝对差"""
+
+    name = "absdiff"
+    description = "缩略灰度图像素平均绝对差"
+
+    def compute(self, prev: SceneFrame, curr: SceneFrame) -> float:
+        if prev.small.shape != curr.small.shape:
+            return 1.0
+        mean_diff = float(np.mean(cv2.absdiff(prev.small, curr.small)))
+        return min(mean_diff / 50.0, 1.0)
+
+
+@register_scene_metric
+class ChiSquareMetric(SceneMetric):
+    """灰度直方图卡方距离"""
+
+    name = "chi_square"
+    description = "灰度直方图卡方距离(对称形式)"
+
+    def compute(self, prev: SceneFrame, curr: SceneFrame) -> float:
+        # L1归一化后对称卡方距离上限为4，实际场景切换通常在2以内
+        chi = cv2.compareHist(prev.hist, curr.hist, cv2.HISTCMP_CHISQR_ALT)
+        return float(min(chi / 2.0, 1.0))
+
+
+def parse_scene_metrics(value: Optional[str]) -> List[str]:
+    """解析逗号分隔的指标配置"""
+    if not value:
+        return []
+    return [m.strip() for m in value.split(",") if m.strip()]
+
+
+class SceneChangeDetector:
+    """
+    场景变化检测器 - 单次遍历增量计算
+
+    每帧只做一次灰度缩放，前一帧的预处理结果(含直方图)被缓存，
+    所有启用的指标共享同一份数据
+    """
+
+    def __init__(self, metric_names: Optional[List[str]] = None):
+        """
+        初始化
+
+        Args:
+        metric_names: 启用的指标名称列表，为空时使用配置默认值
+        """
+        if not metric_names:
+            from app.config import settings
+            metric_names = parse_scene_metrics(settings.DEFAULT_SCENE_METRICS)
+
+        unknown = [m for m in metric_names if m not in _SCENE_METRICS]
+        if unknown:
+            raise ValueError(f"未知的场景变化指标: {', '.join(unknown)}")
+
+        self.metrics: List[SceneMetric] = [_SCENE_METRICS[m]() for m in
+                                           metric_names]
+        self._total_weight = sum(m.weight for m in self.metrics) or 1.0
+        self.reset()
+
+    def reset(self):
+        """重置状态(处理新视频前调用)"""
+        self._prev: Optional[SceneFrame] = None
+        self._calls = 0
+        self._prepare_seconds = 0.0
+        self._metric_seconds = {m.name: 0.0 for m in self.metrics}
+
+    @property
+    def metric_names(self) -> List[str]:
+        return [m.name for m in self.metrics]
+
+    @property
+    def current_frame(self) -> Optional[SceneFrame]:
+        """最近一次update的预处理结果(供指纹等特征复用)"""
+        return self._prev
+
+    def update(
+            self,
+            gray: np.ndarray,
+            brightness: Optional[float] = None
+    ) -> Tuple[float, Dict[str, float]]:
+        """
+        输入当前帧灰度图，返回与前一帧的场景变化分数
+
+        Args:
+        gray: 当前帧灰度图
+        brightness: 已计算好的平均亮度(可选，避免重复计算)
+
+        Returns:
+        (综合分数, {指标名: 分数})，第一帧分数为0
+        """
+        start = time.perf_counter()
+        curr = SceneFrame(gray, brightness)
+        self._prepare_seconds += time.perf_counter() - start
+        self._calls += 1
+
+        prev = self._prev
+        self._prev = curr
+
+        if prev is None:
+            return 0.0, {m.name: 0.0 for m in self.metrics}
+
+        scores = {}
+        combined = 0.0
+        for metric in self.metrics:
+            start = time.perf_counter()
+            score = metric.compute(prev, curr)
+            self._metric_seconds[metric.name] += time.perf_counter() - start
+            scores[metric.name] = score
+            combined += score * metric.weight
+
+        return combined / self._total_weight, scores
+
+    def cost_report(self) -> Dict[str, Dict[str, float]]:
+        """
+        各指标耗时统计
+
+        Returns:
+        {名称: {"total_ms": 总耗时, "avg_us": 单帧平均耗时}}，
+        其中"prepare"为共享的灰度缩放开销(直方图计入首个使用它的指标)
+        """
+        calls = max(self._calls, 1)
+        report = {
+            "prepare": {
+                "total_ms": round(self._prepare_seconds * 1000, 3),
+                "avg_us": round(self._prepare_seconds * 1e6 / calls, 3)
+            }
+        }
+        for name, seconds in self._metric_seconds.items():
+            report[name] = {
+                "total_ms": round(seconds * 1000, 3),
+                "avg_us": round(seconds * 1e6 / calls, 3)
+            }
+        return report
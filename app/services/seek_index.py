@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@FileName: seek_index
+@Author  : shwezheng
+@Time    : 2026/10/20 03:10
+@Software: PyCharm
+"""
+import logging
+from functools import lru_cache
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_MAX_SEEK_ATTEMPTS = 3
+
+
+class SeekIndex:
+    """
+    视频定位索引(提取阶段顺序解码时一次性构建)
+
+    - pts_ms: 每帧的显示时间戳(毫秒)，按显示顺序排列，下标即帧号
+    - keyframes: 关键帧帧号(升序)
+
+    CAP_PROP_POS_FRAMES 按平均帧率把帧号换算成时间戳，
+    对手机录制的可变帧率视频会定位到错误的帧；
+    按索引定位到前一个关键帧后逐帧解码并计数，结果与顺序解码一致
+    """
+
+    def __init__(self, pts_ms: np.ndarray, keyframes: np.ndarray):
+        self.pts_ms = pts_ms
+        self.keyframes = keyframes
+
+    @property
+    def frame_count(self) -> int:
+        return len(self.pts_ms)
+
+    def timestamp(self, frame_number: int) -> float:
+        return float(self.pts_ms[frame_number])
+
+    def frame_at(self, timestamp_ms: float) -> int:
+        """时间戳最接近的帧号"""
+        idx = int(np.searchsorted(self.pts_ms, timestamp_ms))
+        if idx >= self.frame_count:
+            return self.frame_count - 1
+        if idx > 0 and (timestamp_ms - self.pts_ms[idx - 1] <
+                        self.pts_ms[idx] - timestamp_ms):
+            return idx - 1
+        return idx
+
+    def keyframe_before(self, frame_number: int) -> int:
+        """不晚于指定帧的最近关键帧(未知关键帧时返回帧本身)"""
+        if not len(self.keyframes):
+            return frame_number
+        idx = int(np.searchsorted(self.keyframes, frame_number,
+                                  side="right")) - 1
+        return int(self.keyframes[max(idx, 0)])
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            np.savez(f, pts_ms=self.pts_ms, keyframes=self.keyframes)
+
+    @classmethod
+    def load(cls, path: str) -> "SeekIndex":
+        with np.load(path) as data:
+            return cls(data["pts_ms"], data["keyframes"])
+
+
+def scan_keyframes(video_path: str) -> np.ndarray:
+    """
+    扫描关键帧位置
+
+    以原始数据包模式打开视频，只解复用不解码，开销远小于解码。
+    数据包按解码顺序排列；封闭GOP的关键帧之前的数据包恰好是
+    它之前显示的帧，数据包序号即关键帧的帧号
+
+    Returns:
+    关键帧帧号数组
+    """
+    cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG,
+                           [cv2.CAP_PROP_FORMAT, -1])
+    try:
+        if not cap.isOpened():
+            raise ValueError(f"无法以数据包模式打开视频: {video_path}")
+
+        keyframes = []
+        packet = 0
+        while cap.grab():
+            if cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                keyframes.append(packet)
+            packet += 1
+        return np.array(keyframes, dtype=np.int64)
+
+    finally:
+        cap.release()
+
+
+def build_seek_index(video_path: str, timestamps: List[float]) -> SeekIndex:
+    """
+    构建定位索引
+
+    Args:
+    video_path: 视频路径
+    timestamps: 顺序解码时记录的每帧显示时间戳(毫秒)
+
+    Returns:
+    SeekIndex
+    """
+    pts_ms = np.asarray(timestamps, dtype=np.float64)
+    try:
+        keyframes = scan_keyframes(video_path)
+        keyframes = keyframes[keyframes < len(pts_ms)]
+    except Exception as e:
+        # 无关键帧信息时直接按时间戳定位，仍可按索引校正落点
+        logger.warning(f"Keyframe scan failed: {video_path}, {e}")
+        keyframes = np.array([], dtype=np.int64)
+
+    logger.info(f"Seek index built: {len(pts_ms)} frames, "
+                f"{len(keyframes)} keyframes")
+    return SeekIndex(pts_ms, keyframes)
+
+
+def seek_frame(cap: cv2.VideoCapture, frame_number: int,
+               index: Optional[SeekIndex] = None) -> Optional[np.ndarray]:
+    """
+    定位并解码指定帧
+
+    有索引时定位到前一个关键帧的时间戳，按落点的时间戳在索引中确定实际帧号，
+    再逐帧向后解码到目标帧；落点越过目标时退到更早的关键帧重试
+
+    Args:
+    cap: 已打开的视频
+    frame_number: 帧号
+    index: 定位索引(为None时使用 CAP_PROP_POS_FRAMES)
+
+    Returns:
+    帧图像，读取失败时返回None
+    """
+    if index is None or not index.frame_count:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+        ret, frame = cap.read()
+        return frame if ret else None
+
+    frame_number = min(max(frame_number, 0), index.frame_count - 1)
+    target = index.keyframe_before(frame_number)
+    current = None
+    for _ in range(_MAX_SEEK_ATTEMPTS):
+        cap.set(cv2.CAP_PROP_POS_MSEC, index.timestamp(target))
+        if not cap.grab():
+            return None
+        current = index.frame_at(cap.get(cv2.CAP_PROP_POS_MSEC))
+        if current <= frame_number or target == 0:
+            break
+        target = index.keyframe_before(target - 1)
+
+    if current is None or current > frame_number:
+        # 仍越过目标: 从头解码
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        if not cap.grab():
+            return None
+        current = 0
+
+    while current < frame_number:
+        if not cap.grab():
+            return None
+        current += 1
+
+    ret, frame = cap.retrieve()
+    return frame if ret else None
+
+
+@lru_cache(maxsize=32)
+def load_seek_index(video_id: str, object_name: str) -> SeekIndex:
+    """加载定位索引(经由节点本地缓存，解析结果按进程缓存)"""
+    from app.services.source_cache import source_cache
+
+    return SeekIndex.load(source_cache.get(f"{video_id}.index", object_name))
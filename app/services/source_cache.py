@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@FileName: source_cache
+@Author  : shwezheng
+@Time    : 2026/10/20 02:10
+@Software: PyCharm
+"""
+import os
+import time
+import fcntl
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_LOCK_DIR = ".locks"
+_PARTIAL_SUFFIXES = (".part.minio", ".part")  # 下载或写入中的临时文件
+
+
+class SourceCache:
+    """
+    Worker节点本地的源视频缓存
+
+    - 源视频统一保存在MinIO，各阶段按需下载到本地缓存目录，不再依赖与Web共享的卷
+    - 同一节点上的多个Worker进程通过文件锁避免重复下载
+    - 总大小超过 SOURCE_CACHE_MAX_BYTES 时按最近使用时间(mtime)淘汰；
+      已被打开的文件删除后读取方仍可继续读完
+    - 任务失败不删除源文件，重试与重新处理直接命中缓存
+    """
+
+    def __init__(self, root: str = None, max_bytes: int = None):
+        self.root = root or settings.SOURCE_CACHE_DIR
+        self.max_bytes = max_bytes or settings.SOURCE_CACHE_MAX_BYTES
+        self.used_bytes: Optional[int] = None  # 最近一次淘汰扫描后的总大小
+
+    def path_for(self, video_id: str, object_name: str) -> str:
+        return os.path.join(self.root,
+                            f"{video_id}{Path(object_name).suffix.lower()}")
+
+    @contextmanager
+    def _lock(self, name: str, blocking: bool = True):
+        """节点内跨进程文件锁，非阻塞获取失败时返回False"""
+        lock_dir = os.path.join(self.root, _LOCK_DIR)
+        os.makedirs(lock_dir, exist_ok=True)
+        with open(os.path.join(lock_dir, f"{name}.lock"), "w") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX |
+                            (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def get(self, video_id: str, object_name: str) -> str:
+        """
+        获取源视频的本地路径(未缓存时从MinIO下载)
+
+        Args:
+        video_id: 视频ID
+        object_name: 原始视频在MinIO中的对象名
+
+        Returns:
+        本地文件路径
+        """
+        path = self.path_for(video_id, object_name)
+        if self._touch(path):
+            return path
+
+        with self._lock(video_id):
+            # 其他进程可能已在等待期间下载完成
+            if self._touch(path):
+                return path
+
+            from app.services.minio_service import minio_service
+
+            start = time.perf_counter()
+            minio_service.download_object(object_name, path)
+            logger.info(f"Source cached: {video_id}, "
+                        f"{os.path.getsize(path) >> 20}MB in "
+                        f"{time.perf_counter() - start:.1f}s")
+
+        self.evict(keep=path)
+        return path
+
+    @staticmethod
+    def _touch(path: str) -> bool:
+        """命中时刷新最近使用时间"""
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def evict(self, keep: str = None) -> int:
+        """
+        按LRU淘汰缓存文件直到总大小不超过上限
+
+        Args:
+        keep: 不淘汰的文件(刚下载的源视频)
+
+        Returns:
+        淘汰的文件数
+        """
+        with self._lock("evict", blocking=False) as acquired:
+            if not acquired:
+                # 其他进程正在淘汰
+                return 0
+
+            entries = []
+            total = 0
+            for entry in os.scandir(self.root):
+                if not entry.is_file() or entry.name.endswith(_PARTIAL_SUFFIXES):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+            evicted = 0
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                    evicted += 1
+                except FileNotFoundError:
+                    pass
+            self.used_bytes = total
+
+            # 下载锁文件为空文件，定期清理长时间未使用的
+            stale_before = time.time() - 86400
+            for entry in os.scandir(os.path.join(self.root, _LOCK_DIR)):
+                if entry.name != "evict.lock" and \
+                        entry.stat().st_mtime < stale_before:
+                    try:
+                        os.remove(entry.path)
+                    except FileNotFoundError:
+                        pass
+
+        if evicted:
+            logger.info(f"Source cache evicted {evicted} files, "
+                        f"{total >> 20}MB in use")
+        return evicted
+
+
+# 全局单例
+source_cache = SourceCache()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@FileName: upload_stream
+@Author  : shwezheng
+@Time    : 2026/10/20 00:40
+@Software: PyCharm
+"""
+import os
+import hashlib
+import logging
+from typing import AsyncIterator, Tuple
+
+import aiofiles
+from fastapi import UploadFile
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class UploadTooLarge(Exception):
+    """上传内容超过大小限制"""
+
+    def __init__(self, size: int, limit: int):
+        super().__init__(f"文件过大: 超过 {limit / 1024 / 1024:.0f}MB")
+        self.size = size
+        self.limit = limit
+
+
+async def iter_upload_file(file: UploadFile,
+                           chunk_size: int = None) -> AsyncIterator[bytes]:
+    """按块读取multipart上传的文件"""
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def save_stream(chunks: AsyncIterator[bytes], path: str,
+                      max_size: int = None) -> Tuple[int, str]:
+    """
+    将上传流逐块写入磁盘，同时计数与计算SHA-256
+
+    内存占用与文件大小无关(只持有当前块)；超过限制时立即停止读取，
+    删除已写入的部分文件并抛出UploadTooLarge。
+    先写入 .part 临时文件，完整写入后再重命名，避免留下半个视频
+
+    Args:
+    chunks: 数据块异步迭代器
+    path: 目标文件路径
+    max_size: 大小上限(字节)，默认 MAX_VIDEO_SIZE
+
+    Returns:
+    (文件大小, SHA-256十六进制摘要)
+    """
+    max_size = max_size or settings.MAX_VIDEO_SIZE
+    part_path = f"{path}.part"
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        async with aiofiles.open(part_path, 'wb') as f:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLarge(size, max_size)
+                digest.update(chunk)
+                await f.write(chunk)
+        os.replace(part_path, path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+
+    return size, digest.hexdigest()
@@ -8,9 +8,11 @@
 """
 import cv2
 import logging
-from typing import Tuple, Dict
+from typing import Tuple, Dict, Optional
 from pathlib import Path
 
+from app.services.seek_index import SeekIndex, seek_frame
+
 logger = logging.getLogger(__name__)
 
 
@@ -160,6 +162,56 @@ class VideoProcessor:
         finally:
             cap.release()
 
+    @staticmethod
+    def read_frame(video_path: str, frame_number: int,
+                   width: Optional[int] = None, fmt: str = "jpeg",
+                   quality: int = 90,
+                   index: Optional[SeekIndex] = None) -> bytes:
+        """
+        随机读取指定帧并编码为图片
+
+        对全I帧的代理视频只需解码一帧；对长GOP的原视频
+        需要从前一个关键帧开始解码，开销随GOP长度增长，
+        传入定位索引时按索引定位，可变帧率视频也能读到准确的帧
+
+        Args:
+        video_path: 视频文件路径(优先使用代理视频)
+        frame_number: 帧号
+        width: 输出宽度(等比缩小，不放大)
+        fmt: 图片格式 jpeg/png/webp
+        quality: JPEG/WebP质量
+        index: 原视频的定位索引(代理视频为恒定帧率，无需索引)
+
+
+        Returns:
+        bytes: 图片数据
+        """
+        cap = cv2.VideoCapture(video_path)
+
+        try:
+            frame = seek_frame(cap, frame_number, index)
+
+            if frame is None:
+                raise ValueError(f"无法读取帧: {frame_number}")
+
+            if width and width < frame.shape[1]:
+                height = max(round(frame.shape[0] * width / frame.shape[1]), 1)
+                frame = cv2.resize(frame, (width, height),
+                                   interpolation=cv2.INTER_AREA)
+
+            params = {
+                "jpeg": [cv2.IMWRITE_JPEG_QUALITY, quality],
+                "webp": [cv2.IMWRITE_WEBP_QUALITY, quality]
+            }.get(fmt, [])
+            success, buffer = cv2.imencode(f'.{fmt}', frame, params)
+            if not success:
+                raise ValueError("帧编码失败")
+
+            return buffer.tobytes()
+
+        finally:
+            cap.release()
+
     @staticmethod
     def validate_video(video_path: str) -> bool:
         """
@@ -8,5 +8,6 @@
 """
 from app.tasks.celery_app import celery_app
 from app.tasks.video_tasks import process_video_frames
+from app.tasks.pipeline_tasks import start_video_pipeline
 
-__all__ = ["celery_app", "process_video_frames"]
\ No newline at end of file
+__all__ = ["celery_app", "process_video_frames", "start_video_pipeline"]
\ No newline at end of file
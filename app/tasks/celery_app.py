@@ -6,6 +6,8 @@
 @Time    : 2025/11/29 21:49
 @Software: PyCharm
 """
+from importlib import import_module
+
 from celery import Celery
 from app.config import settings
 
@@ -36,15 +38,45 @@ celery_app.conf.update(
     worker_prefetch_multiplier=1,  # 每次只取一个任务
     worker_max_tasks_per_child=50,  # 每个worker处理50个任务后重启
     worker_concurrency=settings.CELERY_WORKER_CONCURRENCY,
+    worker_proc_alive_timeout=30,  # 子进程初始化(含预热)的最长等待时间
 
     # 结果后端
     result_expires=3600,  # 结果保留1小时
 
     # 任务路由
+    # video_cpu: 解码/特征/分析，prefork按核数并发；
+    #   上传时按成本估算投递到 video_cpu_small/medium/large
+    # video_io: 探测/上传/落库，threads或gevent高并发
     task_routes={
+        'app.tasks.pipeline_tasks.extract_video_features': {
+            'queue': 'video_cpu'},
+        'app.tasks.pipeline_tasks.analyze_video_frames': {
+            'queue': 'video_cpu'},
+        'app.tasks.pipeline_tasks.*': {'queue': 'video_io'},
+        'app.tasks.video_tasks.flush_batch_counters': {'queue': 'video_io'},
+        'app.tasks.video_tasks.rebuild_phash_index': {'queue': 'video_io'},
+        'app.tasks.video_tasks.cleanup_video_objects': {'queue': 'video_io'},
         'app.tasks.video_tasks.*': {'queue': 'video_processing'}
+    },
+
+    # 定时任务
+    beat_schedule={
+        'flush-batch-counters': {
+            'task': 'app.tasks.video_tasks.flush_batch_counters',
+            'schedule': settings.BATCH_FLUSH_INTERVAL_SECONDS,
+            'options': {'expires': settings.BATCH_FLUSH_INTERVAL_SECONDS}
+        },
+        # 兜底调度: 视频结束时会即时触发，定时任务处理遗漏与超时占用
+        'dispatch-fair-share': {
+            'task': 'app.tasks.pipeline_tasks.dispatch_fair_share',
+            'schedule': settings.FAIR_SHARE_DISPATCH_INTERVAL,
+            'options': {'expires': settings.FAIR_SHARE_DISPATCH_INTERVAL}
+        }
     }
 )
 
 # 自动发现任务
-celery_app.autodiscover_tasks(['app.tasks'])
\ No newline at end of file
+celery_app.autodiscover_tasks(['app.tasks'])
+
+# Worker进程预热: 导入模块以注册worker_init / worker_process_init信号
+import_module("app.tasks.worker_warmup")
\ No newline at end of file
@@ -0,0 +1,903 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@FileName: pipeline_tasks
+@Author  : shwezheng
+@Time    : 2026/10/19 20:10
+@Software: PyCharm
+"""
+import os
+import time
+import uuid
+import logging
+from typing import Dict, List, Optional
+
+from celery import chain
+from celery.exceptions import Ignore
+from sqlalchemy import insert, update, delete
+
+from app.config import settings
+from app.database import SyncSessionLocal
+from app.models.project import Project
+from app.models.video import (Video, Frame, FrameAnnotation, VideoStatus,
+                              MarkingMethod)
+from app.services.frame_analyzer import FrameAnalyzer
+from app.services.frame_extractor import FrameExtractor
+from app.services.frame_spool import FrameSpool
+from app.services.memory_admission import (memory_admission,
+                                           estimate_task_bytes)
+from app.services.cancellation import (CancellationToken, TaskCancelled,
+                                      clear_cancel)
+from app.services.cost_scheduler import cost_scheduler, cpu_queue
+from app.services.fair_scheduler import fair_scheduler, DEFAULT_PROJECT
+from app.services.fingerprint import phash_to_hex
+from app.services.minio_service import minio_service
+from app.services.progress_service import progress_service
+from app.services.proxy_video import open_proxy_writer
+from app.services.seek_index import build_seek_index
+from app.services.video_processor import VideoProcessor
+from app.tasks.celery_app import celery_app
+from app.tasks.video_tasks import (update_video_progress,
+                                   _load_task_scene_metrics,
+                                   _load_reference_fingerprints,
+                                   _bulk_mark_frames,
+                                   _frame_marks,
+                                   _cleanup_cancelled,
+                                   _source_path,
+                                   _discard_source,
+                                   _schedule_phash_index_rebuild,
+                                   cleanup_video_objects)
+
+logger = logging.getLogger(__name__)
+
+
+def start_video_pipeline(video_id: str, video_path: str = None,
+                         related_task_id: str = None,
+                         cost_tier: str = None,
+                         estimated_cost: float = None,
+                         task_id: str = None,
+                         source_object: str = None):
+    """
+    启动分阶段视频处理流水线
+
+    probe(IO) → extract(CPU) → upload(IO) → analyze(CPU) → finalize(IO)
+
+    各阶段通过上下文字典传递状态，帧数据暂存在提取节点本地的FrameSpool中；
+    提取阶段按成本档位进入 small/medium/large 队列，完成后把之后的阶段
+    投递到本节点专用队列(见 _continue_on_node)。
+    源视频从MinIO读取: 探测阶段通过预签名URL只读取文件头，
+    提取阶段下载到所在节点的本地缓存
+
+    Args:
+    video_id: 视频ID
+    video_path: 共享卷上的视频文件路径(仅旧作业)
+    related_task_id: 关联的业务任务ID
+    cost_tier: 成本档位
+    estimated_cost: 预估处理成本
+    task_id: 流水线最后一个阶段(finalize)的Celery任务ID(为空时自动生成)
+    source_object: 原始视频在MinIO中的对象名
+
+    Returns:
+    AsyncResult: 流水线最后一个阶段的结果
+    """
+    task_id = task_id or str(uuid.uuid4())
+    context = {
+        "video_id": video_id,
+        "task_id": task_id,
+        "video_path": video_path,
+        "related_task_id": related_task_id,
+        "cost_tier": cost_tier,
+        "estimated_cost": estimated_cost,
+        "source_object": source_object
+    }
+    chain(
+        probe_video.s(context),
+        extract_video_features.s().set(queue=cpu_queue(cost_tier))
+    ).apply_async()
+    return celery_app.AsyncResult(task_id)
+
+
+def _node_queue(queue: str) -> str:
+    """本节点专用队列(同一节点的Worker共享 WORKER_NODE_NAME)"""
+    return f"{queue}.{memory_admission.node}"
+
+
+def _continue_on_node(context: Dict):
+    """
+    提取完成后启动之后的阶段
+
+    上传、分析与定稿都读取提取阶段写入的本地暂存目录，
+    投递到本节点专用队列，避免被其他节点的Worker取走后找不到暂存文件
+    """
+    chain(
+        upload_video_frames.s(context).set(queue=_node_queue("video_io")),
+        analyze_video_frames.s().set(queue=_node_queue("video_cpu")),
+        finalize_video.s().set(queue=_node_queue("video_io"))
+    ).apply_async(task_id=context["task_id"])
+
+
+def _release_slot(video_id: str):
+    """释放公平调度的并发名额，并触发下一次调度"""
+    try:
+        fair_scheduler.release(video_id)
+        dispatch_fair_share.delay()
+    except Exception as e:
+        logger.warning(f"Failed to release fair-share slot: {e}")
+
+
+def _heartbeat(slot_id: str):
+    """刷新公平调度占用的心跳(按间隔节流，失败只记录日志)"""
+    try:
+        fair_scheduler.heartbeat(slot_id)
+    except Exception as e:
+        logger.warning(f"Failed to refresh fair-share slot: {e}")
+
+
+def _load_project_configs(project_ids: List[str]) -> Dict[str, Dict]:
+    """读取项目的调度权重与并发上限"""
+    project_ids = [p for p in project_ids if p != DEFAULT_PROJECT]
+    if not project_ids:
+        return {}
+
+    db = SyncSessionLocal()
+    try:
+        rows = db.query(Project.id, Project.processing_weight,
+                        Project.max_concurrency).filter(
+            Project.id.in_(project_ids)).all()
+        return {
+            row.id: {"weight": row.processing_weight,
+                     "max_concurrency": row.max_concurrency}
+            for row in rows
+        }
+    finally:
+        db.close()
+
+
+def _start_scheduled_job(job: Dict) -> bool:
+    """启动调度释放的作业(视频已取消或已删除时跳过)"""
+    clips = job.get("clips") or [job]
+    db = SyncSessionLocal()
+    try:
+        statuses = dict(db.query(Video.id, Video.status).filter(
+            Video.id.in_([c["video_id"] for c in clips])).all())
+    finally:
+        db.close()
+
+    active = []
+    for clip in clips:
+        status = statuses.get(clip["video_id"])
+        if status is None or status == VideoStatus.CANCELLED:
+            logger.info(f"跳过已取消的视频: {clip['video_id']}")
+            _discard_source(clip.get("video_path"), clip.get("source_object"))
+            cost_scheduler.complete(clip.get("cost_tier"),
+                                    clip.get("estimated_cost"))
+        else:
+            active.append(clip)
+
+    if not active:
+        return False
+
+    if "clips" in job:
+        process_short_clips.apply_async(args=[active, job["slot_id"]],
+                                        task_id=job["task_id"],
+                                        queue=cpu_queue("small"))
+        return True
+
+    start_video_pipeline(job["video_id"], job.get("video_path"),
+                         related_task_id=job.get("related_task_id"),
+                         cost_tier=job.get("cost_tier"),
+                         estimated_cost=job.get("estimated_cost"),
+                         task_id=job.get("task_id"),
+                         source_object=job.get("source_object"))
+    return True
+
+
+@celery_app.task(name='app.tasks.pipeline_tasks.dispatch_fair_share')
+def dispatch_fair_share() -> int:
+    """按项目加权轮询，将排队作业释放到处理流水线"""
+    dispatched = fair_scheduler.dispatch(_load_project_configs,
+                                         _start_scheduled_job)
+    if dispatched:
+        logger.info(f"公平调度派发 {dispatched} 个视频")
+    return dispatched
+
+
+def _frame_row(video_id: str, frame_info: Dict, frame_url: str,
+               frame_id: str) -> Dict:
+    """帧记录的批量插入参数"""
+    return {
+        "id": frame_id,
+        "video_id": video_id,
+        "frame_number": frame_info['frame_number'],
+        "timestamp": frame_info['timestamp'],
+        "minio_url": frame_url,
+        "brightness": frame_info['brightness'],
+        "sharpness": frame_info['sharpness'],
+        "scene_change_score": frame_info['scene_change_score'],
+        "phash": phash_to_hex(frame_info['phash'])
+    }
+
+
+def _fail_pipeline(context: Dict, error: Exception):
+    """阶段失败或被取消: 标记视频状态并清理暂存数据"""
+    video_id = context["video_id"]
+    cancelled = isinstance(error, TaskCancelled)
+    if cancelled:
+        logger.info(f"视频处理已取消: {video_id}")
+    else:
+        logger.error(f"视频处理失败: {video_id}, error: {error}")
+
+    db = SyncSessionLocal()
+    try:
+        video = db.query(Video).filter(Video.id == video_id).first()
+        if video:
+            if cancelled:
+                video.status = VideoStatus.CANCELLED
+                video.error_message = "任务已被用户取消"
+            else:
+                video.status = VideoStatus.FAILED
+                video.error_message = str(error)[:255]
+            video.progress = 0
+            progress_service.commit_state(db, video)
+        if cancelled:
+            _cleanup_cancelled(db, video_id)
+    except Exception as e:
+        logger.error(f"Failed to mark video failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+        progress_service.release(video_id)
+
+    cost_scheduler.complete(context.get("cost_tier"),
+                            context.get("estimated_cost"))
+    _release_slot(video_id)
+    FrameSpool(video_id).cleanup()
+    _discard_source(context.get("video_path"), context.get("source_object"))
+
+
+@celery_app.task(name='app.tasks.pipeline_tasks.probe_video')
+def probe_video(context: Dict) -> Dict:
+    """阶段1(IO): 读取视频信息并进入提取状态"""
+    video_id = context["video_id"]
+    token = CancellationToken(video_id)
+    db = SyncSessionLocal()
+
+    try:
+        _heartbeat(video_id)
+        token.check()
+        logger.info(f"开始处理视频: {video_id}")
+        update_video_progress(video_id, 5, "开始处理")
+
+        video = db.query(Video).filter(Video.id == video_id).first()
+        if not video:
+            raise ValueError(f"Video not found: {video_id}")
+
+        progress_service.bind(video_id, video.batch_id,
+                              context["related_task_id"])
+
+        update_video_progress(video_id, 10, "分析视频信息")
+        if context.get("source_object"):
+            # 探测只需读取文件头，通过预签名URL流式读取，不下载整个文件
+            probe_source = minio_service.get_object_url(
+                context["source_object"])
+        else:
+            probe_source = context["video_path"]
+        video_info = VideoProcessor.extract_video_info(probe_source)
+
+        video.duration = video_info["duration"]
+        video.fps = video_info["fps"]
+        video.width = video_info["width"]
+        video.height = video_info["height"]
+        video.total_frames = video_info["frame_count"]
+        video.status = VideoStatus.EXTRACTING
+        progress_service.commit_state(db, video)
+
+        logger.info(f"视频信息: {video_info}")
+
+        context["started_at"] = time.time()
+        context["batch_id"] = video.batch_id
+        context["total_frames"] = video_info["frame_count"]
+        context["width"] = video_info["width"]
+        context["height"] = video_info["height"]
+        context["fps"] = video_info["fps"]
+        context["scene_metrics"] = _load_task_scene_metrics(
+            db, context["related_task_id"])
+        return context
+
+    except TaskCancelled as e:
+        _fail_pipeline(context, e)
+        raise Ignore()
+
+    except Exception as e:
+        _fail_pipeline(context, e)
+        raise
+
+    finally:
+        db.close()
+        progress_service.release(video_id)
+
+
+def _admit(task, raw_bytes: int):
+    """
+    内存准入: 节点预算不足时延迟重试，让出进程给更小的任务
+
+    任务需声明 max_retries=None，延迟重试不计入失败次数
+    """
+    lease = memory_admission.try_acquire(task.request.id, raw_bytes)
+    if lease is None:
+        logger.info(f"内存预算不足，延迟执行: {task.name} "
+                    f"(估算 {raw_bytes >> 20}MB)")
+        raise task.retry(countdown=settings.MEMORY_ADMISSION_RETRY_SECONDS)
+    return lease
+
+
+@celery_app.task(bind=True, max_retries=None,
+                 name='app.tasks.pipeline_tasks.extract_video_features')
+def extract_video_features(self, context: Dict) -> Dict:
+    """阶段2(CPU): 解码、编码JPEG并计算帧特征，写入暂存目录"""
+    video_id = context["video_id"]
+    # 等待内存预算的延迟重试期间也保持占用
+    _heartbeat(video_id)
+    lease = _admit(self, estimate_task_bytes(
+        context.get("width"), context.get("height"),
+        (context["total_frames"] or 0) // settings.FRAME_SAMPLING_RATE))
+
+    progress_service.bind(video_id, context.get("batch_id"),
+                          context["related_task_id"])
+
+    token = CancellationToken(video_id)
+    proxy = None
+
+    try:
+        token.check()
+        update_video_progress(video_id, 20, "提取所有帧")
+        spool = FrameSpool(video_id)
+        spool.prepare()
+        # 顺序解码时顺带写入分析代理视频
+        proxy = open_proxy_writer(spool.proxy_path, context.get("fps"),
+                                  context.get("width"), context.get("height"))
+
+        video_path = _source_path(video_id, context.get("video_path"),
+                                  context.get("source_object"))
+        extractor = FrameExtractor(scene_metrics=context["scene_metrics"])
+        total_frames = max(context["total_frames"] or 0, 1)
+        extracted_count = 0
+        timestamps = []
+
+        def frame_callback(frame_data, frame_info):
+            """帧提取回调 - 写入暂存目录"""
+            nonlocal extracted_count
+            spool.write_frame(frame_info['frame_number'], frame_data)
+            extracted_count += 1
+
+            if extracted_count % settings.FRAME_INSERT_BATCH_SIZE == 0:
+                _heartbeat(video_id)
+                progress = 20 + int(
+                    (frame_info['frame_number'] / total_frames) * 35)
+                update_video_progress(video_id, progress,
+                                      f"已提取 {extracted_count} 帧")
+
+        frames_info = extractor.extract_all_frames(
+            video_path, frame_callback, keep_data=False,
+            checkpoint=token.checkpoint,
+            frame_sink=proxy.write if proxy else None,
+            timestamps=timestamps)
+        if proxy:
+            proxy.close()
+        _save_seek_index(video_path, timestamps, spool.index_path)
+
+        frame_ids = [str(uuid.uuid4()) for _ in frames_info]
+        spool.save_manifest(frames_info, frame_ids)
+
+        logger.info(f"帧提取完成: {extracted_count} 帧")
+
+        context["extracted_frames"] = extracted_count
+        context["scene_metrics"] = extractor.scene_detector.metric_names
+        context["scene_metrics_cost"] = extractor.scene_detector.cost_report()
+        if context.get("task_id"):
+            _continue_on_node(context)
+        # 升级前投递的完整链(上下文无task_id)沿用原链继续
+        return context
+
+    except TaskCancelled as e:
+        _fail_pipeline(context, e)
+        raise Ignore()
+
+    except Exception as e:
+        _fail_pipeline(context, e)
+        raise
+
+    finally:
+        if proxy:
+            proxy.release()
+        progress_service.release(video_id)
+        memory_admission.release(lease, stage="extract",
+                                 width=context.get("width"),
+                                 height=context.get("height"))
+
+
+@celery_app.task(bind=True, max_retries=3,
+                 name='app.tasks.pipeline_tasks.upload_video_frames')
+def upload_video_frames(self, context: Dict) -> Dict:
+    """阶段3(IO): 上传暂存帧到MinIO并批量写入帧记录"""
+    video_id = context["video_id"]
+    progress_service.bind(video_id, context.get("batch_id"),
+                          context["related_task_id"])
+    token = CancellationToken(video_id)
+    db = SyncSessionLocal()
+
+    try:
+        _heartbeat(video_id)
+        token.check()
+        spool = FrameSpool(video_id)
+        frames_info = spool.load_manifest()
+        total = max(len(frames_info), 1)
+
+        # 重试时先清掉上次写入的部分帧记录，保证幂等
+        db.execute(delete(Frame).where(Frame.video_id == video_id))
+        db.commit()
+
+        # 每批并发上传后写入对应的帧记录
+        batch_size = settings.FRAME_INSERT_BATCH_SIZE
+        for start in range(0, len(frames_info), batch_size):
+            chunk = frames_info[start:start + batch_size]
+            urls = minio_service.upload_frames_bulk(
+                video_id,
+                ((spool.read_frame(f['frame_number']),
+                  f"frame_{f['frame_number']}", f['timestamp'])
+                 for f in chunk),
+                checkpoint=token.checkpoint
+            )
+            db.execute(insert(Frame), [
+                _frame_row(video_id, frame_info, url, frame_info['id'])
+                for frame_info, url in zip(chunk, urls)
+            ])
+            db.commit()
+
+            done = start + len(chunk)
+            _heartbeat(video_id)
+            update_video_progress(video_id, 55 + int(done / total * 20),
+                                  f"已上传 {done} 帧")
+
+        video = db.query(Video).filter(Video.id == video_id).first()
+        video.extracted_frames = len(frames_info)
+        video.proxy_path = _upload_optional(
+            minio_service.upload_proxy, video_id, spool.proxy_path)
+        video.seek_index_path = _upload_optional(
+            minio_service.upload_seek_index, video_id, spool.index_path)
+        db.commit()
+
+        return context
+
+    except TaskCancelled as e:
+        db.rollback()
+        _fail_pipeline(context, e)
+        raise Ignore()
+
+    except Exception as e:
+        db.rollback()
+        if self.request.retries < self.max_retries:
+            logger.warning(f"帧上传失败，准备重试: {video_id}, error: {e}")
+            raise self.retry(exc=e, countdown=30)
+        _fail_pipeline(context, e)
+        raise
+
+    finally:
+        db.close()
+        progress_service.release(video_id)
+
+
+@celery_app.task(name='app.tasks.pipeline_tasks.analyze_video_frames')
+def analyze_video_frames(context: Dict) -> Dict:
+    """阶段4(CPU): 基于特征清单标记首尾帧并生成候选帧"""
+    video_id = context["video_id"]
+    progress_service.bind(video_id, context.get("batch_id"),
+                          context["related_task_id"])
+    token = CancellationToken(video_id)
+    db = SyncSessionLocal()
+
+    try:
+        _heartbeat(video_id)
+        token.check()
+        update_video_progress(video_id, 80, "智能标记首尾帧")
+        frames_info = FrameSpool(video_id).load_manifest()
+        scene_scores = [f['scene_change_score'] for f in frames_info]
+
+        analyzer = FrameAnalyzer()
+        references = _load_reference_fingerprints(db,
+                                                  context["related_task_id"])
+        first_idx, last_idx, confidence = analyzer.analyze_first_last_frames(
+            frames_info,
+            scene_scores,
+            references=references
+        )
+
+        context["analysis"] = {
+            "first_idx": first_idx,
+            "last_idx": last_idx,
+            "confidence": confidence,
+            "first_candidates": analyzer.get_candidate_frames(
+                frames_info, 'first', top_k=5),
+            "last_candidates": analyzer.get_candidate_frames(
+                frames_info, 'last', top_k=5)
+        }
+        return context
+
+    except TaskCancelled as e:
+        _fail_pipeline(context, e)
+        raise Ignore()
+
+    except Exception as e:
+        _fail_pipeline(context, e)
+        raise
+
+    finally:
+        db.close()
+        progress_service.release(video_id)
+
+
+@celery_app.task(name='app.tasks.pipeline_tasks.finalize_video')
+def finalize_video(context: Dict) -> Dict:
+    """阶段5(IO): 写入标记与标注记录，更新状态并清理暂存数据"""
+    video_id = context["video_id"]
+    progress_service.bind(video_id, context.get("batch_id"),
+                          context["related_task_id"])
+    token = CancellationToken(video_id)
+    db = SyncSessionLocal()
+
+    try:
+        token.check()
+        update_video_progress(video_id, 90, "生成候选帧列表")
+        analysis = context["analysis"]
+        confidence = analysis["confidence"]
+
+        spool = FrameSpool(video_id)
+        frames_info = spool.load_manifest()
+        first_frame = frames_info[analysis["first_idx"]]
+        last_frame = frames_info[analysis["last_idx"]]
+
+        _bulk_mark_frames(db, frames_info, analysis["first_idx"],
+                          analysis["last_idx"], confidence,
+                          analysis["first_candidates"],
+                          analysis["last_candidates"])
+
+        for frame, is_first in ((first_frame, True), (last_frame, False)):
+            db.add(FrameAnnotation(
+                id=str(uuid.uuid4()),
+                video_id=video_id,
+                frame_id=frame["id"],
+                marked_as_first=is_first,
+                marked_as_last=not is_first,
+                marking_method=MarkingMethod.ALGORITHM,
+                confidence=confidence,
+                reason="算法自动标记",
+                annotator="system"
+            ))
+
+        # 提交前再检查一次，避免覆盖已取消的状态
+        token.check()
+        video = db.query(Video).filter(Video.id == video_id).first()
+        video.status = VideoStatus.PENDING_REVIEW
+        video.marking_method = MarkingMethod.ALGORITHM
+        video.ai_confidence = confidence
+        video.needs_review = True
+        video.progress = 100
+        video.current_step = "等待人工审核"
+        progress_service.commit_state(db, video)
+
+        _schedule_phash_index_rebuild(db, context["related_task_id"])
+        cost_scheduler.complete(context.get("cost_tier"),
+                                context.get("estimated_cost"),
+                                time.time() - context["started_at"])
+        _release_slot(video_id)
+
+        spool.cleanup()
+        _discard_source(context.get("video_path"),
+                        context.get("source_object"))
+
+        logger.info(f"视频处理完成: {video_id}")
+
+        return {
+            "video_id": video_id,
+            "status": "pending_review",
+            "extracted_frames": context["extracted_frames"],
+            "first_frame": first_frame["frame_number"],
+            "last_frame": last_frame["frame_number"],
+            "confidence": confidence,
+            "scene_metrics": context["scene_metrics"],
+            "scene_metrics_cost": context["scene_metrics_cost"]
+        }
+
+    except TaskCancelled as e:
+        _fail_pipeline(context, e)
+        raise Ignore()
+
+    except Exception as e:
+        _fail_pipeline(context, e)
+        raise
+
+    finally:
+        db.close()
+        progress_service.release(video_id)
+
+
+def _save_seek_index(video_path: str, timestamps: List[float], path: str):
+    """构建并保存定位索引(可选，失败时只记录日志)"""
+    try:
+        build_seek_index(video_path, timestamps).save(path)
+    except Exception as e:
+        logger.warning(f"定位索引构建失败: {video_path}, error: {e}")
+
+
+def _upload_optional(upload, video_id: str, path: str) -> Optional[str]:
+    """
+    上传可选的辅助文件(代理视频、定位索引)
+
+    失败时只记录日志，按需读取帧时回退到原视频
+
+    Returns:
+    对象名称，文件不存在或上传失败时返回None
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        return upload(video_id, path)
+    except Exception as e:
+        logger.warning(f"辅助文件上传失败: {path}, error: {e}")
+        return None
+
+
+def _process_clip(clip: Dict, token: CancellationToken,
+                  scene_metrics, references) -> Dict:
+    """
+    单个短视频: 提取、上传帧并标记首尾帧(不写数据库)
+
+    Returns:
+    {"rows", "marks", "annotations", "confidence", "proxy_path", "seek_index_path"}
+    """
+    video_id = clip["video_id"]
+    video_path = _source_path(video_id, clip.get("video_path"),
+                              clip.get("source_object"))
+    extractor = FrameExtractor(scene_metrics=scene_metrics)
+    spool = FrameSpool(video_id)
+    spool.prepare()
+    proxy = open_proxy_writer(spool.proxy_path, clip.get("fps"),
+                              clip.get("width"), clip.get("height"))
+    timestamps = []
+    try:
+        frames_info = extractor.extract_all_frames(
+            video_path, checkpoint=token.checkpoint,
+            frame_sink=proxy.write if proxy else None,
+            timestamps=timestamps)
+        if proxy:
+            proxy.close()
+        _save_seek_index(video_path, timestamps, spool.index_path)
+        proxy_path = _upload_optional(minio_service.upload_proxy, video_id,
+                                      spool.proxy_path)
+        seek_index_path = _upload_optional(minio_service.upload_seek_index,
+                                           video_id, spool.index_path)
+    finally:
+        if proxy:
+            proxy.release()
+        spool.cleanup()
+    if not frames_info:
+        raise ValueError("未提取到任何帧")
+
+    urls = minio_service.upload_frames_bulk(
+        video_id,
+        ((f.pop('data'), f"frame_{f['frame_number']}", f['timestamp'])
+         for f in frames_info),
+        checkpoint=token.checkpoint
+    )
+    rows = [_frame_row(video_id, frame_info, url, str(uuid.uuid4()))
+            for frame_info, url in zip(frames_info, urls)]
+
+    analyzer = FrameAnalyzer()
+    first_idx, last_idx, confidence = analyzer.analyze_first_last_frames(
+        frames_info,
+        [f['scene_change_score'] for f in frames_info],
+        references=references
+    )
+    marks = _frame_marks(
+        rows, first_idx, last_idx, confidence,
+        analyzer.get_candidate_frames(frames_info, 'first', top_k=5),
+        analyzer.get_candidate_frames(frames_info, 'last', top_k=5))
+
+    annotations = [
+        {
+            "id": str(uuid.uuid4()),
+            "video_id": video_id,
+            "frame_id": rows[idx]["id"],
+            "marked_as_first": is_first,
+            "marked_as_last": not is_first,
+            "marking_method": MarkingMethod.ALGORITHM,
+            "confidence": confidence,
+            "reason": "算法自动标记",
+            "annotator": "system"
+        }
+        for idx, is_first in ((first_idx, True), (last_idx, False))
+    ]
+    return {"rows": rows, "marks": marks, "annotations": annotations,
+            "confidence": confidence, "proxy_path": proxy_path,
+            "seek_index_path": seek_index_path}
+
+
+@celery_app.task(bind=True, max_retries=None,
+                 name='app.tasks.pipeline_tasks.process_short_clips')
+def process_short_clips(self, clips: List[Dict], slot_id: str) -> Dict:
+    """
+    短视频批处理: 一次调用处理多个短视频
+
+    视频信息在上传时已探测，这里跳过探测与中间进度写入；
+    所有视频共享一个数据库会话与MinIO连接池，
+    帧记录、标记与标注在全部处理完后批量写入并一次提交
+
+    Args:
+    clips: 作业列表 [{"video_id", "source_object", "fps", "related_task_id", "cost_tier", "estimated_cost"}]
+    slot_id: 公平调度占用的名额ID
+
+    Returns:
+    {video_id: 处理结果}
+    """
+    _heartbeat(slot_id)
+    # 逐个处理且保留JPEG数据，峰值取决于最大的一个视频
+    lease = _admit(self, max(
+        estimate_task_bytes(
+            c.get("width"), c.get("height"),
+            (c.get("total_frames") or 0) // settings.FRAME_SAMPLING_RATE,
+            keep_data=True)
+        for c in clips))
+
+    db = SyncSessionLocal()
+    all_clips = list(clips)
+    videos = {}
+    results = {}
+    processed = []
+
+    try:
+        videos = {v.id: v for v in db.query(Video).filter(
+            Video.id.in_([c["video_id"] for c in clips])).all()}
+        clips = [c for c in clips if c["video_id"] in videos]
+
+        for clip in clips:
+            video = videos[clip["video_id"]]
+            progress_service.bind(video.id, video.batch_id,
+                                  clip["related_task_id"])
+            video.status = VideoStatus.EXTRACTING
+            video.current_step = "短视频批处理"
+        db.commit()
+        for clip in clips:
+            progress_service.publish_state(videos[clip["video_id"]])
+
+        # 同一业务任务的场景指标与参考画面只加载一次
+        scene_metrics = {}
+        references = {}
+
+        for clip in clips:
+            video_id = clip["video_id"]
+            video = videos[video_id]
+            related_task_id = clip["related_task_id"]
+            if related_task_id not in scene_metrics:
+                scene_metrics[related_task_id] = _load_task_scene_metrics(
+                    db, related_task_id)
+                references[related_task_id] = _load_reference_fingerprints(
+                    db, related_task_id)
+
+            _heartbeat(slot_id)
+            started_at = time.time()
+            try:
+                result = _process_clip(clip, CancellationToken(video_id),
+                                       scene_metrics[related_task_id],
+                                       references[related_task_id])
+                processed.append((clip, result, time.time() - started_at))
+
+            except TaskCancelled:
+                # 帧记录尚未写入，只需清理已上传的对象
+                logger.info(f"视频处理已取消: {video_id}")
+                minio_service.delete_video_objects(video_id)
+                clear_cancel(video_id)
+                video.status = VideoStatus.CANCELLED
+                video.error_message = "任务已被用户取消"
+                video.progress = 0
+                results[video_id] = {"status": "cancelled"}
+                cost_scheduler.complete(clip.get("cost_tier"),
+                                        clip.get("estimated_cost"))
+
+            except Exception as e:
+                logger.error(f"视频处理失败: {video_id}, error: {e}")
+                video.status = VideoStatus.FAILED
+                video.error_message = str(e)[:255]
+                video.progress = 0
+                results[video_id] = {"status": "failed", "error": str(e)}
+                cost_scheduler.complete(clip.get("cost_tier"),
+                                        clip.get("estimated_cost"))
+
+        # 批量写入
+        rows = [row for _, r, _ in processed for row in r["rows"]]
+        for start in range(0, len(rows), settings.FRAME_INSERT_BATCH_SIZE):
+            db.execute(insert(Frame),
+                       rows[start:start + settings.FRAME_INSERT_BATCH_SIZE])
+        marks = [m for _, r, _ in processed for m in r["marks"]]
+        if marks:
+            db.execute(update(Frame), marks)
+        annotations = [a for _, r, _ in processed for a in r["annotations"]]
+        if annotations:
+            db.execute(insert(FrameAnnotation), annotations)
+
+        for clip, result, _ in processed:
+            video = videos[clip["video_id"]]
+            video.extracted_frames = len(result["rows"])
+            video.proxy_path = result["proxy_path"]
+            video.seek_index_path = result["seek_index_path"]
+            video.status = VideoStatus.PENDING_REVIEW
+            video.marking_method = MarkingMethod.ALGORITHM
+            video.ai_confidence = result["confidence"]
+            video.needs_review = True
+            video.progress = 100
+            video.current_step = "等待人工审核"
+            results[clip["video_id"]] = {
+                "status": "pending_review",
+                "extracted_frames": len(result["rows"]),
+                "confidence": result["confidence"]
+            }
+        db.commit()
+
+        for clip, _, elapsed in processed:
+            cost_scheduler.complete(clip.get("cost_tier"),
+                                    clip.get("estimated_cost"), elapsed)
+        for related_task_id in {clip["related_task_id"]
+                                for clip, _, _ in processed}:
+            _schedule_phash_index_rebuild(db, related_task_id)
+
+        logger.info(f"短视频批处理完成: {len(processed)}/{len(clips)} 个视频")
+        return results
+
+    except Exception as e:
+        # 批量写入失败: 回滚会丢弃循环中已设置的状态，逐个重新设置；
+        # 已取消/失败的视频成本已结算，其余视频整体标记失败
+        logger.error(f"短视频批处理写入失败: {e}")
+        db.rollback()
+        processed_ids = {clip["video_id"] for clip, _, _ in processed}
+        for clip in clips:
+            video_id = clip["video_id"]
+            video = videos.get(video_id)
+            if video is None:
+                continue
+            outcome = results.get(video_id, {})
+            video.progress = 0
+            if outcome.get("status") == "cancelled":
+                video.status = VideoStatus.CANCELLED
+                video.error_message = "任务已被用户取消"
+                continue
+            video.status = VideoStatus.FAILED
+            if outcome.get("status") == "failed":
+                video.error_message = str(outcome["error"])[:255]
+                continue
+            video.error_message = str(e)[:255]
+            results[video_id] = {"status": "failed", "error": str(e)}
+            cost_scheduler.complete(clip.get("cost_tier"),
+                                    clip.get("estimated_cost"))
+            if video_id in processed_ids:
+                # 帧、代理视频与定位索引已上传，帧记录未写入
+                try:
+                    cleanup_video_objects.delay(video_id)
+                except Exception as cleanup_error:
+                    logger.error(f"Failed to schedule MinIO cleanup: "
+                                 f"{cleanup_error}")
+        db.commit()
+        raise
+
+    finally:
+        for clip in all_clips:
+            video = videos.get(clip["video_id"])
+            if video is not None:
+                try:
+                    progress_service.publish_state(video)
+                except Exception as e:
+                    logger.warning(f"Failed to sync progress to redis: {e}")
+            progress_service.release(clip["video_id"])
+            _discard_source(clip.get("video_path"), clip.get("source_object"))
+        db.close()
+        _release_slot(slot_id)
+        memory_admission.release(lease, stage="short_clips",
+                                 clips=len(all_clips))
@@ -8,15 +8,24 @@
 """
 from app.services.video_processor import VideoProcessor
 from app.tasks.celery_app import celery_app
-from app.services.frame_extractor import FrameExtractor
 from app.services.frame_analyzer import FrameAnalyzer
 from app.services.minio_service import minio_service
+from app.services.phash_index import phash_index_service
+from app.services.progress_service import progress_service
+from app.services.batch_progress import batch_progress_service
+from app.services.cancellation import (CancellationToken, TaskCancelled,
+                                      clear_cancel)
+from app.services.source_cache import source_cache
 from app.models.video import (Video, Frame, FrameAnnotation, VideoStatus,
                               FrameType, MarkingMethod)
+from app.models.task import Task
+from app.models.reference import ReferenceScreen
 from app.database import SyncSessionLocal
 from app.config import settings
 from celery.exceptions import SoftTimeLimitExceeded
+from sqlalchemy import or_, update, delete
 import uuid
+import time
 import logging
 import os
 import asyncio
@@ -28,12 +37,22 @@ def update_video_progress(video_id: str, progress: int, step: str):
     """
     更新视频处理进度
 
+    进度写入Redis(按视频限流)，只在状态转换时随状态一起落库；
+    Redis不可用时回退为直接写数据库
+
     Args:
     video_id: 视频ID
     progress: 进度百分比(0 - 100)
     step: 当前步骤描述
 
     """
+    try:
+        if progress_service.report(video_id, progress, step):
+            logger.info(f"Progress updated: {video_id} - {progress}% - {step}")
+        return
+    except Exception as e:
+        logger.warning(f"Failed to report progress to redis: {e}")
+
     db = SyncSessionLocal()
     try:
         video = db.query(Video).filter(Video.id == video_id).first()
@@ -49,23 +68,47 @@ def update_video_progress(video_id: str, progress: int, step: str):
         db.close()
 
 
+def _source_path(video_id: str, video_path: str = None,
+                 source_object: str = None) -> str:
+    """
+    源视频的本地路径
+
+    优先从节点本地缓存读取MinIO中的原始视频；
+    没有对象名的旧作业仍使用共享卷上的上传文件
+    """
+    if source_object:
+        return source_cache.get(video_id, source_object)
+    return video_path
+
+
+def _discard_source(video_path: str = None, source_object: str = None):
+    """删除旧作业在共享卷上的上传文件(缓存中的源视频由LRU淘汰，保留给重试)"""
+    if not source_object and video_path and os.path.exists(video_path):
+        os.remove(video_path)
+        logger.info(f"Cleaned up temp file: {video_path}")
+
+
 @celery_app.task(bind=True, max_retries=3,
                  name='app.tasks.video_tasks.process_video_frames')
-def process_video_frames(self, video_id: str, video_path: str):
+def process_video_frames(self, video_id: str, video_path: str = None,
+                         source_object: str = None):
     """
     处理视频帧提取任务
 
     Args:
     video_id: 视频ID
-    video_path: 视频文件路径
+    video_path: 视频文件路径(旧作业)
+    source_object: 原始视频在MinIO中的对象名
 
 
     Returns:
     dict: 处理结果
     """
+    token = CancellationToken(video_id)
     db = SyncSessionLocal()
 
     try:
+        video_path = _source_path(video_id, video_path, source_object)
         logger.info(f"Starting video processing: {video_id}")
         update_video_progress(video_id, 5, "开始处理视频")
 
@@ -75,13 +118,13 @@ def process_video_frames(self, video_id: str, video_path: str):
             raise ValueError(f"Video not found: {video_id}")
 
         # 更新状态
+        progress_service.bind(video_id, video.batch_id)
         video.status = VideoStatus.EXTRACTING
         video.task_id = video_id
-        db.commit()
+        progress_service.commit_state(db, video)
 
         # 检查任务是否被取消
-        # if self.is_aborted():
-        #     raise Exception("Task cancelled by user")
+        token.check()
 
         # 1. 提取视频信息
         update_video_progress(video_id, 20, "正在分析视频信息")
@@ -96,8 +139,7 @@ def process_video_frames(self, video_id: str, video_path: str):
         logger.info(f"Video info extracted: {video_info}")
 
         # 2. 提取首帧
-        # if self.is_aborted():
-        #     raise Exception("Task cancelled by user")
+        token.check()
 
         update_video_progress(video_id, 40, "正在提取首帧")
         first_frame_data, first_timestamp, first_frame_num = VideoProcessor.extract_first_frame(
@@ -124,8 +166,7 @@ def process_video_frames(self, video_id: str, video_path: str):
         logger.info(f"First frame uploaded: {first_frame_url}")
 
         # 3. 提取尾帧
-        # if self.is_aborted():
-        #     raise Exception("Task cancelled by user")
+        token.check()
 
         update_video_progress(video_id, 70, "正在提取尾帧")
         last_frame_data, last_timestamp, last_frame_num = VideoProcessor.extract_last_frame(
@@ -151,24 +192,23 @@ def process_video_frames(self, video_id: str, video_path: str):
 
         logger.info(f"Last frame uploaded: {last_frame_url}")
 
-        # 4. 上传原始视频 (可选)
-        update_video_progress(video_id, 90, "正在上传原始视频")
-        minio_path = minio_service.upload_video(
-            video_id, video_path, video.filename
-        )
-        video.minio_path = minio_path
+        # 4. 上传原始视频 (已在MinIO中时跳过)
+        if not source_object:
+            update_video_progress(video_id, 90, "正在上传原始视频")
+            video.minio_path = minio_service.upload_video(
+                video_id, video_path, video.filename
+            )
 
         # 5. 完成处理
-        update_video_progress(video_id, 100, "处理完成")
         video.status = VideoStatus.COMPLETED
-        db.commit()
+        video.progress = 100
+        video.current_step = "处理完成"
+        progress_service.commit_state(db, video)
 
         logger.info(f"Video processing completed: {video_id}")
 
         # 6. 清理临时文件
-        if os.path.exists(video_path):
-            os.remove(video_path)
-            logger.info(f"Cleaned up temp file: {video_path}")
+        _discard_source(video_path, source_object)
 
         return {
             "video_id": video_id,
@@ -196,10 +236,9 @@ def process_video_frames(self, video_id: str, video_path: str):
             video.status = VideoStatus.FAILED
             video.error_message = "处理超时"
             video.progress = 0
-            db.commit()
+            progress_service.commit_state(db, video)
 
-        if os.path.exists(video_path):
-            os.remove(video_path)
+        _discard_source(video_path, source_object)
         raise
 
     except Exception as e:
@@ -208,252 +247,209 @@ def process_video_frames(self, video_id: str, video_path: str):
 
         video = db.query(Video).filter(Video.id == video_id).first()
         if video:
-            if "cancelled" in error_msg.lower():
+            if isinstance(e, TaskCancelled):
                 video.status = VideoStatus.CANCELLED
                 video.error_message = "任务已被用户取消"
             else:
                 video.status = VideoStatus.FAILED
                 video.error_message = error_msg
             video.progress = 0
-            db.commit()
+            progress_service.commit_state(db, video)
 
-        if os.path.exists(video_path):
-            os.remove(video_path)
-
-        # 非取消错误才重试
-        if "cancelled" not in error_msg.lower():
+        if isinstance(e, TaskCancelled):
+            _discard_source(video_path, source_object)
+            _cleanup_cancelled(db, video_id)
+        else:
+            # 非取消错误才重试(重试需要源文件，最后一次失败后才删除)
+            if self.request.retries >= self.max_retries:
+                _discard_source(video_path, source_object)
             raise self.retry(exc=e, countdown=60)
 
     finally:
         db.close()
 
 
-@celery_app.task(bind=True, max_retries=3, name='app.tasks.video_tasks.process_video_frames_full')
-def process_video_frames_full(self, video_id: str, video_path: str):
-    """
-    完整的视频处理任务
-
-    流程:
-    1.
-    提取所有帧(根据采样率)
-    2.
-    上传所有帧到MinIO
-    3.
-    计算帧特征和场景变化
-    4.
-    使用算法 / AI标记首尾帧
-    5.
-    生成候选帧列表
-    6.
-    设置状态为待审核
-    """
-    db = SyncSessionLocal()
-
+def _cleanup_cancelled(db, video_id: str):
+    """取消后删除已写入的帧记录与MinIO对象，并清除取消标记"""
     try:
-        logger.info(f"开始处理视频: {video_id}")
-        update_video_progress(video_id, 5, "开始处理")
-
-        # 获取视频记录
-        video = db.query(Video).filter(Video.id == video_id).first()
-        if not video:
-            raise ValueError(f"Video not found: {video_id}")
-
-        video.status = VideoStatus.EXTRACTING
-        video.task_id = self.request.id
-        db.commit()
-
-        # 1. 提取视频信息
-        update_video_progress(video_id, 10, "分析视频信息")
-        logger.info(f"视频路径: {video_path}")
-        from app.services.video_processor import VideoProcessor
-
-        video_info = VideoProcessor.extract_video_info(video_path)
-
-        video.duration = video_info["duration"]
-        video.fps = video_info["fps"]
-        video.width = video_info["width"]
-        video.height = video_info["height"]
-        video.total_frames = video_info["frame_count"]
+        db.execute(delete(FrameAnnotation).where(
+            FrameAnnotation.video_id == video_id))
+        db.execute(delete(Frame).where(Frame.video_id == video_id))
         db.commit()
+    except Exception as e:
+        logger.error(f"Failed to delete frames of cancelled video: {e}")
+        db.rollback()
 
-        logger.info(f"视频信息: {video_info}")
+    try:
+        minio_service.delete_video_objects(video_id)
+    except Exception as e:
+        logger.error(f"Failed to clean up MinIO: {e}")
 
-        # 2. 提取所有帧
-        update_video_progress(video_id, 20, "提取所有帧")
-        extractor = FrameExtractor()
+    clear_cancel(video_id)
 
-        frames_info = []
-        extracted_count = 0
 
-        def frame_callback(frame_data, frame_info):
-            """帧提取回调 - 上传到MinIO并保存到数据库"""
-            nonlocal extracted_count
+def _load_task_scene_metrics(db, related_task_id: str = None):
+    """读取关联任务配置的场景变化指标(未配置返回None使用默认值)"""
+    if not related_task_id:
+        return None
+    task = db.query(Task).filter(Task.id == related_task_id).first()
+    return task.scene_metrics if task else None
 
-            # 上传到MinIO
-            frame_url = minio_service.upload_frame(
-                video_id,
-                frame_data,
-                f"frame_{frame_info['frame_number']}",
-                frame_info['timestamp']
-            )
 
-            # 保存到数据库
-            frame = Frame(
-                id=str(uuid.uuid4()),
-                video_id=video_id,
-                frame_number=frame_info['frame_number'],
-                timestamp=frame_info['timestamp'],
-                minio_url=frame_url,
-                brightness=frame_info['brightness'],
-                sharpness=frame_info['sharpness']
-            )
-            db.add(frame)
+def _load_reference_fingerprints(db, related_task_id: str = None):
+    """读取关联任务及其所属项目的参考画面指纹"""
+    if not related_task_id:
+        return []
 
-            extracted_count += 1
+    task = db.query(Task).filter(Task.id == related_task_id).first()
+    if not task:
+        return []
 
-            # 每100帧提交一次
-            if extracted_count % 100 == 0:
-                db.commit()
-                progress = 20 + int((extracted_count / video.total_frames) * 40)
-                update_video_progress(video_id, progress,
-                                      f"已提取 {extracted_count} 帧")
+    conditions = [ReferenceScreen.task_id == task.id]
+    if task.project_id:
+        conditions.append(ReferenceScreen.project_id == task.project_id)
 
-            frames_info.append(frame_info)
+    references = db.query(ReferenceScreen).filter(or_(*conditions)).all()
+    return [
+        {"phash": r.phash, "histogram": r.histogram}
+        for r in references
+    ]
 
-        # 执行提取
-        extractor.extract_all_frames(video_path, frame_callback)
-        db.commit()
 
-        video.extracted_frames = extracted_count
-        db.commit()
+@celery_app.task(name='app.tasks.video_tasks.process_video_frames_full')
+def process_video_frames_full(video_id: str, video_path: str = None,
+                              related_task_id: str = None,
+                              source_object: str = None):
+    """
+    完整的视频处理任务(兼容入口)
 
-        logger.info(f"帧提取完成: {extracted_count} 帧")
+    处理逻辑已迁移到分阶段流水线，这里只转交 start_video_pipeline，
+    供升级前已投递的消息继续执行
+    """
+    from app.tasks.pipeline_tasks import start_video_pipeline
 
-        # 3. 计算场景变化
-        update_video_progress(video_id, 65, "分析场景变化")
-        scene_scores = extractor.calculate_scene_changes(frames_info)
+    logger.info(f"转交分阶段流水线: {video_id}")
+    start_video_pipeline(video_id, video_path,
+                         related_task_id=related_task_id,
+                         source_object=source_object)
 
-        # 更新场景变化分数到数据库
-        all_frames = db.query(Frame).filter(
-            Frame.video_id == video_id).order_by(Frame.frame_number).all()
-        for i, frame in enumerate(all_frames):
-            if i < len(scene_scores):
-                frame.scene_change_score = scene_scores[i]
-        db.commit()
 
-        # 4. 智能标记首尾帧
-        update_video_progress(video_id, 75, "智能标记首尾帧")
-        analyzer = FrameAnalyzer()
+def _frame_marks(frame_rows, first_idx: int, last_idx: int,
+                 confidence: float, first_candidates, last_candidates):
+    """
+    生成首尾帧及候选帧标记的批量更新参数
 
-        first_idx, last_idx, confidence = analyzer.analyze_first_last_frames(
-            frames_info,
-            scene_scores
-        )
+    Args:
+    frame_rows: 帧记录(与frames_info顺序一致)
+    first_idx: 首帧索引
+    last_idx: 尾帧索引
+    confidence: 首尾帧置信度
+    first_candidates: 首帧候选 [(索引, 分数)]
+    last_candidates: 尾帧候选 [(索引, 分数)]
 
-        # 标记首尾帧
-        first_frame = all_frames[first_idx]
-        last_frame = all_frames[last_idx]
+    Returns:
+    按主键更新的参数列表
+    """
+    marks = {}
 
-        first_frame.frame_type = FrameType.FIRST
-        first_frame.confidence_score = confidence
+    def mark(idx):
+        return marks.setdefault(idx, {
+            "id": frame_rows[idx]["id"],
+            "frame_type": None,
+            "is_first_candidate": False,
+            "is_last_candidate": False,
+            "confidence_score": None
+        })
 
-        last_frame.frame_type = FrameType.LAST
-        last_frame.confidence_score = confidence
+    mark(first_idx).update(frame_type=FrameType.FIRST,
+                           confidence_score=confidence)
+    mark(last_idx).update(frame_type=FrameType.LAST,
+                          confidence_score=confidence)
 
-        # 5. 生成候选帧
-        update_video_progress(video_id, 85, "生成候选帧列表")
+    for idx, score in first_candidates:
+        mark(idx).update(is_first_candidate=True, confidence_score=score)
+    for idx, score in last_candidates:
+        mark(idx).update(is_last_candidate=True, confidence_score=score)
 
-        first_candidates = analyzer.get_candidate_frames(frames_info, 'first',
-                                                         top_k=5)
-        last_candidates = analyzer.get_candidate_frames(frames_info, 'last',
-                                                        top_k=5)
+    return list(marks.values())
 
-        # 标记候选帧
-        for idx, score in first_candidates:
-            all_frames[idx].is_first_candidate = True
-            all_frames[idx].confidence_score = score
 
-        for idx, score in last_candidates:
-            all_frames[idx].is_last_candidate = True
-            all_frames[idx].confidence_score = score
+def _bulk_mark_frames(db, frame_rows, first_idx: int, last_idx: int,
+                      confidence: float, first_candidates, last_candidates):
+    """按主键批量更新首尾帧及候选帧标记(参数见_frame_marks)"""
+    # 所有参数键一致，ORM按主键执行单条executemany UPDATE
+    db.execute(update(Frame), _frame_marks(
+        frame_rows, first_idx, last_idx, confidence,
+        first_candidates, last_candidates))
 
-        db.commit()
 
-        # 6. 创建标注记录
-        first_annotation = FrameAnnotation(
-            id=str(uuid.uuid4()),
-            video_id=video_id,
-            frame_id=first_frame.id,
-            marked_as_first=True,
-            marked_as_last=False,
-            marking_method=MarkingMethod.ALGORITHM,
-            confidence=confidence,
-            reason="算法自动标记",
-            annotator="system"
-        )
+def _schedule_phash_index_rebuild(db, related_task_id: str = None):
+    """延迟触发所属项目的感知哈希索引重建"""
+    if not related_task_id:
+        return
 
-        last_annotation = FrameAnnotation(
-            id=str(uuid.uuid4()),
-            video_id=video_id,
-            frame_id=last_frame.id,
-            marked_as_first=False,
-            marked_as_last=True,
-            marking_method=MarkingMethod.ALGORITHM,
-            confidence=confidence,
-            reason="算法自动标记",
-            annotator="system"
-        )
-
-        db.add(first_annotation)
-        db.add(last_annotation)
-
-        # 7. 更新视频状态
-        video.status = VideoStatus.PENDING_REVIEW
-        video.marking_method = MarkingMethod.ALGORITHM
-        video.ai_confidence = confidence
-        video.needs_review = True
-        video.progress = 100
-        video.current_step = "等待人工审核"
-        db.commit()
+    task = db.query(Task).filter(Task.id == related_task_id).first()
+    if not task or not task.project_id:
+        return
 
-        # 8. 如果启用AI，触发AI分析
-        if False and confidence < 0.8:
-            logger.info(f"置信度较低({confidence})，触发AI分析")
-            analyze_with_ai.delay(video_id)
+    rebuild_phash_index.apply_async(
+        args=[task.project_id, time.time()],
+        countdown=settings.PHASH_INDEX_REBUILD_DELAY
+    )
 
-        # 9. 清理临时文件
-        if os.path.exists(video_path):
-            os.remove(video_path)
 
-        logger.info(f"视频处理完成: {video_id}")
+@celery_app.task(name='app.tasks.video_tasks.flush_batch_counters')
+def flush_batch_counters():
+    """定时将Redis中的批次计数回写 batch_uploads"""
+    db = SyncSessionLocal()
+    try:
+        flushed = batch_progress_service.flush(db)
+        if flushed:
+            logger.info(f"批次计数已回写: {flushed} 个批次")
+        return flushed
+    finally:
+        db.close()
 
-        return {
-            "video_id": video_id,
-            "status": "pending_review",
-            "extracted_frames": extracted_count,
-            "first_frame": first_frame.frame_number,
-            "last_frame": last_frame.frame_number,
-            "confidence": confidence
-        }
 
+@celery_app.task(bind=True, max_retries=3,
+                 name='app.tasks.video_tasks.cleanup_video_objects')
+def cleanup_video_objects(self, video_id: str):
+    """
+    后台删除视频在MinIO中的所有对象(取消/删除视频后由API投递)
+    """
+    try:
+        deleted = minio_service.delete_video_objects(video_id)
     except Exception as e:
-        logger.error(f"视频处理失败: {video_id}, error: {e}")
+        logger.error(f"Cleanup video objects failed: {video_id}, {e}")
+        raise self.retry(exc=e, countdown=60 * (self.request.retries + 1))
 
-        video = db.query(Video).filter(Video.id == video_id).first()
-        if video:
-            video.status = VideoStatus.FAILED
-            video.error_message = str(e)
-            video.progress = 0
-            db.commit()
+    return {"video_id": video_id, "deleted": deleted}
 
-        if os.path.exists(video_path):
-            os.remove(video_path)
 
-        raise
+@celery_app.task(name='app.tasks.video_tasks.rebuild_phash_index')
+def rebuild_phash_index(project_id: str, requested_at: float = None):
+    """
+    重建项目的感知哈希索引
 
+    多个视频先后完成会排队多次重建，若已有更新的索引覆盖了本次请求则跳过
+    """
+    if requested_at is not None:
+        built_at = phash_index_service.stored_built_at(project_id)
+        if built_at is not None and built_at >= requested_at:
+            logger.info(f"索引已是最新，跳过重建: project={project_id}")
+            return {"project_id": project_id, "status": "skipped"}
+
+    db = SyncSessionLocal()
+    try:
+        index = phash_index_service.build(db, project_id)
     finally:
         db.close()
 
+    if not phash_index_service.save(project_id, index):
+        return {"project_id": project_id, "status": "superseded"}
+
+    return {"project_id": project_id, "status": "rebuilt", "size": len(index)}
+
 
 @celery_app.task(name='analyze_with_ai')
 def analyze_with_ai(video_id: str):
@@ -471,7 +467,7 @@ def analyze_with_ai(video_id: str):
 
         video.status = VideoStatus.ANALYZING
         video.current_step = "AI分析中"
-        db.commit()
+        progress_service.commit_state(db, video)
 
         # 获取候选帧
         first_candidates = db.query(Frame).filter(
@@ -578,7 +574,7 @@ def analyze_with_ai(video_id: str):
         video.marking_method = MarkingMethod.AI_MODEL
         video.ai_confidence = confidence
         video.current_step = "AI分析完成，等待审核"
-        db.commit()
+        progress_service.commit_state(db, video)
 
         logger.info(f"AI标记已更新: {video_id}")
 
@@ -597,7 +593,7 @@ def analyze_with_ai(video_id: str):
         if video:
             video.status = VideoStatus.PENDING_REVIEW
             video.current_step = "AI分析失败，使用算法结果"
-            db.commit()
+            progress_service.commit_state(db, video)
 
         raise
 
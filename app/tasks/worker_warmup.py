@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@FileName: worker_warmup
+@Author  : shwezheng
+@Time    : 2026/10/19 22:40
+@Software: PyCharm
+"""
+import os
+import time
+import logging
+from importlib import import_module
+from typing import Dict
+
+from celery.signals import worker_init, worker_process_init
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 只为导入副作用(加载OpenCV等共享库、初始化模块级单例)预先导入
+_PRELOAD_MODULES = (
+    "cv2",
+    "numpy",
+    "app.services.frame_extractor",
+    "app.services.frame_analyzer",
+    "app.services.frame_spool",
+    "app.services.fingerprint",
+)
+
+
+def preload_modules() -> float:
+    """
+    在父进程中导入重量级模块，fork出的子进程通过写时复制直接共享
+
+    Returns:
+    耗时(秒)
+    """
+    start = time.perf_counter()
+    for module in _PRELOAD_MODULES:
+        import_module(module)
+    return time.perf_counter() - start
+
+
+def ensure_warmup_clip(path: str = None) -> str:
+    """生成预热用的小视频(已存在时跳过)"""
+    import cv2
+    import numpy as np
+
+    path = path or settings.WORKER_WARMUP_CLIP
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.mp4"
+    writer = cv2.VideoWriter(tmp_path, cv2.VideoWriter_fourcc(*"mp4v"),
+                             10, (320, 240))
+    try:
+        for i in range(16):
+            frame = np.full((240, 320, 3), i * 16, dtype=np.uint8)
+            cv2.putText(frame, str(i), (140, 130), cv2.FONT_HERSHEY_SIMPLEX,
+                        1, (255, 255, 255), 2)
+            writer.write(frame)
+    finally:
+        writer.release()
+    # 多个Worker同时启动时以原子重命名避免读到半个文件
+    os.replace(tmp_path, path)
+    return path
+
+
+def reset_connections():
+    """丢弃从父进程继承的连接池(socket不能跨进程共享)"""
+    from app.database import sync_engine
+    from app.services.minio_service import minio_service
+
+    sync_engine.dispose(close=False)
+    minio_service.reset_client()
+
+
+def warm_connections():
+    """预先建立数据库、MinIO与Redis连接，首个任务无需再握手"""
+    from sqlalchemy import text
+
+    from app.database import sync_engine
+    from app.redis_client import get_redis
+    from app.services.minio_service import minio_service
+
+    with sync_engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    minio_service.client.bucket_exists(settings.MINIO_BUCKET)
+    get_redis().ping()
+
+
+def warm_codecs(path: str = None):
+    """
+    完整解码一遍预热视频
+
+    触发FFmpeg解码器、JPEG编码器、场景指标与指纹计算的首次初始化
+    """
+    from app.services.frame_extractor import FrameExtractor
+
+    FrameExtractor(sampling_rate=1).extract_all_frames(
+        path or settings.WORKER_WARMUP_CLIP, keep_data=False)
+
+
+def preallocate_buffers():
+    """按配置分辨率预分配帧缓冲区"""
+    from app.services.frame_extractor import frame_buffers
+
+    width, height = (int(v) for v in
+                     settings.WORKER_FRAME_BUFFER_SIZE.lower().split("x"))
+    frame_buffers.preallocate(width, height)
+
+
+def warm_process(connections: bool = True) -> Dict[str, float]:
+    """
+    子进程预热
+
+    Args:
+    connections: 是否预建数据库/MinIO/Redis连接
+
+    Returns:
+    各步骤耗时(秒)
+    """
+    steps = [("codecs", warm_codecs), ("buffers", preallocate_buffers)]
+    if connections:
+        steps.insert(0, ("connections", warm_connections))
+
+    timings = {}
+    for name, step in steps:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            # 预热失败不影响Worker启动，首个任务按原方式延迟初始化
+            logger.warning(f"Worker warmup step {name} failed: {e}")
+        timings[name] = round(time.perf_counter() - start, 3)
+    return timings
+
+
+@worker_init.connect
+def on_worker_init(**kwargs):
+    """Worker主进程启动(fork之前)"""
+    if not settings.WORKER_WARMUP_ENABLED:
+        return
+    elapsed = preload_modules()
+    try:
+        ensure_warmup_clip()
+    except Exception as e:
+        logger.warning(f"Failed to create warmup clip: {e}")
+    logger.info(f"Worker modules preloaded in {elapsed:.3f}s")
+
+
+@worker_process_init.connect
+def on_worker_process_init(**kwargs):
+    """prefork子进程启动(包括达到max_tasks_per_child后的重建)"""
+    from app.services.memory_admission import memory_admission
+
+    # 内存校准的基线取预热之前，预分配的帧缓冲计入任务峰值
+    memory_admission.mark_baseline()
+    reset_connections()
+    if not settings.WORKER_WARMUP_ENABLED:
+        return
+    timings = warm_process()
+    logger.info(f"Worker process {os.getpid()} warmed up: {timings}")